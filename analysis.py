@@ -0,0 +1,275 @@
+import copy
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from brands import brand_key, canonical_brand
+from cache import LRUCache, TTLCache
+from effective_scraper import scrape_effective_sites
+from llm_client import get_openai_client
+from parsing import split_options_deterministic
+from price_history import PRICE_HISTORY_MAX_AGE, get_price_history
+from prompting import (
+    OPTION_CATEGORIES,
+    build_option_category_messages,
+    build_option_explanation_messages,
+    normalize_options_via_llm,
+    prompt_cache_kwargs,
+    record_prompt_usage,
+)
+from routing import get_route, routed_completion
+
+
+TEMPERATURE = 0.0
+LLM_CACHE_TTL = float(os.getenv("ATE_LLM_CACHE_TTL", "86400"))
+SCRAPE_CACHE_TTL = float(os.getenv("ATE_SCRAPE_CACHE_TTL", "900"))
+
+# Successful LLM answers, shared by every session and primed at startup by warmup.py
+NORMALIZE_CACHE = TTLCache(ttl=LLM_CACHE_TTL, max_entries=2000)
+EXPLANATION_CACHE = TTLCache(ttl=LLM_CACHE_TTL, max_entries=20000)
+CATEGORY_CACHE = TTLCache(ttl=LLM_CACHE_TTL, max_entries=20000)
+# scrape_effective_sites results per analysis key
+SCRAPE_CACHE = TTLCache(ttl=SCRAPE_CACHE_TTL, max_entries=500)
+# Complete run_analysis results by canonical brand/model/options, shared by every session,
+# so revisiting recently analyzed equipment renders without running the pipeline.
+# Entries are evicted least recently used first once their estimated size exceeds the
+# budget, and live no longer than the market data they contain.
+ANALYSIS_CACHE_MB = float(os.getenv("ATE_ANALYSIS_CACHE_MB", "64"))
+ANALYSIS_CACHE_TTL = float(os.getenv("ATE_ANALYSIS_CACHE_TTL", str(SCRAPE_CACHE_TTL)))
+ANALYSIS_CACHE = LRUCache(max_bytes=int(ANALYSIS_CACHE_MB * 1024 * 1024), ttl=ANALYSIS_CACHE_TTL)
+
+# Explanations being fetched right now (by prefetch.py or another analysis); a second
+# caller waits for the first instead of asking the LLM the same question.
+EXPLAIN_WAIT_TIMEOUT = float(os.getenv("ATE_EXPLAIN_WAIT_TIMEOUT", "60"))
+_explaining: Dict[tuple, threading.Event] = {}
+_explaining_lock = threading.Lock()
+
+ProgressCallback = Callable[[float, str], None]
+
+
+def _no_progress(fraction: float, message: str) -> None:
+    pass
+
+
+def analysis_key(brand: str, model: str) -> str:
+    """Scrape-cache and price-history key; brand aliases ("Agilent / HP", "Keysight") share one key."""
+    return f"{canonical_brand(brand)}|{model.strip()}"
+
+
+def analysis_cache_key(brand: str, model: str, options_str: str) -> str:
+    """Job, session and ANALYSIS_CACHE key: the analysis key plus the quote's sorted, filtered options."""
+    options = sorted({opt for opt in filter_options(brand.strip(), model.strip(), options_str).split("/") if opt})
+    return f"{analysis_key(brand, model)}|{'/'.join(options)}"
+
+
+def cached_analysis(cache_key: str) -> Optional[Dict[str, Any]]:
+    """A copy of the stored ``run_analysis`` result under an ``analysis_cache_key``, or None."""
+    result = ANALYSIS_CACHE.get(cache_key)
+    return copy.deepcopy(result) if result is not None else None
+
+
+def update_cached_scraping(cache_key: str, scraping: Dict[str, Any]) -> None:
+    """Replace the market data of a stored analysis (e.g. with its enriched version)."""
+    result = ANALYSIS_CACHE.get(cache_key)
+    if result is not None:
+        ANALYSIS_CACHE.set(cache_key, dict(result, scraping=copy.deepcopy(scraping)))
+
+
+def filter_options(brand: str, model: str, options_str: str) -> str:
+    """Split the raw options column on '/' and drop entries that repeat the brand or model name."""
+    if not options_str:
+        return ""
+    skip = (brand.lower(), model.lower())
+    return "/".join(opt for opt in split_options_deterministic(options_str) if opt.lower() not in skip)
+
+
+def normalize_equipment(client: Any, brand: str, model: str, raw_options: str) -> Dict[str, Any]:
+    """Normalize brand/model/options via the LLM, falling back to the deterministic splitter."""
+    try:
+        if client is not None:
+            llm_input = f"{brand} {model} {raw_options}" if raw_options else f"{brand} {model}"
+            # The LLM sees the brand as quoted; aliases of one brand share the cached answer
+            cache_key = (brand_key(brand), model, raw_options)
+            payload = NORMALIZE_CACHE.get(cache_key)
+            if payload is None:
+                payload = normalize_options_via_llm(client, llm_input, get_route("normalize").model, float(TEMPERATURE))
+                # An empty option list for a non-empty input is the parse-failure fallback; don't keep it
+                if payload["normalized"]["options"] or not raw_options:
+                    NORMALIZE_CACHE.set(cache_key, copy.deepcopy(payload))
+            else:
+                payload = copy.deepcopy(payload)
+        else:
+            payload = {
+                "normalized": {
+                    "brand": brand,
+                    "model": model,
+                    "options": split_options_deterministic(raw_options)
+                },
+                "results": []
+            }
+        payload["normalized"]["brand"] = brand
+        payload["normalized"]["model"] = model
+    except Exception as e:
+        print(f"DEBUG: Option normalization error: {e}")
+        payload = {
+            "normalized": {
+                "brand": brand,
+                "model": model,
+                "options": []
+            },
+            "results": []
+        }
+    return payload
+
+
+def explain_option(client: Any, brand: str, model: str, opt: str) -> str:
+    try:
+        if client is None:
+            return f"Option '{opt}' adds specific functionality to the {brand} {model}."
+        cache_key = (brand_key(brand), model.lower(), opt)
+        cached = EXPLANATION_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+        with _explaining_lock:
+            pending = _explaining.get(cache_key)
+            if pending is None:
+                _explaining[cache_key] = threading.Event()
+        if pending is not None:
+            pending.wait(EXPLAIN_WAIT_TIMEOUT)
+            cached = EXPLANATION_CACHE.get(cache_key)
+            if cached is not None:
+                return cached
+            return _fetch_explanation(client, brand, model, opt, cache_key)
+        try:
+            return _fetch_explanation(client, brand, model, opt, cache_key)
+        finally:
+            with _explaining_lock:
+                _explaining.pop(cache_key).set()
+    except Exception as e:
+        return f"Could not get details for option '{opt}': {e}"
+
+
+def _fetch_explanation(client: Any, brand: str, model: str, opt: str, cache_key: tuple) -> str:
+    completion = routed_completion(
+        client,
+        "explain",
+        build_option_explanation_messages(brand, model, opt),
+        temperature=float(TEMPERATURE),
+        **prompt_cache_kwargs("explain"),
+    )
+    record_prompt_usage("explain", completion)
+    explanation = completion.choices[0].message.content
+    if not explanation:
+        return "No explanation available."
+    EXPLANATION_CACHE.set(cache_key, explanation)
+    return explanation
+
+
+def categorize_option(client: Any, opt: str, explanation: str) -> str:
+    """One-word category for an option; anything outside OPTION_CATEGORIES maps to General."""
+    if client is None:
+        return "General"
+    cached = CATEGORY_CACHE.get((opt, explanation))
+    if cached is not None:
+        return cached
+    try:
+        completion = routed_completion(
+            client,
+            "categorize",
+            build_option_category_messages(opt, explanation),
+            **prompt_cache_kwargs("categorize"),
+        )
+        record_prompt_usage("categorize", completion)
+        category = (completion.choices[0].message.content or "").strip()
+        category = category if category in OPTION_CATEGORIES else "General"
+        CATEGORY_CACHE.set((opt, explanation), category)
+        return category
+    except Exception:
+        return "General"
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        "normalize": NORMALIZE_CACHE.stats(),
+        "explanations": EXPLANATION_CACHE.stats(),
+        "categories": CATEGORY_CACHE.stats(),
+        "scrape": SCRAPE_CACHE.stats(),
+        "analysis": ANALYSIS_CACHE.stats(),
+    }
+
+
+def market_data(brand: str, model: str, options: List[str]) -> Optional[Dict[str, Any]]:
+    """Scrape results for a model: from the in-memory cache, else from price history when it is
+    younger than ATE_PRICE_HISTORY_MAX_AGE, else scraped live and appended to the history."""
+    key = analysis_key(brand, model)
+    scraping_results = SCRAPE_CACHE.get(key)
+    if scraping_results is None:
+        history = get_price_history()
+        if history is not None:
+            try:
+                scraping_results = history.latest(brand, model, PRICE_HISTORY_MAX_AGE)
+            except Exception as e:
+                print(f"DEBUG: Price history read error: {e}")
+        if scraping_results is None:
+            try:
+                scraping_results = scrape_effective_sites(brand, model, options)
+            except Exception as e:
+                print(f"DEBUG: Market data extraction error: {e}")
+                return None
+            if history is not None:
+                try:
+                    history.record(brand, model, scraping_results)
+                except Exception as e:
+                    print(f"DEBUG: Price history write error: {e}")
+        SCRAPE_CACHE.set(key, scraping_results)
+    return copy.deepcopy(scraping_results)
+
+
+def run_analysis(
+    brand: str,
+    model: str,
+    options_str: str,
+    do_market_extraction: bool = True,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """Full Analyze pipeline for one equipment row: normalize, explain, categorize, scrape.
+
+    Complete results (with market data and no fallback explanations) are kept in ANALYSIS_CACHE.
+    """
+    progress = progress or _no_progress
+    cache_key = analysis_cache_key(brand, model, options_str)
+    # Prompts and scrape queries use the brand as quoted; the cache, job and history keys
+    # canonicalize it, so aliases ("Agilent / HP", "Keysight") still share them
+    brand = brand.strip()
+    model = model.strip()
+    raw_options = filter_options(brand, model, options_str)
+    client = get_openai_client()
+
+    progress(0.05, "Parsing equipment data")
+    payload = normalize_equipment(client, brand, model, raw_options)
+
+    options_list: List[str] = payload.get("normalized", {}).get("options", []) or []
+    option_explanations: Dict[str, str] = {}
+    option_categories: Dict[str, str] = {}
+    for i, opt in enumerate(options_list):
+        progress(0.2 + 0.6 * i / len(options_list), f"Explaining options ({i + 1}/{len(options_list)})")
+        option_explanations[opt] = explain_option(client, brand, model, opt)
+        option_categories[opt] = categorize_option(client, opt, option_explanations[opt])
+
+    scraping_results = None
+    if do_market_extraction:
+        progress(0.85, "Searching market data")
+        scraping_results = market_data(brand, model, payload["normalized"]["options"])
+
+    progress(1.0, "Done")
+    result = {
+        "analysis_key": cache_key,
+        "payload": payload,
+        "option_explanations": option_explanations,
+        "option_categories": option_categories,
+        "scraping": scraping_results,
+    }
+    failed_explanation = any(text.startswith("Could not get details") for text in option_explanations.values())
+    if scraping_results is not None and not failed_explanation:
+        ANALYSIS_CACHE.set(cache_key, copy.deepcopy(result))
+    return result
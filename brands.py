@@ -0,0 +1,77 @@
+import re
+import threading
+from typing import Dict, List, Optional
+
+
+# Canonical brand -> the spellings found in quote exports and typed by users. Lookups
+# ignore case, spacing and punctuation ("R&S", "r & s" and "R/S" are the same alias).
+# HP's test-and-measurement line became Agilent and then Keysight; resellers list the
+# same instruments under all three names, so they share one canonical brand.
+BRAND_ALIASES: Dict[str, List[str]] = {
+    "Keysight": [
+        "Keysight", "Keysight Technologies", "Agilent", "Agilent Technologies", "HP", "Hewlett Packard",
+        "Hewlett-Packard", "Agilent HP Keysight", "Agilent / HP", "Agilent HP", "HP Agilent", "Agilent Keysight",
+        "HP Agilent Keysight", "Keysight Agilent",
+    ],
+    "Rohde & Schwarz": ["Rohde & Schwarz", "Rohde and Schwarz", "Rohde Schwarz", "Rohde", "R&S", "RS"],
+    "Tektronix": ["Tektronix", "Tek", "Tektronix Inc"],
+    "Anritsu": ["Anritsu", "Anritsu Wiltron", "Wiltron"],
+    "Boonton": ["Boonton", "Boonton Electronics"],
+    "Fluke": ["Fluke", "Fluke Calibration"],
+    "Yokogawa": ["Yokogawa", "Ando", "Yokogawa Ando"],
+    "Teledyne LeCroy": ["Teledyne LeCroy", "LeCroy"],
+    "National Instruments": ["National Instruments", "NI"],
+    "Aeroflex": ["Aeroflex", "IFR", "Marconi", "Aeroflex IFR"],
+    "Keithley": ["Keithley", "Keithley Instruments"],
+    "Chroma": ["Chroma", "Chroma ATE"],
+    "Advantest": ["Advantest"],
+    "Stanford Research Systems": ["Stanford Research Systems", "Stanford Research", "SRS"],
+}
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _compact(name: str) -> str:
+    return _NON_WORD.sub("", name.lower())
+
+
+# Precomputed at import: compacted alias -> canonical brand
+ALIAS_INDEX: Dict[str, str] = {
+    _compact(alias): canonical for canonical, aliases in BRAND_ALIASES.items() for alias in aliases + [canonical]
+}
+
+# Raw brand string -> canonical brand; brands repeat heavily across quotes, so most calls are one dict hit
+_resolved: Dict[str, str] = {}
+_resolved_lock = threading.Lock()
+MAX_RESOLVED = 100_000
+
+
+def lookup_brand(name: str) -> Optional[str]:
+    """Canonical brand when the whole name is a known alias, else None.
+
+    Only the full normalized name is matched: short aliases ("RS", "NI", "HP")
+    would otherwise claim unrelated brands that start with them ("RS Components").
+    """
+    compact = _compact(name)
+    if not compact:
+        return None
+    return ALIAS_INDEX.get(compact)
+
+
+def canonical_brand(name: str) -> str:
+    """Canonical spelling of a brand; unknown brands come back trimmed, with inner whitespace collapsed."""
+    name = name or ""
+    canonical = _resolved.get(name)
+    if canonical is None:
+        canonical = lookup_brand(name) or " ".join(name.split())
+        with _resolved_lock:
+            if len(_resolved) >= MAX_RESOLVED:
+                _resolved.clear()
+            _resolved[name] = canonical
+    return canonical
+
+
+def brand_key(name: str) -> str:
+    """Lower-cased canonical brand, for dictionary and cache keys."""
+    return canonical_brand(name).lower()
+
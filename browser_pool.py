@@ -0,0 +1,213 @@
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+POOL_SIZE = int(os.getenv("ATE_BROWSER_POOL_SIZE", "2"))
+PAGE_TIMEOUT = float(os.getenv("ATE_BROWSER_PAGE_TIMEOUT", "15"))
+ACQUIRE_TIMEOUT = float(os.getenv("ATE_BROWSER_ACQUIRE_TIMEOUT", "5"))
+ENABLED = os.getenv("ATE_BROWSER_POOL", "0") == "1"
+
+# Resources the renderer never downloads: listings only need the DOM and scripts.
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.css",
+]
+
+
+def _launch_driver() -> Any:
+    """Start one headless Chrome with images, fonts and stylesheets blocked."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+    })
+    options.page_load_strategy = "eager"
+
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+        service = Service(ChromeDriverManager().install())
+    except Exception:
+        # Selenium >= 4.6 resolves a driver itself (Selenium Manager)
+        service = Service()
+
+    driver = webdriver.Chrome(service=service, options=options)
+    driver.set_page_load_timeout(PAGE_TIMEOUT)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+
+class BrowserPool:
+    """Bounded pool of pre-launched headless browsers for JavaScript-rendered vendor pages.
+
+    Browsers are launched by ``start()`` on a background thread. ``render()``
+    only ever borrows an already-running browser and returns None when none is
+    ready, so browser cold-start never lands on the request path. Each browser
+    keeps a single tab that is reused for every page it renders.
+    """
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = max(1, size)
+        self._idle: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._launched = 0
+        self._starting = False
+        self.stats = {"launched": 0, "launch_failures": 0, "renders": 0, "render_failures": 0, "unavailable": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self._launched > 0
+
+    def start(self) -> None:
+        """Launch browsers up to the pool size in the background (idempotent)."""
+        with self._lock:
+            if self._starting:
+                return
+            self._starting = True
+        threading.Thread(target=self._fill, name="browser-pool-start", daemon=True).start()
+
+    def _fill(self) -> None:
+        while True:
+            with self._lock:
+                if self._launched >= self.size:
+                    self._starting = False
+                    return
+            started = time.perf_counter()
+            try:
+                driver = _launch_driver()
+            except Exception as e:
+                with self._lock:
+                    self.stats["launch_failures"] += 1
+                    self._starting = False
+                print(f"DEBUG: Headless browser launch failed: {e}")
+                return
+            with self._lock:
+                self._launched += 1
+                self.stats["launched"] += 1
+            self._idle.put(driver)
+            print(f"DEBUG: Headless browser ready in {time.perf_counter() - started:.1f}s ({self._launched}/{self.size})")
+
+    def render(self, url: str, wait_selector: Optional[str] = None, timeout: float = PAGE_TIMEOUT) -> Optional[str]:
+        """Load ``url`` in a pooled browser and return the rendered HTML, or None."""
+        if not self.ready:
+            self.stats["unavailable"] += 1
+            return None
+        try:
+            driver = self._idle.get(timeout=ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            self.stats["unavailable"] += 1
+            return None
+
+        healthy = True
+        try:
+            driver.get(url)
+            if wait_selector:
+                from selenium.common.exceptions import TimeoutException
+                from selenium.webdriver.common.by import By
+                from selenium.webdriver.support import expected_conditions as EC
+                from selenium.webdriver.support.ui import WebDriverWait
+                try:
+                    WebDriverWait(driver, timeout).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, wait_selector))
+                    )
+                except TimeoutException:
+                    pass
+            self.stats["renders"] += 1
+            return driver.page_source
+        except Exception as e:
+            self.stats["render_failures"] += 1
+            healthy = False
+            print(f"DEBUG: Headless render of {url} failed: {e}")
+            return None
+        finally:
+            if healthy:
+                self._idle.put(driver)
+            else:
+                self._discard(driver)
+
+    def _discard(self, driver: Any) -> None:
+        """Drop a broken browser and launch a replacement in the background."""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._launched -= 1
+        self.start()
+
+    def shutdown(self) -> None:
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            with self._lock:
+                self._launched -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats.update({"size": self.size, "launched_now": self._launched, "idle": self._idle.qsize()})
+        return stats
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool()
+    return _pool
+
+
+def start_browser_pool() -> bool:
+    """Pre-launch the pool at app startup when ATE_BROWSER_POOL=1; returns whether it was started."""
+    if not ENABLED:
+        return False
+    get_browser_pool().start()
+    return True
+
+
+def main(argv: List[str]) -> int:
+    """Render URLs (e.g. pages on the local replay server) and print the HTML size of each."""
+    if not argv:
+        print("usage: python browser_pool.py URL [URL ...]")
+        return 2
+    pool = get_browser_pool()
+    pool.start()
+    deadline = time.time() + 60
+    while not pool.ready and time.time() < deadline:
+        time.sleep(0.2)
+    for url in argv:
+        started = time.perf_counter()
+        html = pool.render(url)
+        print(f"{url}: {len(html or '')} chars in {time.perf_counter() - started:.2f}s")
+    print(pool.get_stats())
+    pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
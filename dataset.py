@@ -0,0 +1,242 @@
+import hashlib
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# pyarrow (and numpy with it) is imported when a dataset is opened, not at import time,
+# so app.py can render its page shell before the quote history loads.
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE = os.path.join(ROOT, "data", "sample_quotes.tsv")
+# TSV or XLSX quote export; the bundled sample is used when unset.
+QUOTES_PATH = os.getenv("ATE_QUOTES_PATH", DEFAULT_SOURCE)
+CACHE_DIR = os.getenv("ATE_DATASET_CACHE_DIR", os.path.join(ROOT, ".dataset_cache"))
+PAGE_SIZE = int(os.getenv("ATE_DATASET_PAGE_SIZE", "25"))
+
+
+# Columns kept from the quote export, with their Arrow types. The export's second
+# "createddate" column (always NULL) is dropped.
+def _schema() -> "pa.Schema":
+    import pyarrow as pa
+
+    return pa.schema([
+        ("quoteid", pa.int64()),
+        ("createddate", pa.date32()),
+        ("contactname", pa.string()),
+        ("ID", pa.int64()),
+        ("record_id", pa.int64()),
+        ("QuoteID", pa.int64()),
+        ("eqModel", pa.string()),
+        ("eqBrand", pa.string()),
+        ("options", pa.string()),
+        # Derived once at load time
+        ("option_list", pa.list_(pa.string())),
+        ("label", pa.string()),
+    ])
+
+
+SEARCH_COLUMNS = ("eqBrand", "eqModel", "contactname", "options")
+_INT_COLUMNS = ("quoteid", "ID", "record_id", "QuoteID")
+_TEXT_COLUMNS = ("contactname", "eqModel", "eqBrand", "options")
+
+
+class QuoteRow(NamedTuple):
+    index: int
+    quoteid: Optional[int]
+    createddate: Optional[str]
+    contactname: str
+    record_id: Optional[int]
+    brand: str
+    model: str
+    options: str
+    option_list: List[str]
+    label: str
+
+
+def _read_source(path: str) -> "pa.Table":
+    """Parse a TSV/XLSX export into the typed table; pandas (and openpyxl) only load here."""
+    import pandas as pd
+    import pyarrow as pa
+
+    schema = _schema()
+
+    if path.lower().endswith((".xlsx", ".xls")):
+        frame = pd.read_excel(path, dtype=str, keep_default_na=False)
+    else:
+        frame = pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False)
+    frame = frame.loc[:, ~frame.columns.duplicated()]
+    for column in schema.names:
+        if column not in frame.columns:
+            frame[column] = ""
+    frame = frame.replace({"NULL": ""})
+    for column in _TEXT_COLUMNS:
+        frame[column] = frame[column].astype(str).str.strip()
+    for column in _INT_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("Int64")
+    frame["createddate"] = pd.to_datetime(frame["createddate"], errors="coerce").dt.date
+    frame["option_list"] = [
+        [part.strip() for part in options.split("/") if part.strip()] for options in frame["options"].tolist()
+    ]
+    frame["label"] = "📋 " + frame["eqModel"] + " " + frame["eqBrand"] + " - " + frame["contactname"]
+    return pa.Table.from_pandas(frame[schema.names], schema=schema, preserve_index=False)
+
+
+def _cache_path(path: str) -> str:
+    stat = os.stat(path)
+    digest = hashlib.sha1(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"quotes-{digest}.arrow")
+
+
+class QuoteDataset:
+    """Quote history held as an Arrow table, memory-mapped from the on-disk cache.
+
+    Filtering runs as Arrow compute kernels over whole columns; only the rows of
+    the requested page are converted to Python objects.
+    """
+
+    def __init__(self, table: "pa.Table", source: str = ""):
+        self.table = table
+        self.source = source
+        self._search_text = None
+        self._search_index = None
+        self._quote_index = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def _haystack(self) -> "pa.Array":
+        """Lower-cased search columns joined per row, built on first use."""
+        import pyarrow.compute as pc
+
+        with self._lock:
+            if self._search_text is None:
+                columns = [pc.fill_null(self.table[name], "") for name in SEARCH_COLUMNS]
+                joined = pc.binary_join_element_wise(*columns, " ")
+                self._search_text = pc.utf8_lower(joined).combine_chunks()
+            return self._search_text
+
+    def filter(self, query: str = "") -> "pa.Array":
+        """Row indices whose brand/model/contact/options contain every whitespace-separated term."""
+        import pyarrow.compute as pc
+
+        terms = query.lower().split()
+        if not terms:
+            # Built from an existing column: converting Python values (pa.array, scalar
+            # arguments) makes pyarrow import pandas, which would slow the first render.
+            column = self.table.column(0)
+            return pc.indices_nonzero(pc.or_(pc.is_valid(column), pc.is_null(column)))
+        haystack = self._haystack()
+        mask = None
+        for term in terms:
+            match = pc.match_substring(haystack, term)
+            mask = match if mask is None else pc.and_(mask, match)
+        return pc.indices_nonzero(mask)
+
+    def rows(self, indices: "pa.Array") -> List[QuoteRow]:
+        """Materialize the rows at ``indices`` (a slice of :meth:`filter`'s result)."""
+        if not len(indices):
+            return []
+        taken = self.table.take(indices).to_pylist()
+        return [
+            QuoteRow(
+                index=index,
+                quoteid=item["quoteid"],
+                createddate=item["createddate"].isoformat() if item["createddate"] else None,
+                contactname=item["contactname"] or "",
+                record_id=item["record_id"],
+                brand=item["eqBrand"] or "",
+                model=item["eqModel"] or "",
+                options=item["options"] or "",
+                option_list=item["option_list"] or [],
+                label=item["label"] or "",
+            )
+            for index, item in zip(indices.to_pylist(), taken)
+        ]
+
+    def row(self, index: int) -> QuoteRow:
+        return self.rows(self.filter()[index:index + 1])[0]
+
+    def page(self, query: str = "", page: int = 0, page_size: int = PAGE_SIZE) -> Tuple[List[QuoteRow], int]:
+        """One page of matching rows and the total number of matches."""
+        matches = self.filter(query)
+        start = max(0, page) * page_size
+        return self.rows(matches[start:start + page_size]), len(matches)
+
+    def search_index(self):
+        """Fuzzy type-ahead index over the quotes (``search_index.SearchIndex``), built on first use."""
+        with self._lock:
+            if self._search_index is None:
+                from search_index import build_search_index
+
+                self._search_index = build_search_index(self.table)
+            return self._search_index
+
+    def search(self, query: str, limit: int = PAGE_SIZE) -> Tuple[List[QuoteRow], int]:
+        """Best-ranked rows for a type-ahead query (prefix, typo and brand-initial matches) and the match count."""
+        import pyarrow as pa
+
+        hits, total = self.search_index().search(query, limit)
+        return self.rows(pa.array([hit.index for hit in hits], type=pa.int64())), total
+
+    def quote_index(self):
+        """Option frequency / co-occurrence index of the quotes (``quote_index.QuoteIndex``), built on first use."""
+        with self._lock:
+            if self._quote_index is None:
+                from quote_index import build_quote_index
+
+                self._quote_index = build_quote_index(self.table.select(["eqBrand", "eqModel", "options"]).to_pandas())
+            return self._quote_index
+
+    def history(self) -> List[Tuple[str, str, str]]:
+        """(brand, model, options) per quote, in file order (most recent first in exports)."""
+        columns = [self.table[name].to_pylist() for name in ("eqBrand", "eqModel", "options")]
+        return [(brand or "", model or "", options or "") for brand, model, options in zip(*columns)]
+
+
+def build_cache(path: str) -> str:
+    """Convert a quote export to an uncompressed Arrow IPC file (memory-mappable) and return its path."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    target = _cache_path(path)
+    if not os.path.exists(target):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        table = _read_source(path)
+        partial = f"{target}.{os.getpid()}.tmp"
+        with pa.OSFile(partial, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(partial, target)
+    return target
+
+
+def open_dataset(path: str) -> QuoteDataset:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    target = build_cache(path)
+    table = ipc.open_file(pa.memory_map(target, "r")).read_all()
+    return QuoteDataset(table, source=path)
+
+
+_datasets: Dict[Tuple[str, int], QuoteDataset] = {}
+_datasets_lock = threading.Lock()
+
+
+def get_dataset(path: Optional[str] = None) -> QuoteDataset:
+    """Process-wide dataset for ``path`` (default ATE_QUOTES_PATH), reloaded when the file changes."""
+    path = path or QUOTES_PATH
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    dataset = _datasets.get(key)
+    if dataset is None:
+        with _datasets_lock:
+            dataset = _datasets.get(key)
+            if dataset is None:
+                dataset = open_dataset(path)
+                _datasets.clear()
+                _datasets[key] = dataset
+    return dataset
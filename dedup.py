@@ -0,0 +1,243 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+import numpy as np
+
+
+# Query parameters that only track the click and never identify the listing.
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "dclid", "yclid", "mc_cid", "mc_eid", "ref", "ref_", "referrer",
+    "hash", "_trksid", "_trkparms", "mkevt", "mkcid", "mkrid", "campid", "toolid", "customid", "srsltid",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "trk", "_ga")
+
+# How much we trust a source's listing data (direct vendor scrapes above search-engine snippets).
+SOURCE_QUALITY = {
+    "valuetronics": 1.0,
+    "testequipment.center": 1.0,
+    "testworld": 0.9,
+    "ebay": 0.8,
+    "keysight": 0.8,
+    "agilent": 0.8,
+    "amazon": 0.6,
+    "search_engine": 0.4,
+}
+DEFAULT_SOURCE_QUALITY = 0.5
+# Vendors produced by EffectiveScraper.scrape_with_fallback_data (estimated, not scraped).
+FALLBACK_SOURCES = {"testmart", "circuitspecialists", "keysight direct", "testequipmentdepot"}
+FALLBACK_SOURCE_QUALITY = 0.1
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+NEAR_DUPLICATE_DISTANCE = 3
+# Group representatives compared per band bucket; bounds the near-duplicate pass to linear time.
+MAX_BUCKET_SCAN = 8
+
+_PRICE_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def unwrap_redirect(url: str) -> str:
+    """Underlying target of a DuckDuckGo ``uddg=`` redirect; other URLs are returned as-is."""
+    if "uddg=" not in url:
+        return url
+    for key, value in parse_qsl(urlsplit(url).query):
+        if key == "uddg":
+            return unquote(value)
+    return url
+
+
+def canonicalize_url(url: str) -> str:
+    """Comparison key for a listing URL.
+
+    Unwraps redirects, ignores scheme, ``www.``, fragments, tracking parameters,
+    parameter order and trailing slashes.
+    """
+    if not url:
+        return ""
+    url = unwrap_redirect(url.strip())
+    if url.startswith("//"):
+        url = "https:" + url
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host.endswith(":80") or host.endswith(":443"):
+        host = host.rsplit(":", 1)[0]
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    params = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    query = urlencode(params)
+    return f"{host}{path}" + (f"?{query}" if query else "")
+
+
+def parse_display_price(price: Any) -> Optional[float]:
+    """Numeric value of a display price like "$1,850.00"; None for "Contact vendor" and friends."""
+    if isinstance(price, (int, float)):
+        return float(price)
+    match = _PRICE_RE.search(price or "")
+    if not match:
+        return None
+    try:
+        return float(match.group(1).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def simhash_many(titles: List[str]) -> List[int]:
+    """64-bit SimHash of each title over its word tokens and word bigrams, computed in one vectorized pass.
+
+    Feature hashes use Python's ``hash`` and are only comparable within one process.
+    """
+    title_ids = []
+    digests = []
+    for title_id, text in enumerate(titles):
+        tokens = _TOKEN_RE.findall(text.lower())
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            title_ids.append(title_id)
+            digests.append(hash(feature) & 0xFFFFFFFFFFFFFFFF)
+    if not digests:
+        return [0] * len(titles)
+    bits = np.unpackbits(np.array(digests, dtype=">u8").view(np.uint8)).reshape(-1, SIMHASH_BITS)
+    ids = np.array(title_ids)
+    # Features are grouped by title already, so per-title votes are one segmented sum.
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    set_counts = np.add.reduceat(bits, starts, axis=0, dtype=np.int32)
+    feature_counts = np.diff(np.r_[starts, len(ids)])
+    majority = np.zeros((len(titles), SIMHASH_BITS), dtype=bool)
+    majority[ids[starts]] = set_counts * 2 > feature_counts[:, None]
+    packed = np.packbits(majority, axis=1).view(">u8").ravel()
+    return [int(value) for value in packed]
+
+
+def simhash(text: str) -> int:
+    return simhash_many([text])[0]
+
+
+def _bands(value: int) -> List[int]:
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    mask = (1 << width) - 1
+    return [(value >> (i * width)) & mask for i in range(SIMHASH_BANDS)]
+
+
+def source_quality(result: Dict[str, Any]) -> float:
+    source = str(result.get("source", "")).lower()
+    if source in FALLBACK_SOURCES:
+        return FALLBACK_SOURCE_QUALITY
+    quality = SOURCE_QUALITY.get(source, DEFAULT_SOURCE_QUALITY)
+    if "uddg=" in result.get("web_url", ""):
+        # Same vendor, but seen through a search-engine snippet rather than scraped directly
+        quality -= 0.2
+    return quality
+
+
+def price_confidence(result: Dict[str, Any]) -> float:
+    if parse_display_price(result.get("price")) is None:
+        return 0.0
+    return 1.0 if result.get("enriched") else 0.8
+
+
+def rank_score(result: Dict[str, Any]) -> float:
+    return price_confidence(result) + source_quality(result)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def _prices_compatible(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    price_a = parse_display_price(a.get("price"))
+    price_b = parse_display_price(b.get("price"))
+    return price_a is None or price_b is None or abs(price_a - price_b) <= 0.01 * max(price_a, price_b)
+
+
+def _merge(group: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Best-ranked record of a duplicate group, with placeholder fields filled from the others."""
+    ordered = sorted(group, key=rank_score, reverse=True)
+    merged = dict(ordered[0])
+    for other in ordered[1:]:
+        if parse_display_price(merged.get("price")) is None and parse_display_price(other.get("price")) is not None:
+            merged["price"] = other["price"]
+        if merged.get("qty_available") in (None, "", "Check listing") and other.get("qty_available") not in (None, "", "Check listing"):
+            merged["qty_available"] = other["qty_available"]
+        if "uddg=" in merged.get("web_url", "") and "uddg=" not in other.get("web_url", "uddg="):
+            # Link straight to the vendor page rather than through the search-engine redirect
+            merged["web_url"] = other["web_url"]
+    if len(group) > 1:
+        merged["duplicates"] = len(group) - 1
+    return merged
+
+
+def deduplicate(results: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Collapse the same listing seen through several sources; returns (unique results, removed count).
+
+    Exact duplicates share a canonical URL (hash lookup). Near-duplicate titles
+    (with at least one word) from the same vendor host are found with SimHash banding: only records that
+    share a band are compared, so the pass stays close to linear in the number
+    of results.
+    """
+    count = len(results)
+    if count < 2:
+        return list(results), 0
+    uf = _UnionFind(count)
+    hosts = []
+    by_url: Dict[str, int] = {}
+    for index, result in enumerate(results):
+        key = canonicalize_url(result.get("web_url", ""))
+        hosts.append(key.split("/", 1)[0])
+        if key:
+            first = by_url.setdefault(key, index)
+            if first != index:
+                uf.union(first, index)
+
+    # A title without word tokens hashes to 0 and would match every other such title;
+    # those records are deduplicated on the canonical URL only.
+    titled = [index for index, result in enumerate(results) if _TOKEN_RE.search(str(result.get("title") or "").lower())]
+    hashes = dict(zip(titled, simhash_many([results[index]["title"] for index in titled])))
+    # Buckets hold one representative per group, so a group of identical titles costs one entry.
+    buckets: Dict[Tuple[str, int, int], List[int]] = {}
+    for index in titled:
+        value = hashes[index]
+        keys = [(hosts[index], band_index, band) for band_index, band in enumerate(_bands(value))]
+        matched = False
+        for key in keys:
+            for other in buckets.get(key, ())[-MAX_BUCKET_SCAN:]:
+                if bin(hashes[other] ^ value).count("1") <= NEAR_DUPLICATE_DISTANCE and _prices_compatible(results[other], results[index]):
+                    uf.union(other, index)
+                    matched = True
+                    break
+            if matched:
+                break
+        if not matched:
+            for key in keys:
+                buckets.setdefault(key, []).append(index)
+
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    for index, result in enumerate(results):
+        groups.setdefault(uf.find(index), []).append(result)
+    unique = [_merge(group) for _, group in sorted(groups.items())]
+    return unique, count - len(unique)
+
+
+def deduplicate_and_rank(results: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Deduplicate, then order by price confidence and source quality (stable for ties)."""
+    unique, removed = deduplicate(results)
+    unique.sort(key=rank_score, reverse=True)
+    return unique, removed
@@ -0,0 +1,101 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Dependencies that should only load on the code paths that need them.
+HEAVY_MODULES = ("openai", "requests", "bs4", "numpy", "pyarrow", "httpx", "pandas", "openpyxl", "selenium", "tiktoken")
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+_FIRST_RENDER_SCRIPT = """
+import time
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+app = AppTest.from_file("app.py", default_timeout=120).run()
+print(time.perf_counter() - started)
+"""
+
+
+class ImportRecord(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def import_times(module: str) -> List[ImportRecord]:
+    """Per-module import cost of ``import <module>`` in a fresh interpreter, as reported by ``-X importtime``."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"import {module} failed")
+    records = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            records.append(ImportRecord(match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2))
+    return records
+
+
+def import_report(module: str, top: int = 15) -> Dict[str, object]:
+    records = import_times(module)
+    by_module = {record.module: record for record in records}
+    total = by_module[module].cumulative_us if module in by_module else sum(record.self_us for record in records)
+    return {
+        "module": module,
+        "total_ms": total / 1000,
+        "modules_loaded": len(records),
+        "heavy_loaded": [name for name in HEAVY_MODULES if name in by_module],
+        "top": sorted(records, key=lambda record: record.cumulative_us, reverse=True)[:top],
+    }
+
+
+def first_render_times(runs: int = 3) -> List[float]:
+    """Seconds from starting the script to the end of app.py's first run, each in a cold interpreter."""
+    times = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", _FIRST_RENDER_SCRIPT], cwd=ROOT, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+        times.append(float(completed.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Startup diagnostics")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imports = sub.add_parser("importtime", help="import-time breakdown, like python -X importtime")
+    imports.add_argument("modules", nargs="*", default=["app"])
+    imports.add_argument("--top", type=int, default=15)
+    render = sub.add_parser("first-render", help="time app.py's first script run in a cold process")
+    render.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "first-render":
+        times = first_render_times(args.runs)
+        print(f"first render: median {statistics.median(times) * 1000:.0f} ms over {len(times)} runs "
+              f"({', '.join(f'{t * 1000:.0f}' for t in times)} ms)")
+        return 0
+
+    for module in args.modules:
+        report = import_report(module, args.top)
+        print(f"import {module}: {report['total_ms']:.1f} ms, {report['modules_loaded']} modules")
+        print(f"  heavy dependencies loaded: {', '.join(report['heavy_loaded']) or 'none'}")
+        print(f"  {'cumulative ms':>13} {'self ms':>8}  module")
+        for record in report["top"]:
+            print(f"  {record.cumulative_us / 1000:>13.1f} {record.self_us / 1000:>8.1f}  {'  ' * record.depth}{record.module}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,507 @@
 import json
+import os
 import requests
-from typing import Dict, Any, List, Optional
+import requests.adapters
+from typing import Callable, Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 import re
-from urllib.parse import quote_plus, urljoin, urlparse
+from urllib.parse import quote_plus, urlparse
 import time
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from brands import brand_key
+from browser_pool import get_browser_pool
+from dedup import deduplicate_and_rank
+from market_stats import market_summary
+from parse_pool import parse_page
+from records import ListingBatch
+from transport import MODERN_HOSTS, open_stream
+
+
+# eBay listings below this price are ignored; results are price-sorted so paging stops there.
+EBAY_MIN_PRICE = 1000.0
+EBAY_MAX_RESULTS = int(os.getenv("ATE_EBAY_MAX_RESULTS", "10"))
+EBAY_MAX_PAGES = int(os.getenv("ATE_EBAY_MAX_PAGES", "5"))
+EBAY_PAGE_CONCURRENCY = int(os.getenv("ATE_EBAY_PAGE_CONCURRENCY", "3"))
+# Minimum spacing between requests to the same host, shared by every scraper thread.
+HOST_MIN_INTERVAL = float(os.getenv("ATE_HOST_MIN_INTERVAL", "0.5"))
+
+
+class HostRateLimiter:
+    """Spaces requests to each host at least ``min_interval`` seconds apart, across threads."""
+
+    def __init__(self, min_interval: float = HOST_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+HOST_RATE_LIMITER = HostRateLimiter()
+
+# Threads fetching pages in scrape_many (batch scraping)
+SCRAPE_IO_WORKERS = int(os.getenv("ATE_SCRAPE_IO_WORKERS", "16"))
+# Pause after each scraped site, "min,max" seconds drawn uniformly (one number = fixed)
+_SCRAPE_DELAY = [float(value) for value in os.getenv("ATE_SCRAPE_DELAY", "1,2").split(",")]
+SCRAPE_DELAY_RANGE = (_SCRAPE_DELAY[0], _SCRAPE_DELAY[-1])
+
+# Most body bytes read from one page; ATE_SITE_MAX_BYTES ("site=bytes,...") sets per-site caps.
+DEFAULT_MAX_PAGE_BYTES = int(os.getenv("ATE_MAX_PAGE_BYTES", str(2 * 1024 * 1024)))
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+class FetchResult(NamedTuple):
+    status_code: int
+    content: bytes
+    wire_bytes: int
+    stopped_early: bool
+    truncated: bool
+
+
+FETCH_STATS: Dict[str, int] = {"requests": 0, "wire_bytes": 0, "bytes_saved": 0, "stopped_early": 0, "truncated": 0}
+_FETCH_STATS_LOCK = threading.Lock()
+
+
+def _record_fetch(result: FetchResult, bytes_saved: int) -> None:
+    with _FETCH_STATS_LOCK:
+        FETCH_STATS["requests"] += 1
+        FETCH_STATS["wire_bytes"] += result.wire_bytes
+        FETCH_STATS["bytes_saved"] += bytes_saved
+        FETCH_STATS["stopped_early"] += int(result.stopped_early)
+        FETCH_STATS["truncated"] += int(result.truncated)
+
+
+def get_fetch_stats() -> Dict[str, int]:
+    """Page fetch totals: requests, bytes read off the wire, and bytes skipped by early stops and caps."""
+    with _FETCH_STATS_LOCK:
+        return dict(FETCH_STATS)
+
+
+SCRAPER_POOL_SIZE = int(os.getenv("ATE_SCRAPER_POOL_SIZE", "20"))
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session() -> requests.Session:
+    """Process-wide keep-alive session, so connections opened by warm-up or earlier scrapes are reused."""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=SCRAPER_POOL_SIZE, pool_maxsize=SCRAPER_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+                })
+                _shared_session = session
+    return _shared_session
+
+
+def _parse_site_overrides(raw: Optional[str]) -> Dict[str, str]:
+    """Parse ATE_SITE_BASE_URLS ("site=url,site=url") used to point scrapers at a local replay server."""
+    overrides = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            site, url = item.split("=", 1)
+            overrides[site.strip()] = url.strip().rstrip("/")
+    return overrides
+
+
+def absolute_url(base_url: str, path: str) -> str:
+    """Absolute URL for a path (or pass-through absolute href) under a site's base URL."""
+    if path.startswith(("http://", "https://")):
+        return path
+    return f"{base_url}/{path.lstrip('/')}"
+
+
+# Page parsers are plain functions of the fetched bytes, so parse_pool can run them in
+# worker processes while the fetching threads carry on with network I/O.
+
+def extract_price_from_text(text: str) -> Optional[float]:
+    """Extract numeric price from text."""
+    if not text:
+        return None
+    
+    # Look for explicit price patterns with currency symbols first
+    currency_patterns = [
+        r'\$(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # $1,234.56
+        r'USD\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # USD 1234.56
+        r'(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)\s*USD',  # 1234.56 USD
+        r'Price:\s*\$?(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # Price: $1234
+    ]
+    
+    for pattern in currency_patterns:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        if matches:
+            try:
+                for match in matches:
+                    price = float(match.replace(',', ''))
+                    # Reasonable price range for test equipment
+                    if 10 <= price <= 1000000:
+                        return price
+            except ValueError:
+                continue
+    
+    # Don't extract model numbers as prices
+    # Common test equipment model patterns to avoid
+    model_patterns = [
+        r'\b\d{4}[A-Z]?\b',  # 8116A, 3458A, etc.
+        r'\b[A-Z]{1,3}\d{4}[A-Z]?\b',  # HP8116A, etc.
+    ]
+    
+    for pattern in model_patterns:
+        if re.search(pattern, text, re.IGNORECASE):
+            # If text looks like a model number, don't extract as price
+            if not re.search(r'\$|USD|Price|Cost', text, re.IGNORECASE):
+                return None
+    
+    return None
+
+
+def parse_duckduckgo_results(html: bytes, brand: str, model: str) -> List[Dict[str, Any]]:
+    """Listings from a DuckDuckGo HTML results page; vendor and source come from each result's target domain."""
+    results = []
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Find search result links
+    search_results = soup.find_all('a', class_='result__a')
+    
+    print(f"DEBUG: Found {len(search_results)} DuckDuckGo search results")
+    
+    for link in search_results[:10]:  # Get more results
+        try:
+            title = link.get_text(strip=True)
+            url = link.get('href', '')
+            
+            # Skip if not relevant
+            if not any(term.lower() in title.lower() for term in [brand, model]):
+                continue
+            
+            # Extract actual URL from DuckDuckGo redirect but keep DuckDuckGo format
+            actual_url = url
+            vendor_name = "Unknown"
+            source_type = "search_engine"
+            
+            # Don't extract the underlying URL, keep DuckDuckGo redirect
+            if 'uddg=' in url:
+                try:
+                    import urllib.parse
+                    parsed = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+                    if 'uddg' in parsed:
+                        underlying_url = urllib.parse.unquote(parsed['uddg'][0])
+                        # Parse the underlying URL to determine vendor and source
+                        parsed_underlying = urlparse(underlying_url)
+                        domain = parsed_underlying.netloc.lower()
+                        
+                        # Skip eBay results completely
+                        if 'ebay.com' in domain:
+                            continue
+                            
+                        if 'valuetronics.com' in domain:
+                            vendor_name = "Valuetronics"
+                            source_type = "Valuetronics"
+                        elif 'testequipment.center' in domain:
+                            vendor_name = "TestEquipment.center"
+                            source_type = "TestEquipment.center"
+                        elif 'testworld.com' in domain:
+                            vendor_name = "TestWorld"
+                            source_type = "TestWorld"
+                        elif 'amazon.com' in domain:
+                            vendor_name = "Amazon"
+                            source_type = "Amazon"
+                        elif 'keysight.com' in domain:
+                            vendor_name = "Keysight"
+                            source_type = "Keysight"
+                        elif 'agilent.com' in domain:
+                            vendor_name = "Agilent"
+                            source_type = "Agilent"
+                        else:
+                            vendor_name = domain.replace('www.', '').replace('.com', '').title()
+                            source_type = vendor_name
+                        
+                        # Keep the DuckDuckGo URL but use the underlying site's vendor info
+                        actual_url = url  # Keep DuckDuckGo redirect URL
+                except:
+                    pass
+            else:
+                # For non-DuckDuckGo URLs, determine vendor directly
+                if actual_url:
+                    parsed_url = urlparse(actual_url)
+                    domain = parsed_url.netloc.lower()
+                    
+                    # Skip eBay results completely
+                    if 'ebay.com' in domain:
+                        continue
+                        
+                    if 'valuetronics.com' in domain:
+                        vendor_name = "Valuetronics"
+                        source_type = "Valuetronics"
+                    elif 'testequipment.center' in domain:
+                        vendor_name = "TestEquipment.center"
+                        source_type = "TestEquipment.center"
+                    elif 'testworld.com' in domain:
+                        vendor_name = "TestWorld"
+                        source_type = "TestWorld"
+                    elif 'amazon.com' in domain:
+                        vendor_name = "Amazon"
+                        source_type = "Amazon"
+                    elif 'keysight.com' in domain:
+                        vendor_name = "Keysight"
+                        source_type = "Keysight"
+                    elif 'agilent.com' in domain:
+                        vendor_name = "Agilent"
+                        source_type = "Agilent"
+                    else:
+                        vendor_name = domain.replace('www.', '').replace('.com', '').title()
+                        source_type = vendor_name
+            
+            # Try to extract price from title
+            price_value = extract_price_from_text(title)
+            
+            # Only include if price > $1000 or if no price found (contact vendor)
+            if not price_value or price_value >= 1000:
+                price_display = f"${price_value:.2f}" if price_value else "Contact vendor"
+                
+                results.append({
+                    "brand": brand,
+                    "model": model,
+                    "price": price_display,
+                    "vendor": vendor_name,
+                    "web_url": f"https:{actual_url}" if actual_url.startswith("//") else actual_url,
+                    "qty_available": "Check listing",
+                    "source": source_type,
+                    "title": title
+                })
+                print(f"DEBUG: Found search result: {title[:50]}... - {vendor_name} - {price_display}")
+        
+        except Exception as e:
+            print(f"DEBUG: Error processing search result: {e}")
+            continue
+
+    return results
+
+
+def parse_ebay_page(
+    html: bytes, brand: str, model: str, seen: set, wanted: int
+) -> Tuple[List[Dict[str, Any]], Optional[float]]:
+    """Listings at or above EBAY_MIN_PRICE from one results page, plus the lowest price seen on it.
+
+    Only the ``s-item`` subtrees are built, and items are read in page order
+    until ``wanted`` listings are collected. URLs already in ``seen`` are
+    skipped; in a parse worker ``seen`` is a copy, so callers add the returned
+    URLs themselves.
+    """
+    results = []
+    lowest = None
+    strainer = SoupStrainer(class_=["s-item__wrapper", "s-item"])
+    soup = BeautifulSoup(html, 'html.parser', parse_only=strainer)
+    items = soup.find_all('div', class_='s-item__wrapper') or soup.find_all(class_='s-item')
+
+    for item in items:
+        if len(results) >= wanted:
+            break
+        try:
+            # Get the product link first
+            link_elem = item.find('a', class_='s-item__link')
+            if not link_elem:
+                continue
+
+            product_url = link_elem.get('href', '')
+            if not product_url or 'ebay.com/sch/' in product_url:  # Skip search result pages
+                continue
+
+            # Get title and price from listing
+            title_elem = item.find('h3', class_='s-item__title')
+            if not title_elem:
+                title_elem = item.find('span', class_='s-item__title')
+
+            price_elem = item.find('span', class_='s-item__price')
+            if not (title_elem and price_elem):
+                continue
+
+            title = title_elem.get_text(strip=True)
+            price_value = extract_price_from_text(price_elem.get_text(strip=True))
+            if price_value:
+                lowest = price_value if lowest is None else min(lowest, price_value)
+
+            # Skip if title doesn't contain brand/model
+            if not any(term.lower() in title.lower() for term in [brand.lower(), model.lower()]):
+                continue
+
+            # Filter by price >$1000 as requested
+            if not price_value or price_value < EBAY_MIN_PRICE:
+                continue
+
+            # Keep only the item path; the query string is tracking
+            clean_url = product_url.split('?')[0]
+            if clean_url in seen:  # eBay repeats listings across pages
+                continue
+            seen.add(clean_url)
+
+            results.append({
+                "brand": brand,
+                "model": model,
+                "price": f"${price_value:.2f}",
+                "vendor": "eBay",
+                "web_url": clean_url,
+                "qty_available": "1 available",
+                "source": "ebay",
+                "title": title
+            })
+            print(f"DEBUG: Found eBay product: {title[:50]}... - ${price_value:.2f}")
+
+        except Exception as e:
+            print(f"DEBUG: Error processing eBay item: {e}")
+            continue
+
+    return results, lowest
+
+
+def parse_valuetronics_products(html: Union[bytes, str], brand: str, model: str, base_url: str) -> Optional[List[Dict[str, Any]]]:
+    """Up to five listings from a Valuetronics search page; None when the page has no product containers."""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Look for product listings
+    products = soup.find_all('div', class_='product-item') or soup.find_all('li', class_='product')
+    if not products:
+        return None
+    
+    results = []
+    print(f"DEBUG: Found {len(products)} Valuetronics products")
+    
+    for product in products[:5]:
+        try:
+            title_elem = product.find('a', class_='product-title') or product.find('h3') or product.find('h4')
+            price_elem = product.find('span', class_='price') or product.find('div', class_='price')
+            link_elem = product.find('a')
+            
+            if title_elem and link_elem:
+                title = title_elem.get_text(strip=True)
+                product_url = absolute_url(base_url, link_elem.get('href', ''))
+                
+                # Extract price
+                price_value = None
+                if price_elem:
+                    price_value = extract_price_from_text(price_elem.get_text())
+                
+                # Only include if price > $1000 or contact vendor
+                if not price_value or price_value >= 1000:
+                    price_display = f"${price_value:.2f}" if price_value else "Contact vendor"
+                    
+                    results.append({
+                        "brand": brand,
+                        "model": model,
+                        "price": price_display,
+                        "vendor": "Valuetronics",
+                        "web_url": product_url,
+                        "qty_available": "Check listing",
+                        "source": "Valuetronics",
+                        "title": title
+                    })
+                    print(f"DEBUG: Found Valuetronics product: {title[:50]}... - {price_display}")
+            
+        except Exception as e:
+            print(f"DEBUG: Error processing Valuetronics product: {e}")
+            continue
+
+    return results
+
+
+def parse_testequipment_center_products(html: Union[bytes, str], brand: str, model: str, base_url: str) -> Optional[List[Dict[str, Any]]]:
+    """Up to five listings from a TestEquipment.center search page; None when the page has no product containers."""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Look for product listings
+    products = soup.find_all('div', class_='product') or soup.find_all('div', class_='item')
+    if not products:
+        return None
+    
+    results = []
+    print(f"DEBUG: Found {len(products)} TestEquipment.center products")
+    
+    for product in products[:5]:
+        try:
+            title_elem = product.find('h3') or product.find('h4') or product.find('a')
+            price_elem = product.find('span', class_='price') or product.find('div', class_='price')
+            link_elem = product.find('a')
+            
+            if title_elem and link_elem:
+                title = title_elem.get_text(strip=True)
+                product_url = absolute_url(base_url, link_elem.get('href', ''))
+                
+                # Extract price
+                price_value = None
+                if price_elem:
+                    price_value = extract_price_from_text(price_elem.get_text())
+                
+                # Only include if price > $1000 or contact vendor
+                if not price_value or price_value >= 1000:
+                    price_display = f"${price_value:.2f}" if price_value else "Contact vendor"
+                    
+                    results.append({
+                        "brand": brand,
+                        "model": model,
+                        "price": price_display,
+                        "vendor": "TestEquipment.center",
+                        "web_url": product_url,
+                        "qty_available": "Check listing",
+                        "source": "TestEquipment.center",
+                        "title": title
+                    })
+                    print(f"DEBUG: Found TestEquipment.center product: {title[:50]}... - {price_display}")
+            
+        except Exception as e:
+            print(f"DEBUG: Error processing TestEquipment.center product: {e}")
+            continue
+
+    return results
 
 
 class EffectiveScraper:
+    # Base URL per scraped site; ATE_SITE_BASE_URLS overrides them (e.g. for the replay server).
+    SITE_BASE_URLS = {
+        "duckduckgo": "https://duckduckgo.com",
+        "ebay": "https://m.ebay.com",
+        "valuetronics": "https://www.valuetronics.com",
+        "testequipment_center": "https://testequipment.center",
+    }
+    # Sites whose listings may render client-side; they get a headless-browser retry
+    # when the static HTML has no result containers.
+    JS_RENDER_SITES = {
+        site.strip()
+        for site in os.getenv("ATE_JS_RENDER_SITES", "valuetronics,testequipment_center").split(",")
+        if site.strip()
+    }
+    # Byte markers around each site's result container: once ``end`` follows ``start``
+    # the listings are complete and the rest of the page is not downloaded.
+    SITE_STREAM_MARKERS = {
+        "duckduckgo": (b'class="result', b'class="nav-link"'),
+        "ebay": (b's-item', b'pagination'),
+        "testequipment_center": (b'class="product', b'pagination'),
+    }
+
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
+        self.site_base_urls = dict(self.SITE_BASE_URLS)
+        self.site_base_urls.update(_parse_site_overrides(os.getenv("ATE_SITE_BASE_URLS")))
+        self.site_max_bytes = {
+            site: int(value) for site, value in _parse_site_overrides(os.getenv("ATE_SITE_MAX_BYTES")).items()
+        }
+        # Hosts fetched over the HTTP/2 + brotli/zstd backend (ATE_HTTP2_HOSTS); requests otherwise.
+        self.modern_hosts = set(MODERN_HOSTS)
+        self.session = get_shared_session()
         self.timeout = 10
-        self.delay_range = (1, 2)
+        self.delay_range = SCRAPE_DELAY_RANGE
         self.mobile_headers = {
             'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0.3 Mobile/15E148 Safari/604.1',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -27,53 +513,79 @@ class EffectiveScraper:
     
     def random_delay(self):
         time.sleep(random.uniform(*self.delay_range))
+
+    def site_url(self, site: str, path: str) -> str:
+        """Absolute URL for a path (or pass-through absolute href) on a scraped site."""
+        return absolute_url(self.site_base_urls[site], path)
+
+    def parse(self, parser: Callable[..., Any], *args: Any) -> Any:
+        """Run a page parser on the shared parse pool (ATE_PARSE_WORKERS), or inline when there is none."""
+        return parse_page(parser, *args)
+
+    def fetch_page(self, site: Optional[str], url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        """GET ``url`` as a stream, stopping at the site's byte cap or once its result container is complete.
+
+        Content-Encoding is decoded chunk by chunk as the body arrives, and the
+        returned content may be a page prefix; html.parser copes with the
+        unclosed tags. Hosts in ``modern_hosts`` go through the httpx backend.
+        """
+        max_bytes = self.site_max_bytes.get(site, DEFAULT_MAX_PAGE_BYTES)
+        markers = self.SITE_STREAM_MARKERS.get(site)
+        body = bytearray()
+        stopped_early = truncated = False
+        with open_stream(self.session, url, headers, self.timeout, self.modern_hosts) as response:
+            if response.status_code == 200:
+                start_at = -1
+                scanned = 0
+                for chunk in response.iter_chunks(STREAM_CHUNK_SIZE):
+                    body += chunk
+                    if markers:
+                        start, end = markers
+                        if start_at < 0:
+                            start_at = body.find(start, max(0, scanned - len(start)))
+                        if start_at >= 0 and body.find(end, max(start_at + len(start), scanned - len(end))) >= 0:
+                            stopped_early = True
+                            break
+                        scanned = len(body)
+                    if len(body) >= max_bytes:
+                        truncated = True
+                        del body[max_bytes:]
+                        break
+            wire_bytes = response.wire_bytes()
+            content_length = response.headers.get("Content-Length", "")
+            result = FetchResult(response.status_code, bytes(body), wire_bytes, stopped_early, truncated)
+
+        bytes_saved = 0
+        if (stopped_early or truncated) and content_length.isdigit():
+            bytes_saved = max(0, int(content_length) - wire_bytes)
+            print(f"DEBUG: Stopped {site or urlparse(url).netloc} download after {wire_bytes} bytes, saved {bytes_saved}")
+        _record_fetch(result, bytes_saved)
+        return result
+
+    def render_fallback(self, site: str, url: str, wait_selector: Optional[str] = None) -> Optional[str]:
+        """Rendered HTML of a page from the warm headless-browser pool, for when static HTML had no containers.
+
+        Returns None when the site is not configured for rendering or no warm
+        browser is available; browsers are never launched on the request path.
+        """
+        if site not in self.JS_RENDER_SITES:
+            return None
+        html = get_browser_pool().render(url, wait_selector=wait_selector)
+        if not html:
+            return None
+        print(f"DEBUG: Rendered {site} page with headless browser")
+        return html
     
     def extract_price_from_text(self, text: str) -> Optional[float]:
         """Extract numeric price from text."""
-        if not text:
-            return None
-        
-        # Look for explicit price patterns with currency symbols first
-        currency_patterns = [
-            r'\$(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # $1,234.56
-            r'USD\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # USD 1234.56
-            r'(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)\s*USD',  # 1234.56 USD
-            r'Price:\s*\$?(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',  # Price: $1234
-        ]
-        
-        for pattern in currency_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                try:
-                    for match in matches:
-                        price = float(match.replace(',', ''))
-                        # Reasonable price range for test equipment
-                        if 10 <= price <= 1000000:
-                            return price
-                except ValueError:
-                    continue
-        
-        # Don't extract model numbers as prices
-        # Common test equipment model patterns to avoid
-        model_patterns = [
-            r'\b\d{4}[A-Z]?\b',  # 8116A, 3458A, etc.
-            r'\b[A-Z]{1,3}\d{4}[A-Z]?\b',  # HP8116A, etc.
-        ]
-        
-        for pattern in model_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                # If text looks like a model number, don't extract as price
-                if not re.search(r'\$|USD|Price|Cost', text, re.IGNORECASE):
-                    return None
-        
-        return None
+        return extract_price_from_text(text)
     
     def scrape_duckduckgo_search(self, brand: str, model: str) -> List[Dict[str, Any]]:
         """Use DuckDuckGo search to find product listings."""
         results = []
         try:
             query = f"{brand} {model} price buy"
-            search_url = f"https://duckduckgo.com/html/?q={quote_plus(query)}"
+            search_url = self.site_url("duckduckgo", f"/html/?q={quote_plus(query)}")
             
             print(f"DEBUG: Searching DuckDuckGo for {query}")
             
@@ -85,127 +597,13 @@ class EffectiveScraper:
                 'Connection': 'keep-alive',
             }
             
-            response = self.session.get(search_url, timeout=self.timeout, headers=headers)
+            response = self.fetch_page("duckduckgo", search_url, headers=headers)
             
             if response.status_code != 200:
                 print(f"DEBUG: DuckDuckGo returned status {response.status_code}")
                 return results
                 
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find search result links
-            search_results = soup.find_all('a', class_='result__a')
-            
-            print(f"DEBUG: Found {len(search_results)} DuckDuckGo search results")
-            
-            for link in search_results[:10]:  # Get more results
-                try:
-                    title = link.get_text(strip=True)
-                    url = link.get('href', '')
-                    
-                    # Skip if not relevant
-                    if not any(term.lower() in title.lower() for term in [brand, model]):
-                        continue
-                    
-                    # Extract actual URL from DuckDuckGo redirect but keep DuckDuckGo format
-                    actual_url = url
-                    vendor_name = "Unknown"
-                    source_type = "search_engine"
-                    
-                    # Don't extract the underlying URL, keep DuckDuckGo redirect
-                    if 'uddg=' in url:
-                        try:
-                            import urllib.parse
-                            parsed = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
-                            if 'uddg' in parsed:
-                                underlying_url = urllib.parse.unquote(parsed['uddg'][0])
-                                # Parse the underlying URL to determine vendor and source
-                                parsed_underlying = urlparse(underlying_url)
-                                domain = parsed_underlying.netloc.lower()
-                                
-                                # Skip eBay results completely
-                                if 'ebay.com' in domain:
-                                    continue
-                                    
-                                if 'valuetronics.com' in domain:
-                                    vendor_name = "Valuetronics"
-                                    source_type = "Valuetronics"
-                                elif 'testequipment.center' in domain:
-                                    vendor_name = "TestEquipment.center"
-                                    source_type = "TestEquipment.center"
-                                elif 'testworld.com' in domain:
-                                    vendor_name = "TestWorld"
-                                    source_type = "TestWorld"
-                                elif 'amazon.com' in domain:
-                                    vendor_name = "Amazon"
-                                    source_type = "Amazon"
-                                elif 'keysight.com' in domain:
-                                    vendor_name = "Keysight"
-                                    source_type = "Keysight"
-                                elif 'agilent.com' in domain:
-                                    vendor_name = "Agilent"
-                                    source_type = "Agilent"
-                                else:
-                                    vendor_name = domain.replace('www.', '').replace('.com', '').title()
-                                    source_type = vendor_name
-                                
-                                # Keep the DuckDuckGo URL but use the underlying site's vendor info
-                                actual_url = url  # Keep DuckDuckGo redirect URL
-                        except:
-                            pass
-                    else:
-                        # For non-DuckDuckGo URLs, determine vendor directly
-                        if actual_url:
-                            parsed_url = urlparse(actual_url)
-                            domain = parsed_url.netloc.lower()
-                            
-                            # Skip eBay results completely
-                            if 'ebay.com' in domain:
-                                continue
-                                
-                            if 'valuetronics.com' in domain:
-                                vendor_name = "Valuetronics"
-                                source_type = "Valuetronics"
-                            elif 'testequipment.center' in domain:
-                                vendor_name = "TestEquipment.center"
-                                source_type = "TestEquipment.center"
-                            elif 'testworld.com' in domain:
-                                vendor_name = "TestWorld"
-                                source_type = "TestWorld"
-                            elif 'amazon.com' in domain:
-                                vendor_name = "Amazon"
-                                source_type = "Amazon"
-                            elif 'keysight.com' in domain:
-                                vendor_name = "Keysight"
-                                source_type = "Keysight"
-                            elif 'agilent.com' in domain:
-                                vendor_name = "Agilent"
-                                source_type = "Agilent"
-                            else:
-                                vendor_name = domain.replace('www.', '').replace('.com', '').title()
-                                source_type = vendor_name
-                    
-                    # Try to extract price from title
-                    price_value = self.extract_price_from_text(title)
-                    
-                    # Only include if price > $1000 or if no price found (contact vendor)
-                    if not price_value or price_value >= 1000:
-                        price_display = f"${price_value:.2f}" if price_value else "Contact vendor"
-                        
-                        results.append({
-                            "brand": brand,
-                            "model": model,
-                            "price": price_display,
-                            "vendor": vendor_name,
-                            "web_url": f"https:{actual_url}" if actual_url.startswith("//") else actual_url,
-                            "qty_available": "Check listing",
-                            "source": source_type
-                        })
-                        print(f"DEBUG: Found search result: {title[:50]}... - {vendor_name} - {price_display}")
-                
-                except Exception as e:
-                    print(f"DEBUG: Error processing search result: {e}")
-                    continue
+            results = self.parse(parse_duckduckgo_results, response.content, brand, model)
             
             self.random_delay()
             
@@ -214,88 +612,79 @@ class EffectiveScraper:
         
         return results
     
-    def scrape_ebay_mobile(self, brand: str, model: str) -> List[Dict[str, Any]]:
-        """Scrape eBay mobile for individual product listings."""
-        results = []
+    def _fetch_ebay_page(self, query: str, page: int) -> Optional[bytes]:
+        """One price-sorted (highest first) eBay mobile results page, spaced by the per-host rate limit."""
+        path = f"/sch/i.html?_nkw={quote_plus(query)}&_sop=16"
+        if page > 1:
+            path += f"&_pgn={page}"
+        url = self.site_url("ebay", path)
+        HOST_RATE_LIMITER.wait(urlparse(url).netloc)
+        response = self.fetch_page("ebay", url, headers=self.mobile_headers)
+        if response.status_code != 200:
+            print(f"DEBUG: eBay mobile page {page} returned status {response.status_code}")
+            return None
+        return response.content
+
+    def scrape_ebay_mobile(
+        self,
+        brand: str,
+        model: str,
+        max_results: int = EBAY_MAX_RESULTS,
+        max_pages: int = EBAY_MAX_PAGES,
+        concurrency: int = EBAY_PAGE_CONCURRENCY,
+    ) -> List[Dict[str, Any]]:
+        """Scrape eBay mobile for individual product listings across result pages.
+
+        Results are sorted by price, highest first, so paging stops as soon as
+        ``max_results`` listings are collected or a page reaches prices below
+        EBAY_MIN_PRICE. Page 1 is fetched alone (it usually settles the search);
+        later pages are fetched ``concurrency`` at a time under the per-host
+        rate limit and consumed in page order.
+        """
+        results: List[Dict[str, Any]] = []
+        seen: set = set()
+        query = f"{brand} {model}"
+        print(f"DEBUG: Searching mobile eBay for {query}")
+
+        page = 1
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="ebay-page")
         try:
-            query = f"{brand} {model}"
-            # Use mobile eBay with sorting by price (highest first to find >$1000 items)
-            search_url = f"https://m.ebay.com/sch/i.html?_nkw={quote_plus(query)}&_sop=16"  # Sort by price: highest first
-            
-            print(f"DEBUG: Searching mobile eBay for {query}")
-            
-            response = self.session.get(search_url, timeout=self.timeout, headers=self.mobile_headers)
-            
-            if response.status_code != 200:
-                print(f"DEBUG: eBay mobile returned status {response.status_code}")
-                return results
-                
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Mobile eBay item selectors
-            items = soup.find_all('div', class_='s-item__wrapper')
-            if not items:
-                items = soup.find_all('div', class_='s-item')
-            
-            print(f"DEBUG: Found {len(items)} eBay mobile listings")
-            
-            for item in items[:10]:  # Check more items
-                try:
-                    # Get the product link first
-                    link_elem = item.find('a', class_='s-item__link')
-                    if not link_elem:
-                        continue
-                    
-                    product_url = link_elem.get('href', '')
-                    if not product_url or 'ebay.com/sch/' in product_url:  # Skip search result pages
-                        continue
-                    
-                    # Get title and price from listing
-                    title_elem = item.find('h3', class_='s-item__title')
-                    if not title_elem:
-                        title_elem = item.find('span', class_='s-item__title')
-                    
-                    price_elem = item.find('span', class_='s-item__price')
-                    
-                    if title_elem and price_elem:
-                        title = title_elem.get_text(strip=True)
-                        price_text = price_elem.get_text(strip=True)
-                        
-                        # Skip if title doesn't contain brand/model
-                        if not any(term.lower() in title.lower() for term in [brand.lower(), model.lower()]):
-                            continue
-                        
-                        # Extract price
-                        price_value = self.extract_price_from_text(price_text)
-                        
-                        # Filter by price >$1000 as requested
-                        if price_value and price_value >= 1000:
-                            # Clean the URL to ensure it's a product page
-                            clean_url = product_url
-                            if '?' in clean_url:
-                                # Keep only essential parameters
-                                clean_url = product_url.split('?')[0]
-                            
-                            results.append({
-                                "brand": brand,
-                                "model": model,
-                                "price": f"${price_value:.2f}",
-                                "vendor": "eBay",
-                                "web_url": clean_url,
-                                "qty_available": "1 available",
-                                "source": "ebay"
-                            })
-                            print(f"DEBUG: Found eBay product: {title[:50]}... - ${price_value:.2f}")
-                
-                except Exception as e:
-                    print(f"DEBUG: Error processing eBay item: {e}")
-                    continue
-            
-            self.random_delay()
-            
+            while page <= max_pages:
+                wave = list(range(page, min(max_pages, page + (1 if page == 1 else concurrency) - 1) + 1))
+                futures = [executor.submit(self._fetch_ebay_page, query, number) for number in wave]
+                done = False
+                for number, future in zip(wave, futures):
+                    try:
+                        html = future.result()
+                    except Exception as e:
+                        print(f"DEBUG: eBay mobile page {number} error: {e}")
+                        html = None
+                    if not html:
+                        done = True
+                        break
+                    found, lowest = self.parse(parse_ebay_page, html, brand, model, seen, max_results - len(results))
+                    seen.update(result["web_url"] for result in found)
+                    results.extend(found)
+                    print(f"DEBUG: eBay page {number}: {len(found)} listings (lowest price {lowest})")
+                    if len(results) >= max_results:
+                        print(f"DEBUG: eBay collected {len(results)} listings, stopping at page {number}")
+                        done = True
+                        break
+                    if lowest is None or lowest < EBAY_MIN_PRICE:
+                        # Price-sorted: every later page is below the threshold (or the results ran out)
+                        print(f"DEBUG: eBay page {number} reached prices below ${EBAY_MIN_PRICE:.0f}, stopping")
+                        done = True
+                        break
+                if done:
+                    for future in futures:
+                        future.cancel()
+                    break
+                page = wave[-1] + 1
         except Exception as e:
             print(f"DEBUG: eBay mobile scraping error: {e}")
-        
+        finally:
+            executor.shutdown(wait=False)
+
         return results
     
     def scrape_valuetronics(self, brand: str, model: str) -> List[Dict[str, Any]]:
@@ -306,54 +695,20 @@ class EffectiveScraper:
             search_terms = [f"{brand}+{model}", f"{brand}%20{model}", f"{model}"]
             
             for search_term in search_terms:
-                search_url = f"https://www.valuetronics.com/search.php?search_query={search_term}"
+                search_url = self.site_url("valuetronics", f"/search.php?search_query={search_term}")
                 
                 print(f"DEBUG: Searching Valuetronics for {search_term}")
                 
-                response = self.session.get(search_url, timeout=self.timeout, headers=self.session.headers)
+                response = self.fetch_page("valuetronics", search_url)
                 
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    
-                    # Look for product listings
-                    products = soup.find_all('div', class_='product-item') or soup.find_all('li', class_='product')
-                    
-                    if products:
-                        print(f"DEBUG: Found {len(products)} Valuetronics products")
-                        
-                        for product in products[:5]:
-                            try:
-                                title_elem = product.find('a', class_='product-title') or product.find('h3') or product.find('h4')
-                                price_elem = product.find('span', class_='price') or product.find('div', class_='price')
-                                link_elem = product.find('a')
-                                
-                                if title_elem and link_elem:
-                                    title = title_elem.get_text(strip=True)
-                                    product_url = urljoin('https://www.valuetronics.com', link_elem.get('href', ''))
-                                    
-                                    # Extract price
-                                    price_value = None
-                                    if price_elem:
-                                        price_value = self.extract_price_from_text(price_elem.get_text())
-                                    
-                                    # Only include if price > $1000 or contact vendor
-                                    if not price_value or price_value >= 1000:
-                                        price_display = f"${price_value:.2f}" if price_value else "Contact vendor"
-                                        
-                                        results.append({
-                                            "brand": brand,
-                                            "model": model,
-                                            "price": price_display,
-                                            "vendor": "Valuetronics",
-                                            "web_url": product_url,
-                                            "qty_available": "Check listing",
-                                            "source": "Valuetronics"
-                                        })
-                                        print(f"DEBUG: Found Valuetronics product: {title[:50]}... - {price_display}")
-                                
-                            except Exception as e:
-                                print(f"DEBUG: Error processing Valuetronics product: {e}")
-                                continue
+                    base_url = self.site_base_urls["valuetronics"]
+                    found = self.parse(parse_valuetronics_products, response.content, brand, model, base_url)
+                    if found is None:
+                        rendered = self.render_fallback("valuetronics", search_url, "div.product-item, li.product")
+                        if rendered is not None:
+                            found = self.parse(parse_valuetronics_products, rendered, brand, model, base_url)
+                    results.extend(found or [])
                 
                 if results:
                     break  # Found results, no need to try more search terms
@@ -369,53 +724,20 @@ class EffectiveScraper:
         """Scrape TestEquipment.center directly."""
         results = []
         try:
-            search_url = f"https://testequipment.center/search?q={quote_plus(f'{brand} {model}')}"
+            search_url = self.site_url("testequipment_center", f"/search?q={quote_plus(f'{brand} {model}')}")
             
             print(f"DEBUG: Searching TestEquipment.center for {brand} {model}")
             
-            response = self.session.get(search_url, timeout=self.timeout, headers=self.session.headers)
+            response = self.fetch_page("testequipment_center", search_url)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Look for product listings
-                products = soup.find_all('div', class_='product') or soup.find_all('div', class_='item')
-                
-                print(f"DEBUG: Found {len(products)} TestEquipment.center products")
-                
-                for product in products[:5]:
-                    try:
-                        title_elem = product.find('h3') or product.find('h4') or product.find('a')
-                        price_elem = product.find('span', class_='price') or product.find('div', class_='price')
-                        link_elem = product.find('a')
-                        
-                        if title_elem and link_elem:
-                            title = title_elem.get_text(strip=True)
-                            product_url = urljoin('https://testequipment.center', link_elem.get('href', ''))
-                            
-                            # Extract price
-                            price_value = None
-                            if price_elem:
-                                price_value = self.extract_price_from_text(price_elem.get_text())
-                            
-                            # Only include if price > $1000 or contact vendor
-                            if not price_value or price_value >= 1000:
-                                price_display = f"${price_value:.2f}" if price_value else "Contact vendor"
-                                
-                                results.append({
-                                    "brand": brand,
-                                    "model": model,
-                                    "price": price_display,
-                                    "vendor": "TestEquipment.center",
-                                    "web_url": product_url,
-                                    "qty_available": "Check listing",
-                                    "source": "TestEquipment.center"
-                                })
-                                print(f"DEBUG: Found TestEquipment.center product: {title[:50]}... - {price_display}")
-                        
-                    except Exception as e:
-                        print(f"DEBUG: Error processing TestEquipment.center product: {e}")
-                        continue
+                base_url = self.site_base_urls["testequipment_center"]
+                found = self.parse(parse_testequipment_center_products, response.content, brand, model, base_url)
+                if found is None:
+                    rendered = self.render_fallback("testequipment_center", search_url, "div.product, div.item")
+                    if rendered is not None:
+                        found = self.parse(parse_testequipment_center_products, rendered, brand, model, base_url)
+                results.extend(found or [])
             
             self.random_delay()
             
@@ -435,12 +757,14 @@ class EffectiveScraper:
             'tektronix': (1100, 20000),
             'fluke': (1000, 5000),
             'rohde': (2000, 30000),
+            'rohde & schwarz': (2000, 30000),
             'anritsu': (3000, 50000),
             'default': (1000, 10000)
         }
         
-        brand_lower = brand.lower()
-        min_price, max_price = price_ranges.get(brand_lower, price_ranges['default'])
+        # The quoted spelling first (legacy Agilent models keep their range), then the canonical brand
+        brand_lower = brand.strip().lower()
+        min_price, max_price = price_ranges.get(brand_lower) or price_ranges.get(brand_key(brand), price_ranges['default'])
         
         # Generate realistic price (always >$1000)
         base_price = random.uniform(max(min_price, 1000), max_price)
@@ -496,6 +820,11 @@ class EffectiveScraper:
         all_results.extend(search_results)
         print(f"Found {len(search_results)} results from search engines")
         
+        # eBay listings, paged until enough qualifying items are found
+        ebay_results = self.scrape_ebay_mobile(brand, model)
+        all_results.extend(ebay_results)
+        print(f"Found {len(ebay_results)} results from eBay")
+        
         # Try Valuetronics directly
         valuetronics_results = self.scrape_valuetronics(brand, model)
         all_results.extend(valuetronics_results)
@@ -506,6 +835,11 @@ class EffectiveScraper:
         all_results.extend(testequipment_results)
         print(f"Found {len(testequipment_results)} results from TestEquipment.center")
         
+        # The same listing often arrives via DuckDuckGo and a direct scrape; collapse and rank
+        all_results, duplicates_removed = deduplicate_and_rank(all_results)
+        if duplicates_removed:
+            print(f"Removed {duplicates_removed} duplicate results")
+        
         # Count results by source (dynamically count actual sources)
         source_counts = {}
         
@@ -533,11 +867,56 @@ class EffectiveScraper:
         return {
             "search_results": all_results,
             "total_found": len(all_results),
+            "duplicates_removed": duplicates_removed,
             "sources": source_counts
         }
 
 
-def scrape_effective_sites(brand: str, model: str, options: List[str] = None) -> Dict[str, Any]:
-    """Main function to scrape with effective methods."""
+def scrape_effective_sites(brand: str, model: str, options: List[str] = None, batched: bool = False) -> Dict[str, Any]:
+    """Main function to scrape with effective methods.
+
+    With ``batched``, ``search_results`` is a ``records.ListingBatch`` instead
+    of a list of dicts, for callers that keep many payloads.
+    """
     scraper = EffectiveScraper()
-    return scraper.scrape_comprehensive(brand, model)
+    results = scraper.scrape_comprehensive(brand, model)
+    if batched:
+        results["search_results"] = ListingBatch.from_dicts(results["search_results"])
+    # Numeric prices, outlier flags and min/median/percentiles, overall and per vendor
+    results["price_stats"] = market_summary(results["search_results"])
+    return results
+
+
+def scrape_many(
+    pairs: Iterable[Tuple[str, str]],
+    workers: int = SCRAPE_IO_WORKERS,
+    batched: bool = False,
+) -> Iterator[Tuple[str, str, Optional[Dict[str, Any]]]]:
+    """``scrape_effective_sites`` for many (brand, model) pairs; yields (brand, model, payload) as each finishes.
+
+    ``workers`` threads do the network I/O. With ATE_PARSE_WORKERS set, their
+    pages are parsed in the process pool, so fetching is not held up by the
+    GIL. At most ``2 * workers`` pairs are queued at a time, so a long input
+    iterator is consumed as results are taken. A failed pair yields None.
+    ``batched`` is passed to ``scrape_effective_sites``, so listings are
+    converted to a ``records.ListingBatch`` on the I/O threads.
+    """
+    def scrape(pair: Tuple[str, str]) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        brand, model = pair
+        try:
+            return brand, model, scrape_effective_sites(brand, model, batched=batched)
+        except Exception as e:
+            print(f"DEBUG: Scrape failed for {brand} {model}: {e}")
+            return brand, model, None
+
+    pairs = iter(pairs)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scrape-io") as executor:
+        pending = set()
+        for pair in pairs:
+            pending.add(executor.submit(scrape, pair))
+            if len(pending) >= 2 * max(1, workers):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Union
+from urllib.parse import parse_qs, unquote, urlparse
+
+from bs4 import BeautifulSoup
+
+from cache import TTLCache
+from effective_scraper import EffectiveScraper
+from market_stats import market_summary
+
+
+ENRICH_ENABLED = os.getenv("ATE_ENRICH_DETAILS", "1") != "0"
+ENRICH_MAX_WORKERS = int(os.getenv("ATE_ENRICH_WORKERS", "4"))
+ENRICH_TIME_BUDGET = float(os.getenv("ATE_ENRICH_TIME_BUDGET", "8"))
+ENRICH_CACHE_TTL = float(os.getenv("ATE_ENRICH_CACHE_TTL", "3600"))
+
+# Display values the search-result scrapers use when a snippet had no real data.
+PLACEHOLDER_PRICES = {"Contact vendor", "Price not available", ""}
+PLACEHOLDER_QTY = {"Check listing", "Quantity not available", ""}
+
+# Detail-page facts per URL: {"price": float or None, "qty_available": str or None}
+DETAIL_CACHE = TTLCache(ttl=ENRICH_CACHE_TTL, max_entries=5000)
+
+_QTY_PATTERNS = [
+    re.compile(r'(\d[\d,]*)\s+(?:available|in stock)\b', re.IGNORECASE),
+    re.compile(r'(?:qty|quantity)(?:\s+available)?\s*[:=]\s*(\d[\d,]*)', re.IGNORECASE),
+]
+_OUT_OF_STOCK_RE = re.compile(r'\b(?:out of stock|sold out|no longer available)\b', re.IGNORECASE)
+_IN_STOCK_RE = re.compile(r'\bin stock\b', re.IGNORECASE)
+
+
+def _fetch_url(web_url: str) -> str:
+    """URL to fetch for a result; DuckDuckGo redirects are unwrapped to the vendor page."""
+    if "uddg=" in web_url:
+        target = parse_qs(urlparse(web_url).query).get("uddg")
+        if target:
+            return unquote(target[0])
+    return web_url
+
+
+def _iter_offers(node: Any):
+    """Yield every schema.org Offer-like dict inside a JSON-LD document."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _iter_offers(item)
+    elif isinstance(node, dict):
+        if "price" in node or "lowPrice" in node or "availability" in node:
+            yield node
+        for key in ("offers", "@graph", "mainEntity"):
+            if key in node:
+                yield from _iter_offers(node[key])
+
+
+def _availability_label(value: str) -> Optional[str]:
+    value = value.rsplit("/", 1)[-1].lower()
+    if value in ("instock", "limitedavailability", "onlineonly", "instoreonly"):
+        return "In stock"
+    if value in ("outofstock", "soldout", "discontinued"):
+        return "Out of stock"
+    if value in ("preorder", "backorder"):
+        return "Backorder"
+    return None
+
+
+def extract_listing_details(html: Union[str, bytes], scraper: EffectiveScraper) -> Dict[str, Any]:
+    """Pull a numeric price and stock/quantity from a product detail page.
+
+    Tries JSON-LD offers, then schema.org microdata and price meta tags. The
+    price comes only from those structured sources: the first dollar amount in
+    the page text is as likely to be shipping, financing or a related item.
+    Stock and quantity fall back to the page text.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    price = None
+    qty = None
+
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        for offer in _iter_offers(data):
+            if price is None:
+                raw = offer.get("price", offer.get("lowPrice"))
+                try:
+                    price = float(str(raw).replace(",", "")) if raw not in (None, "") else None
+                except ValueError:
+                    price = None
+            if qty is None:
+                level = offer.get("inventoryLevel")
+                if isinstance(level, dict) and level.get("value") not in (None, ""):
+                    qty = f"{level['value']} available"
+                elif offer.get("availability"):
+                    qty = _availability_label(str(offer["availability"]))
+
+    if price is None:
+        tag = (soup.find(attrs={"itemprop": "price"})
+               or soup.find('meta', attrs={"property": "product:price:amount"})
+               or soup.find('meta', attrs={"property": "og:price:amount"}))
+        if tag is not None:
+            raw = tag.get("content") or tag.get_text(strip=True)
+            try:
+                price = float(str(raw).replace(",", "").replace("$", ""))
+            except ValueError:
+                price = scraper.extract_price_from_text(raw)
+    if qty is None:
+        tag = soup.find(attrs={"itemprop": "availability"})
+        if tag is not None:
+            qty = _availability_label(tag.get("content") or tag.get("href") or tag.get_text(strip=True))
+
+    if qty is None:
+        text = soup.get_text(" ", strip=True)
+        for pattern in _QTY_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                qty = f"{match.group(1).replace(',', '')} available"
+                break
+        else:
+            if _OUT_OF_STOCK_RE.search(text):
+                qty = "Out of stock"
+            elif _IN_STOCK_RE.search(text):
+                qty = "In stock"
+
+    return {"price": price, "qty_available": qty}
+
+
+def _needs_enrichment(result: Dict[str, Any]) -> bool:
+    url = result.get("web_url", "")
+    if not url.startswith(("http://", "https://")):
+        return False
+    return result.get("price", "") in PLACEHOLDER_PRICES or result.get("qty_available", "") in PLACEHOLDER_QTY
+
+
+def _fetch_details(scraper: EffectiveScraper, url: str) -> Dict[str, Any]:
+    details = DETAIL_CACHE.get(url)
+    if details is not None:
+        return details
+    response = scraper.fetch_page(None, url)
+    if response.status_code != 200:
+        # Not cached: a transient 429 or 503 should not hide the listing's details for ATE_ENRICH_CACHE_TTL
+        return {"price": None, "qty_available": None}
+    details = extract_listing_details(response.content, scraper)
+    DETAIL_CACHE.set(url, details)
+    return details
+
+
+def enrich_results(
+    results: List[Dict[str, Any]],
+    max_workers: int = ENRICH_MAX_WORKERS,
+    time_budget: float = ENRICH_TIME_BUDGET,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Fill placeholder price/quantity from each listing's detail page.
+
+    Detail pages are fetched with at most ``max_workers`` in flight and cached
+    per URL. Fetches still pending when ``time_budget`` runs out are
+    abandoned and those results are returned unchanged.
+    """
+    enriched = [dict(result) for result in results]
+    pending = {}
+    for index, result in enumerate(enriched):
+        if _needs_enrichment(result):
+            pending.setdefault(_fetch_url(result["web_url"]), []).append(index)
+    if not pending:
+        return enriched
+
+    scraper = EffectiveScraper()
+    deadline = time.monotonic() + time_budget
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="enrich")
+    futures = {executor.submit(_fetch_details, scraper, url): url for url in pending}
+    done_count = 0
+    try:
+        remaining = set(futures)
+        while remaining:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                print(f"DEBUG: Enrichment time budget exhausted, {len(remaining)} pages skipped")
+                break
+            finished, remaining = wait(remaining, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done_count += 1
+                url = futures[future]
+                try:
+                    details = future.result()
+                except Exception as e:
+                    print(f"DEBUG: Enrichment fetch failed for {url}: {e}")
+                    continue
+                for index in pending[url]:
+                    result = enriched[index]
+                    if details["price"] is not None and result.get("price", "") in PLACEHOLDER_PRICES:
+                        result["price"] = f"${details['price']:.2f}"
+                        result["enriched"] = True
+                    if details["qty_available"] and result.get("qty_available", "") in PLACEHOLDER_QTY:
+                        result["qty_available"] = details["qty_available"]
+                        result["enriched"] = True
+            if progress is not None:
+                progress(done_count / len(futures), f"Checked {done_count}/{len(futures)} listing pages")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return enriched
+
+
+def enrich_scraping_results(scraping: Dict[str, Any], progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+    """Job entry point: enriched copy of a ``scrape_effective_sites`` payload."""
+    updated = dict(scraping)
+    updated["search_results"] = enrich_results(scraping.get("search_results", []), progress=progress)
+    # Detail pages can replace placeholder prices, so the statistics are recomputed
+    updated["price_stats"] = market_summary(updated["search_results"])
+    updated["enriched"] = True
+    return updated
@@ -0,0 +1,207 @@
+import itertools
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 5
+PRIORITY_BATCH = 10
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+DEFAULT_WORKERS = int(os.getenv("ATE_JOB_WORKERS", "8"))
+DEFAULT_RESULT_TTL = float(os.getenv("ATE_JOB_RESULT_TTL", "1800"))
+
+
+class Job:
+    """One unit of background work with progress state and its stored result."""
+
+    def __init__(self, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any], priority: int, key: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = STATUS_QUEUED
+        self.progress = 0.0
+        self.message = "Queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+
+    def update(self, progress: float, message: Optional[str] = None) -> None:
+        """Progress callback handed to the job function as ``progress=``."""
+        self.progress = max(0.0, min(1.0, float(progress)))
+        if message is not None:
+            self.message = message
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (STATUS_DONE, STATUS_FAILED)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "key": self.key,
+            "priority": self.priority,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """Priority worker pool with job IDs, progress and result storage.
+
+    Lower priority numbers run first, so interactive Analyze requests overtake
+    queued batch work. Jobs submitted with the same ``key`` while one is queued
+    or running (or finished within ``result_ttl``) share that job, so many
+    sessions asking for the same equipment trigger one pipeline run.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, result_ttl: float = DEFAULT_RESULT_TTL):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._stats = {"submitted": 0, "deduplicated": 0, "completed": 0, "failed": 0}
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: int = PRIORITY_INTERACTIVE,
+        key: Optional[str] = None,
+        reuse_finished: bool = True,
+        **kwargs: Any,
+    ) -> str:
+        """Queue ``fn(*args, progress=job.update, **kwargs)`` and return its job ID.
+
+        A job already submitted under ``key`` is returned instead, unless it
+        failed. With ``reuse_finished=False`` only a queued or running job is
+        joined, for callers that keep the results worth reusing in their own
+        cache.
+        """
+        with self._lock:
+            self._prune()
+            if key is not None:
+                existing = self._jobs.get(self._by_key.get(key, ""))
+                reusable = existing is not None and existing.status != STATUS_FAILED
+                if reusable and (reuse_finished or not existing.finished):
+                    self._stats["deduplicated"] += 1
+                    return existing.id
+            job = Job(fn, args, kwargs, priority, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+            self._stats["submitted"] += 1
+        self._queue.put((priority, next(self._counter), job))
+        return job.id
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def find(self, key: str) -> Optional[Job]:
+        """Latest job submitted under ``key``, so a new session can reconnect to running work."""
+        with self._lock:
+            return self._jobs.get(self._by_key.get(key, ""))
+
+    def forget(self, key: str, job_id: Optional[str] = None) -> None:
+        """Drop the key mapping so the next submit under ``key`` starts a fresh job.
+
+        With ``job_id``, only while the key still maps to that job.
+        """
+        with self._lock:
+            if job_id is None or self._by_key.get(key) == job_id:
+                self._by_key.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            stats = dict(self._stats)
+        stats.update({
+            "workers": self.workers,
+            "queued": statuses.count(STATUS_QUEUED),
+            "running": statuses.count(STATUS_RUNNING),
+            "stored": len(statuses),
+        })
+        return stats
+
+    def _prune(self) -> None:
+        """Drop finished jobs older than result_ttl. Caller holds the lock."""
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and (job.finished_at or 0) < cutoff]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if job.key is not None and self._by_key.get(job.key) == job_id:
+                del self._by_key[job.key]
+
+    def _worker(self) -> None:
+        while True:
+            _, _, job = self._queue.get()
+            job.status = STATUS_RUNNING
+            job.started_at = time.time()
+            job.message = "Running"
+            status = STATUS_DONE
+            try:
+                job.result = job.fn(*job.args, progress=job.update, **job.kwargs)
+                job.progress = 1.0
+            except Exception as e:
+                job.error = str(e) or e.__class__.__name__
+                status = STATUS_FAILED
+                print(f"DEBUG: Job {job.id} failed: {e}\n{traceback.format_exc()}")
+            finally:
+                job.fn = None
+                job.args = ()
+                job.kwargs = {}
+                # finished_at before the status, under the lock, so _prune never sees a finished job without it
+                with self._lock:
+                    job.finished_at = time.time()
+                    job.status = status
+                    self._stats["completed" if status == STATUS_DONE else "failed"] += 1
+                job._done.set()
+                self._queue.task_done()
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide job queue shared by every Streamlit session."""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
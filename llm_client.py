@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import OpenAI
+
+
+MAX_CONNECTIONS = int(os.getenv("ATE_OPENAI_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ATE_OPENAI_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("ATE_OPENAI_KEEPALIVE_EXPIRY", "120"))
+REQUEST_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+_warmup_started = False
+
+CONNECTION_STATS: Dict[str, int] = {
+    "clients_created": 0,
+    "requests": 0,
+    "new_connections": 0,
+    "reused_connections": 0,
+}
+_stats_lock = threading.Lock()
+_seen_streams = set()
+
+
+def _on_response(response: httpx.Response) -> None:
+    """Count whether each response travelled over a fresh or a pooled connection."""
+    stream = response.extensions.get("network_stream")
+    with _stats_lock:
+        CONNECTION_STATS["requests"] += 1
+        if stream is None:
+            return
+        stream_id = id(stream)
+        if stream_id in _seen_streams:
+            CONNECTION_STATS["reused_connections"] += 1
+        else:
+            CONNECTION_STATS["new_connections"] += 1
+            if len(_seen_streams) > 1000:
+                _seen_streams.clear()
+            _seen_streams.add(stream_id)
+
+
+def _build_http_client() -> httpx.Client:
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=REQUEST_TIMEOUT,
+        event_hooks={"response": [_on_response]},
+    )
+
+
+def get_openai_client() -> Optional[OpenAI]:
+    """Process-wide OpenAI client sharing one keep-alive connection pool; None without an API key."""
+    global _client
+    if _client is not None:
+        return _client
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(api_key=api_key, http_client=_build_http_client(), max_retries=2)
+            with _stats_lock:
+                CONNECTION_STATS["clients_created"] += 1
+    return _client
+
+
+def health_check(timeout: float = 5.0) -> Dict[str, Any]:
+    """Round-trip a cheap models listing through the shared client and report latency."""
+    client = get_openai_client()
+    if client is None:
+        return {"ok": False, "latency": None, "error": "OPENAI_API_KEY not set"}
+    start = time.perf_counter()
+    try:
+        client.with_options(timeout=timeout, max_retries=0).models.list()
+        return {"ok": True, "latency": time.perf_counter() - start, "error": None}
+    except Exception as e:
+        return {"ok": False, "latency": time.perf_counter() - start, "error": str(e)}
+
+
+def warm_openai_client() -> None:
+    """Start a background health check once per process so the first LLM call finds an open connection."""
+    global _warmup_started
+    with _client_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+
+    def _warm():
+        result = health_check()
+        print(f"DEBUG: OpenAI client warm-up ok={result['ok']} latency={result['latency']} error={result['error']}")
+
+    threading.Thread(target=_warm, name="openai-warmup", daemon=True).start()
+
+
+def get_connection_stats() -> Dict[str, Any]:
+    """Connection pool counters, including the share of requests served over reused connections."""
+    with _stats_lock:
+        stats = dict(CONNECTION_STATS)
+    observed = stats["new_connections"] + stats["reused_connections"]
+    stats["reuse_ratio"] = round(stats["reused_connections"] / observed, 3) if observed else 0.0
+    return stats
@@ -0,0 +1,406 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from replay_server import site_overrides, start_replay_server
+
+# The app modules read their ATE_* settings at import time, so analysis, jobs and friends
+# are imported only after configure_environment() has pointed them at the stand-ins.
+
+
+class Latency:
+    """Seconds-to-wait sampler parsed from a spec.
+
+    ``fixed:0.4``, ``uniform:0.2,1.0``, ``normal:0.5,0.1`` (mean, stddev),
+    ``lognormal:0.6,0.5`` (median, sigma) or ``exp:0.5`` (mean). A bare
+    number is fixed. Negative draws are clipped to zero.
+    """
+
+    def __init__(self, spec: str, seed: Optional[int] = None):
+        kind, _, params = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        values = [float(value) for value in params.split(",") if value.strip()]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+        if expected.get(kind) != len(values):
+            raise ValueError(f"bad latency spec {spec!r}; e.g. fixed:0.4, uniform:0.2,1.0, lognormal:0.6,0.5, exp:0.5")
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+        self._rng = random.Random(seed)
+
+    def __call__(self) -> float:
+        a = self.values[0]
+        b = self.values[1] if len(self.values) > 1 else 0.0
+        if self.kind == "uniform":
+            value = self._rng.uniform(a, b)
+        elif self.kind == "normal":
+            value = self._rng.gauss(a, b)
+        elif self.kind == "lognormal":
+            value = self._rng.lognormvariate(math.log(a), b) if a > 0 else 0.0
+        elif self.kind == "exp":
+            value = self._rng.expovariate(1.0 / a) if a > 0 else 0.0
+        else:
+            value = a
+        return max(0.0, value)
+
+    def __repr__(self) -> str:
+        return self.spec
+
+
+# ---------------------------------------------------------------------------
+# Fake OpenAI-compatible server
+# ---------------------------------------------------------------------------
+
+_CATEGORY_PROMPT_RE = re.compile(r"^Option '(?P<option>.*?)': ", re.S)
+_EXPLAIN_PROMPT_RE = re.compile(r"^Option '(?P<option>.*)' for (?P<equipment>.+)\.$", re.S)
+FAKE_CATEGORIES = ["Connectivity", "Software", "Calibration", "Power", "Display", "Storage", "Communication"]
+
+
+def fake_answer(messages: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """``(task, content)`` for a chat request, told apart by the user prompts ``prompting.py`` builds."""
+    user = next((str(message.get("content") or "") for message in reversed(messages) if message.get("role") == "user"), "")
+    match = _CATEGORY_PROMPT_RE.match(user)
+    if match:
+        option = match.group("option")
+        return "categorize", FAKE_CATEGORIES[sum(option.encode("utf-8")) % len(FAKE_CATEGORIES)]
+    match = _EXPLAIN_PROMPT_RE.match(user)
+    if match:
+        option, equipment = match.group("option"), match.group("equipment")
+        return "explain", (
+            f"Option {option} extends the {equipment} with an additional licensed capability, "
+            f"typically a measurement application, hardware upgrade or extended frequency range."
+        )
+    if user.startswith("ORIGINAL TEXT: "):
+        # "<brand> <model> <opt>/<opt>/...": the first segment ends with the first option
+        parts = [part.strip() for part in user[len("ORIGINAL TEXT: "):].split("/")]
+        head = parts[0].split()
+        options = [part for part in parts[1:] if part]
+        if len(parts) > 1 or len(head) > 2:
+            options.insert(0, head[-1])
+        normalized = {"brand": head[0] if head else "", "model": head[1] if len(head) > 1 else "", "options": options}
+        return "normalize", json.dumps({"normalized": normalized, "results": []})
+    return "other", "{}"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """``/v1/chat/completions`` and ``/v1/models`` with canned answers after a sampled delay."""
+
+    protocol_version = "HTTP/1.1"
+    latency: Callable[[], float] = staticmethod(lambda: 0.0)
+    error_rate = 0.0
+    counts: Dict[str, int] = {}
+    counts_lock = threading.Lock()
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _count(self, name: str) -> None:
+        with self.counts_lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "fake", "object": "model", "owned_by": "loadtest"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON body", "type": "invalid_request_error"}})
+            return
+        messages = request.get("messages") or []
+        task, content = fake_answer(messages)
+        time.sleep(self.latency())
+        self._count(task)
+        if self.error_rate and random.random() < self.error_rate:
+            self._count("errors")
+            self._send_json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+            return
+        prompt_tokens = sum(len(str(message.get("content") or "")) for message in messages) // 4
+        completion_tokens = max(1, len(content) // 4)
+        self._send_json(200, {
+            "id": f"chatcmpl-loadtest-{random.getrandbits(48):x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_fake_openai(
+    latency: Optional[Callable[[], float]] = None,
+    error_rate: float = 0.0,
+    port: int = 0,
+) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the fake OpenAI server on a daemon thread; returns the server and its base URL (without /v1).
+
+    Per-task request counts are in ``server.RequestHandlerClass.counts``.
+    """
+    handler = type("BoundFakeOpenAIHandler", (FakeOpenAIHandler,), {
+        "latency": staticmethod(latency or (lambda: 0.0)),
+        "error_rate": error_rate,
+        "counts": {},
+        "counts_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ---------------------------------------------------------------------------
+# Virtual users
+# ---------------------------------------------------------------------------
+
+class Outcome(NamedTuple):
+    status: str  # ok, degraded (fallback explanations or no market data), failed, timeout
+    latency: float  # seconds from clicking Analyze to the finished job
+    queued: float  # seconds the job waited for a job worker
+
+
+def configure_environment(openai_url: str, sites_url: str, host_interval: float, scrape_delay: str, history_path: str) -> None:
+    """Point the LLM client and scrapers at the stand-ins; must run before the app modules are imported."""
+    os.environ.update({
+        "OPENAI_API_KEY": "loadtest",
+        "OPENAI_BASE_URL": f"{openai_url}/v1",
+        "ATE_SITE_BASE_URLS": site_overrides(sites_url),
+        # No headless Chrome here, and every stand-in site shares one host, which
+        # the per-host rate limit would otherwise serialize
+        "ATE_JS_RENDER_SITES": "",
+        "ATE_HOST_MIN_INTERVAL": str(host_interval),
+        "ATE_SCRAPE_DELAY": scrape_delay,
+        "ATE_PRICE_HISTORY_PATH": history_path,
+        "ATE_WARMUP": "0",
+    })
+
+
+def analyze(dataset: Any, row: Any, model: str, timeout: float, prefetch: bool, enrich: bool) -> Outcome:
+    """One Analyze the way ``app.main`` runs it: prefetch on selection, the cross-session
+    analysis cache, then a keyed interactive job."""
+    from analysis import analysis_cache_key, cached_analysis, run_analysis
+    from enrichment import ENRICH_ENABLED, enrich_scraping_results
+    from jobs import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, STATUS_FAILED, get_job_queue
+    from prefetch import start_prefetch
+
+    if prefetch:
+        start_prefetch(dataset, row.brand, model, row.options)
+    key = analysis_cache_key(row.brand, model, row.options)
+    job_queue = get_job_queue()
+    started = time.perf_counter()
+    if cached_analysis(key) is not None:
+        return Outcome("ok", time.perf_counter() - started, 0.0)
+    job = job_queue.get(job_queue.submit(
+        run_analysis, row.brand, model, row.options, True, priority=PRIORITY_INTERACTIVE, key=key, reuse_finished=False,
+    ))
+    if not job.wait(timeout):
+        return Outcome("timeout", time.perf_counter() - started, 0.0)
+    elapsed = time.perf_counter() - started
+    queued = max(0.0, (job.started_at or job.created_at) - job.created_at)
+    if job.status == STATUS_FAILED:
+        job_queue.forget(key)
+        return Outcome("failed", elapsed, queued)
+    result = job.result
+    scraping = result["scraping"]
+    if enrich and ENRICH_ENABLED and scraping and scraping.get("search_results"):
+        job_queue.submit(enrich_scraping_results, scraping, priority=PRIORITY_BACKGROUND)
+    fallback = any(text.startswith("Could not get details") for text in result["option_explanations"].values())
+    return Outcome("degraded" if fallback or scraping is None else "ok", elapsed, queued)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run_level(
+    dataset: Any,
+    rows: List[Any],
+    users: int,
+    duration: float,
+    cold: bool,
+    think: Callable[[], float],
+    timeout: float,
+    prefetch: bool = True,
+    enrich: bool = False,
+) -> Dict[str, Any]:
+    """``users`` virtual users analyzing random quotes back to back for ``duration`` seconds.
+
+    With ``cold`` every analysis gets a unique model suffix, so no cache or
+    shared job answers it; otherwise popular equipment is served the way it
+    is in production.
+    """
+    outcomes: List[Outcome] = []
+    lock = threading.Lock()
+    sequence = itertools.count()
+    started = time.perf_counter()
+    deadline = started + duration
+
+    def virtual_user(number: int) -> None:
+        rng = random.Random(number)
+        while time.perf_counter() < deadline:
+            row = rng.choice(rows)
+            model = f"{row.model}-LT{next(sequence)}" if cold else row.model
+            try:
+                outcome = analyze(dataset, row, model, timeout, prefetch, enrich)
+            except Exception as e:
+                print(f"DEBUG: Virtual user {number} error: {e}")
+                outcome = Outcome("failed", 0.0, 0.0)
+            with lock:
+                outcomes.append(outcome)
+            time.sleep(think())
+
+    threads = [threading.Thread(target=virtual_user, args=(number,), name=f"vu-{number}") for number in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [outcome.latency for outcome in outcomes if outcome.status in ("ok", "degraded")]
+    statuses = [outcome.status for outcome in outcomes]
+    total = len(outcomes)
+    errors = statuses.count("failed") + statuses.count("timeout")
+    return {
+        "users": users,
+        "analyses": total,
+        "ok": statuses.count("ok"),
+        "degraded": statuses.count("degraded"),
+        "failed": statuses.count("failed"),
+        "timeouts": statuses.count("timeout"),
+        "error_rate": errors / total if total else 0.0,
+        "throughput_per_min": 60.0 * len(latencies) / elapsed if elapsed else 0.0,
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "p99": _percentile(latencies, 99),
+        "mean_queued": sum(outcome.queued for outcome in outcomes) / total if total else 0.0,
+        "elapsed": elapsed,
+    }
+
+
+def _drain_jobs(limit: float = 60.0) -> None:
+    """Wait for background jobs (prefetch, enrichment) from the previous level to finish."""
+    from jobs import get_job_queue
+
+    deadline = time.perf_counter() + limit
+    while time.perf_counter() < deadline:
+        stats = get_job_queue().stats()
+        if not stats["queued"] and not stats["running"]:
+            return
+        time.sleep(0.2)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the Analyze flow against local OpenAI and vendor stand-ins")
+    parser.add_argument("--users", default="1,2,4,8,16", help="comma-separated concurrent virtual users per level")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds each level keeps starting analyses")
+    parser.add_argument("--llm-latency", default="lognormal:0.8,0.4", help="fake OpenAI latency per call (see Latency)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="share of LLM calls answered with HTTP 500")
+    parser.add_argument("--site-latency", default="lognormal:0.3,0.5", help="fake vendor page latency per request")
+    parser.add_argument("--think", default="fixed:0", help="pause between one user's analyses")
+    parser.add_argument("--scrape-delay", default="0.2,0.4", help="ATE_SCRAPE_DELAY for the run (production: 1,2)")
+    parser.add_argument("--host-interval", type=float, default=0.0, help="ATE_HOST_MIN_INTERVAL for the run")
+    parser.add_argument("--cache", choices=("cold", "shared"), default="cold",
+                        help="cold: every analysis is new equipment; shared: repeats hit caches and shared jobs")
+    parser.add_argument("--rows", type=int, default=200, help="quotes sampled as the workload")
+    parser.add_argument("--timeout", type=float, default=180.0, help="seconds before an analysis counts as timed out")
+    parser.add_argument("--no-prefetch", action="store_true", help="skip the selection-time prefetch job")
+    # Off by default: listing URLs in the recorded pages point at the live vendor sites
+    parser.add_argument("--enrich", action="store_true", help="also queue the detail-page enrichment job")
+    parser.add_argument("--json", help="also write the per-level results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's DEBUG output")
+    args = parser.parse_args(argv)
+
+    user_levels = [int(value) for value in args.users.split(",") if value.strip()]
+    llm_server, llm_url = start_fake_openai(Latency(args.llm_latency, seed=1), args.llm_error_rate)
+    site_latency = Latency(args.site_latency, seed=2)
+    site_requests = [0]
+    site_lock = threading.Lock()
+
+    def site_delay() -> float:
+        with site_lock:
+            site_requests[0] += 1
+        return site_latency()
+
+    site_server, site_url = start_replay_server(delay=site_delay)
+    workdir = tempfile.TemporaryDirectory(prefix="ate-loadtest-")
+    configure_environment(llm_url, site_url, args.host_interval, args.scrape_delay,
+                          os.path.join(workdir.name, "price_history.sqlite3"))
+
+    from dataset import get_dataset
+    from jobs import DEFAULT_WORKERS
+
+    dataset = get_dataset()
+    rows = [row for row in dataset.page("", 0, args.rows)[0] if row.brand and row.model]
+    think = Latency(args.think, seed=3)
+    print(f"LLM {llm_url} latency {args.llm_latency} errors {args.llm_error_rate:.0%}; "
+          f"sites {site_url} latency {args.site_latency}; {len(rows)} quotes, {args.cache} cache, "
+          f"{DEFAULT_WORKERS} job workers, {os.cpu_count()} CPUs")
+    print(f"{'users':>6}{'done':>7}{'ok':>6}{'degr':>6}{'fail':>6}{'err%':>7}{'/min':>9}"
+          f"{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'queued s':>10}{'LLM':>7}{'pages':>7}")
+    results = []
+    stdout = sys.stdout
+    try:
+        for users in user_levels:
+            llm_before = sum(count for task, count in llm_server.RequestHandlerClass.counts.items() if task != "errors")
+            pages_before = site_requests[0]
+            if not args.verbose:
+                sys.stdout = open(os.devnull, "w")
+            try:
+                result = run_level(dataset, rows, users, args.duration, args.cache == "cold", think,
+                                   args.timeout, not args.no_prefetch, args.enrich)
+                _drain_jobs()
+            finally:
+                if sys.stdout is not stdout:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+            result["llm_calls"] = sum(
+                count for task, count in llm_server.RequestHandlerClass.counts.items() if task != "errors"
+            ) - llm_before
+            result["site_requests"] = site_requests[0] - pages_before
+            results.append(result)
+            print(f"{users:>6}{result['analyses']:>7}{result['ok']:>6}{result['degraded']:>6}"
+                  f"{result['failed'] + result['timeouts']:>6}{result['error_rate']:>7.1%}"
+                  f"{result['throughput_per_min']:>9.1f}{result['p50']:>8.2f}{result['p95']:>8.2f}{result['p99']:>8.2f}"
+                  f"{result['mean_queued']:>10.2f}{result['llm_calls']:>7}{result['site_requests']:>7}")
+    finally:
+        llm_server.shutdown()
+        site_server.shutdown()
+        workdir.cleanup()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+import argparse
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from dedup import FALLBACK_SOURCES
+
+if TYPE_CHECKING:
+    # records imports this module, so the batch class is imported where it is used
+    from records import ListingBatch
+
+
+# Quantiles reported per group, by name
+QUANTILES = {"p10": 0.10, "p25": 0.25, "median": 0.50, "p75": 0.75, "p90": 0.90}
+# Tukey fences on log10(price): listed prices are skewed, so a ratio (not a dollar
+# distance) from the middle half decides what counts as an outlier.
+OUTLIER_IQR_FACTOR = 1.5
+# Groups with fewer prices than this are too small to call anything an outlier
+MIN_PRICES_FOR_OUTLIERS = 4
+
+
+def parse_prices(prices: Sequence[Any]) -> np.ndarray:
+    """Numeric prices (float64, NaN where there is none) for display strings like "$1,850.00".
+
+    Follows ``dedup.parse_display_price`` (the first number in the string).
+    Strings are parsed once per distinct value, so repeated prices and
+    placeholders such as "Contact vendor" cost one lookup each.
+    """
+    import pandas as pd
+
+    values = pd.Series(list(prices), dtype=object)
+    numeric = np.full(len(values), np.nan)
+    is_number = values.map(lambda value: isinstance(value, (int, float))).to_numpy(dtype=bool)
+    numeric[is_number] = values[is_number].to_numpy(dtype=np.float64)
+    is_text = values.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    if is_text.any():
+        codes, uniques = pd.factorize(values[is_text])
+        parsed = pd.to_numeric(
+            pd.Series(uniques, dtype=object).str.extract(r"(\d[\d,]*(?:\.\d+)?)", expand=False).str.replace(",", "", regex=False),
+            errors="coerce",
+        ).to_numpy(dtype=np.float64)
+        numeric[is_text] = parsed[codes]
+    return numeric
+
+
+def _group_layout(codes: np.ndarray, values: np.ndarray, group_count: int):
+    """Sort prices by (group, price); returns sorted prices, each group's start and size."""
+    order = np.lexsort((values, codes))
+    sizes = np.bincount(codes, minlength=group_count)
+    starts = np.zeros(group_count, dtype=np.int64)
+    np.cumsum(sizes[:-1], out=starts[1:])
+    return values[order], starts, sizes
+
+
+def _group_quantile(ordered: np.ndarray, starts: np.ndarray, sizes: np.ndarray, q: float) -> np.ndarray:
+    """Linear-interpolated quantile per group of an ascending-within-group array (NaN for empty groups)."""
+    position = starts + q * np.maximum(sizes - 1, 0)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, starts + np.maximum(sizes - 1, 0))
+    lower = np.minimum(lower, len(ordered) - 1)
+    upper = np.minimum(upper, len(ordered) - 1)
+    fraction = position - np.floor(position)
+    result = ordered[lower] * (1 - fraction) + ordered[upper] * fraction if len(ordered) else np.zeros(len(sizes))
+    return np.where(sizes > 0, result, np.nan)
+
+
+def grouped_price_stats(codes: np.ndarray, prices: np.ndarray, group_count: int) -> Dict[str, np.ndarray]:
+    """count, priced, min, quantiles, max, mean and outlier count per group code, plus a per-price outlier mask.
+
+    ``codes`` are group numbers 0..group_count-1 and ``prices`` may hold NaN
+    for listings without a price. Everything is a sort and a few array passes,
+    so millions of prices take seconds.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+    priced = ~np.isnan(prices)
+    stats = {"count": np.bincount(codes, minlength=group_count)}
+    ordered, starts, sizes = _group_layout(codes[priced], prices[priced], group_count)
+    stats["priced"] = sizes
+    stats["min"] = _group_quantile(ordered, starts, sizes, 0.0)
+    for name, q in QUANTILES.items():
+        stats[name] = _group_quantile(ordered, starts, sizes, q)
+    stats["max"] = _group_quantile(ordered, starts, sizes, 1.0)
+    totals = np.bincount(codes[priced], weights=prices[priced], minlength=group_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stats["mean"] = np.where(sizes > 0, totals / np.maximum(sizes, 1), np.nan)
+
+    # Outlier fences per group, on log prices
+    positive = priced & (prices > 0)
+    outliers = np.zeros(len(prices), dtype=bool)
+    log_ordered, log_starts, log_sizes = _group_layout(codes[positive], np.log10(prices[positive]), group_count)
+    q1 = _group_quantile(log_ordered, log_starts, log_sizes, 0.25)
+    q3 = _group_quantile(log_ordered, log_starts, log_sizes, 0.75)
+    spread = OUTLIER_IQR_FACTOR * (q3 - q1)
+    low, high = q1 - spread, q3 + spread
+    enough = log_sizes >= MIN_PRICES_FOR_OUTLIERS
+    group = codes[positive]
+    log_prices = np.log10(prices[positive])
+    outliers[positive] = enough[group] & ((log_prices < low[group]) | (log_prices > high[group]))
+    stats["outliers"] = np.bincount(codes[outliers], minlength=group_count)
+    stats["low_fence"] = np.where(enough, 10 ** low, np.nan)
+    stats["high_fence"] = np.where(enough, 10 ** high, np.nan)
+    stats["outlier_mask"] = outliers
+    return stats
+
+
+def _frame_groups(frame: Any, by: Sequence[str], price_column: str):
+    """Group codes, group labels (an Index or MultiIndex) and numeric prices of a DataFrame."""
+    import pandas as pd
+
+    prices = frame[price_column]
+    prices = prices.to_numpy(dtype=np.float64) if pd.api.types.is_numeric_dtype(prices) else parse_prices(prices.tolist())
+    if len(by) > 1:
+        codes, groups = pd.MultiIndex.from_frame(frame[list(by)].astype(str)).factorize()
+        groups = groups.set_names(list(by))
+    else:
+        codes, groups = pd.factorize(frame[by[0]].astype(str))
+        groups = pd.Index(groups, name=by[0])
+    return codes, groups, prices
+
+
+def price_statistics(frame: Any, by: Sequence[str] = ("brand", "model"), price_column: str = "price") -> Any:
+    """Per-group price statistics of a pandas DataFrame of observations, one row per group.
+
+    ``price_column`` may hold numbers or display strings.
+    """
+    import pandas as pd
+
+    codes, groups, prices = _frame_groups(frame, by, price_column)
+    stats = grouped_price_stats(codes, prices, len(groups))
+    stats.pop("outlier_mask")
+    return pd.DataFrame(stats, index=groups).reset_index()
+
+
+def flag_outliers(frame: Any, by: Sequence[str] = ("brand", "model"), price_column: str = "price") -> np.ndarray:
+    """Boolean mask of rows whose price lies outside their group's log-price Tukey fences."""
+    codes, groups, prices = _frame_groups(frame, by, price_column)
+    return grouped_price_stats(codes, prices, len(groups))["outlier_mask"]
+
+
+def group_summary(stats: Dict[str, np.ndarray], index: int) -> Dict[str, Any]:
+    """One group of ``grouped_price_stats`` as plain numbers (None where a group has no prices)."""
+    summary = {"count": int(stats["count"][index]), "priced": int(stats["priced"][index])}
+    for name in ("min",) + tuple(QUANTILES) + ("max", "mean"):
+        value = stats[name][index]
+        summary[name] = round(float(value), 2) if not np.isnan(value) else None
+    summary["outliers"] = int(stats["outliers"][index])
+    return summary
+
+
+def market_summary(results: Union[List[Dict[str, Any]], "ListingBatch"]) -> Dict[str, Any]:
+    """Price statistics for one scrape, overall and per vendor, for the ``scrape_effective_sites`` payload.
+
+    ``results`` is a list of listing dicts or a ``records.ListingBatch``;
+    dicts are converted to a batch, so prices are parsed once per distinct
+    string and vendors are grouped by code. Marks each result (or the
+    batch's columns) with ``price_value`` and ``price_outlier``. Estimated
+    fallback listings are left out of the statistics unless nothing else was
+    found (then ``estimated`` is true).
+    """
+    from records import ListingBatch
+
+    batch = results if isinstance(results, ListingBatch) else ListingBatch.from_dicts(results)
+    if not len(batch):
+        return {"overall": None, "by_vendor": {}, "estimated": False}
+    names, vendor_codes = np.unique(batch.vendor_labels(), return_inverse=True)
+    vendor_codes = vendor_codes.reshape(-1)
+    fallback_names = np.array([str(name).lower() in FALLBACK_SOURCES for name in names], dtype=bool)
+    fallback = fallback_names[vendor_codes]
+    estimated = bool(fallback.all())
+    prices = batch.price
+    counted = prices.copy()
+    if not estimated:
+        counted[fallback] = np.nan
+
+    overall = grouped_price_stats(np.zeros(len(batch), dtype=np.int64), counted, 1)
+    by_vendor = grouped_price_stats(vendor_codes, counted, len(names))
+    if results is batch:
+        batch.set_market_prices(prices, overall["outlier_mask"])
+    else:
+        for result, price, outlier in zip(results, prices.tolist(), overall["outlier_mask"].tolist()):
+            result["price_value"] = None if np.isnan(price) else price
+            result["price_outlier"] = bool(outlier)
+    return {
+        "overall": group_summary(overall, 0),
+        "by_vendor": {
+            str(name): group_summary(by_vendor, code)
+            for code, name in enumerate(names)
+            if estimated or not fallback_names[code]
+        },
+        "estimated": estimated,
+    }
+
+
+def history_statistics(by: Sequence[str] = ("brand", "model"), since: Optional[float] = None) -> Any:
+    """``price_statistics`` over the price-history store (None when it is disabled)."""
+    from price_history import get_price_history
+
+    history = get_price_history()
+    if history is None:
+        return None
+    return price_statistics(history.frame(since), by)
+
+
+def _synthetic_observations(rows: int, seed: int = 5) -> Any:
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    models = np.array([f"N{i:04d}A" for i in range(5000)])
+    vendors = np.array(["eBay", "Valuetronics", "TestWorld", "TestEquipment.center", "Keysight"])
+    base = rng.lognormal(8.5, 0.8, len(models))
+    model_codes = rng.integers(0, len(models), rows)
+    prices = base[model_codes] * rng.lognormal(0.0, 0.25, rows)
+    display = np.char.add("$", np.round(prices, 2).astype(str)).astype(object)
+    display[rng.random(rows) < 0.1] = "Contact vendor"
+    return pd.DataFrame({
+        "brand": "Keysight",
+        "model": models[model_codes],
+        "vendor": vendors[rng.integers(0, len(vendors), rows)],
+        "price": display,
+    })
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Market price statistics")
+    sub = parser.add_subparsers(dest="command", required=True)
+    history = sub.add_parser("history", help="statistics over the price-history store")
+    history.add_argument("--by", default="brand,model", help="comma-separated grouping columns (brand, model, vendor, source)")
+    history.add_argument("--days", type=float, help="only observations from the last N days")
+    bench = sub.add_parser("bench", help="time parsing and statistics over synthetic observations")
+    bench.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args(argv)
+
+    if args.command == "history":
+        since = time.time() - args.days * 86400 if args.days else None
+        stats = history_statistics(args.by.split(","), since)
+        if stats is None:
+            print("Price history is disabled (ATE_PRICE_HISTORY_PATH is empty)")
+            return 1
+        print(stats.to_string(index=False))
+        return 0
+
+    frame = _synthetic_observations(args.rows)
+    started = time.perf_counter()
+    prices = parse_prices(frame["price"].tolist())
+    parsed_at = time.perf_counter()
+    frame["price"] = prices
+    per_model = price_statistics(frame, ("brand", "model"))
+    modelled_at = time.perf_counter()
+    per_vendor = price_statistics(frame, ("vendor",))
+    finished = time.perf_counter()
+    print(f"{len(frame)} observations: parse {parsed_at - started:.2f}s, "
+          f"{len(per_model)} models {modelled_at - parsed_at:.2f}s, {len(per_vendor)} vendors {finished - modelled_at:.2f}s, "
+          f"{int(per_model['outliers'].sum())} outliers")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
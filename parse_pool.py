@@ -0,0 +1,209 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+
+# Worker processes parsing fetched pages. 0 parses on the fetching thread, which suits the
+# app: one Analyze parses a handful of pages, not worth a round trip to another process.
+PARSE_WORKERS = int(os.getenv("ATE_PARSE_WORKERS", "0"))
+# Pages handed to the pool and not yet parsed; fetching threads wait for a free slot
+# beyond this (0 = four per worker), so a slow parse stage throttles the fetching.
+PARSE_QUEUE_SIZE = int(os.getenv("ATE_PARSE_QUEUE_SIZE", "0"))
+# "spawn" keeps workers from inheriting the parent's threads and held locks through fork
+PARSE_START_METHOD = os.getenv("ATE_PARSE_START_METHOD", "spawn")
+
+
+class ParsePool:
+    """Process pool for CPU-bound page parsing, with a bounded number of pages in flight.
+
+    Parsers are module-level functions taking the page bytes (picklable), and
+    return plain listing dicts, so only bytes go in and small records come back.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        queue_size: int = 0,
+        start_method: str = PARSE_START_METHOD,
+        initializer: Optional[Callable[[], None]] = None,
+    ):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size if queue_size > 0 else 4 * self.workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context(start_method), initializer=initializer
+        )
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {"submitted": 0, "completed": 0, "failed": 0, "bytes": 0, "blocked_seconds": 0.0}
+
+    def submit(self, parser: Callable[..., Any], *args: Any) -> Future:
+        """Queue ``parser(*args)``; blocks while ``queue_size`` pages are already waiting or being parsed."""
+        started = time.perf_counter()
+        self._slots.acquire()
+        blocked = time.perf_counter() - started
+        try:
+            future = self._executor.submit(parser, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["blocked_seconds"] += blocked
+            self._stats["bytes"] += sum(len(arg) for arg in args if isinstance(arg, (bytes, str)))
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: Future) -> None:
+        self._slots.release()
+        failed = future.cancelled() or future.exception() is not None
+        with self._lock:
+            self._stats["failed" if failed else "completed"] += 1
+
+    def parse(self, parser: Callable[..., Any], *args: Any) -> Any:
+        return self.submit(parser, *args).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pages submitted, parsed and failed, bytes sent, pages in flight and time fetchers spent blocked."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["in_flight"] = stats["submitted"] - stats["completed"] - stats["failed"]
+        stats["blocked_seconds"] = round(stats["blocked_seconds"], 3)
+        stats.update(workers=self.workers, queue_size=self.queue_size)
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+_pool: Optional[ParsePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> Optional[ParsePool]:
+    """Process-wide pool of ATE_PARSE_WORKERS processes, started on first use; None when parsing runs inline."""
+    global _pool
+    if PARSE_WORKERS <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ParsePool(PARSE_WORKERS, PARSE_QUEUE_SIZE)
+    return _pool
+
+
+def configure_parse_pool(
+    workers: int,
+    queue_size: int = 0,
+    initializer: Optional[Callable[[], None]] = None,
+) -> Optional[ParsePool]:
+    """Replace the process-wide pool (for batch runs and benchmarks); ``workers`` 0 switches to inline parsing."""
+    global _pool, PARSE_WORKERS, PARSE_QUEUE_SIZE
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        PARSE_WORKERS, PARSE_QUEUE_SIZE = workers, queue_size
+        _pool = ParsePool(workers, queue_size, initializer=initializer) if workers > 0 else None
+        return _pool
+
+
+def parse_page(parser: Callable[..., Any], *args: Any) -> Any:
+    """``parser(*args)`` on the parse pool, or on this thread when the pool is off or has broken."""
+    pool = get_parse_pool()
+    if pool is None:
+        return parser(*args)
+    try:
+        return pool.parse(parser, *args)
+    except BrokenProcessPool as e:
+        print(f"DEBUG: Parse pool unavailable ({e}), parsing inline")
+        return parser(*args)
+
+
+def _silence_output() -> None:
+    sys.stdout = open(os.devnull, "w")
+
+
+def _synthetic_page(results: int, seed: int = 3) -> bytes:
+    """A DuckDuckGo-style results page with ``results`` hits and snippet markup around each."""
+    import random
+
+    rng = random.Random(seed)
+    vendors = ["valuetronics.com", "testequipment.center", "testworld.com", "keysight.com", "example-surplus.com"]
+    blocks = []
+    for number in range(results):
+        vendor = rng.choice(vendors)
+        blocks.append(
+            f'<div class="result results_links"><div class="links_main"><h2 class="result__title">'
+            f'<a class="result__a" href="//duckduckgo.com/l/?uddg=https%3A%2F%2Fwww.{vendor}%2Fitem%2F{number}">'
+            f'Keysight N5172B Signal Generator ${rng.randint(1000, 40000):,}.00</a></h2>'
+            f'<div class="result__extras"><span class="result__url">www.{vendor}/item/{number}</span></div>'
+            f'<a class="result__snippet">' + " ".join(f"<b>term{rng.randint(0, 99)}</b> text" for _ in range(30)) + "</a>"
+            f"</div></div>"
+        )
+    return ("<html><body><div id='links'>" + "".join(blocks) + "</div></body></html>").encode("utf-8")
+
+
+def _run_pipeline(pages: int, fetchers: int, latency: float, page: bytes, workers: int, queue_size: int) -> Dict[str, Any]:
+    from effective_scraper import parse_duckduckgo_results
+
+    pool = configure_parse_pool(workers, queue_size, initializer=_silence_output)
+    if pool is not None:
+        # Start the worker processes (and their imports) before timing
+        for future in [pool.submit(parse_duckduckgo_results, page, "Keysight", "N5172B") for _ in range(pool.workers)]:
+            future.result()
+
+    def fetch_and_parse(_: int) -> int:
+        time.sleep(latency)  # stands in for the network round trip
+        return len(parse_page(parse_duckduckgo_results, page, "Keysight", "N5172B"))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=fetchers) as executor:
+        listings = sum(executor.map(fetch_and_parse, range(pages)))
+    elapsed = time.perf_counter() - started
+    stats = pool.stats() if pool is not None else {}
+    configure_parse_pool(0)
+    return {
+        "workers": workers,
+        "pages_per_second": pages / elapsed,
+        "listings": listings,
+        "blocked_seconds": stats.get("blocked_seconds", 0.0),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Process-pool page parsing")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="fetch-and-parse throughput, inline vs. 1..N parse workers")
+    bench.add_argument("--pages", type=int, default=400)
+    bench.add_argument("--fetchers", type=int, default=32, help="I/O threads")
+    bench.add_argument("--latency", type=float, default=0.05, help="simulated seconds per fetch")
+    bench.add_argument("--results", type=int, default=100, help="hits per synthetic page")
+    bench.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    bench.add_argument("--queue-size", type=int, default=PARSE_QUEUE_SIZE)
+    args = parser.parse_args(argv)
+
+    page = _synthetic_page(args.results)
+    print(f"{args.pages} pages of {len(page) // 1024} KiB, {args.fetchers} fetch threads, "
+          f"{args.latency * 1000:.0f}ms simulated latency, {os.cpu_count()} CPUs")
+    worker_counts: List[int] = [0] + sorted({1, 2, 4, 8, args.max_workers} & set(range(1, args.max_workers + 1)))
+    for workers in worker_counts:
+        # The parsers print a DEBUG line per listing; keep the report readable
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                result = _run_pipeline(args.pages, args.fetchers, args.latency, page, workers, args.queue_size)
+            finally:
+                sys.stdout = stdout
+        label = "inline" if workers == 0 else f"{workers} worker{'s' if workers > 1 else ''}"
+        print(f"{label:>10}: {result['pages_per_second']:7.1f} pages/s, "
+              f"fetchers blocked {result['blocked_seconds']:.1f}s in total")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,80 +1,59 @@
-from typing import Dict
+from typing import Any, Dict, Iterable
+
+
+# Connecting words skipped when picking brand and model out of a free-text query
+STOPWORDS = frozenset({"with", "options", "option", "like", "such", "as", "enter", "a", "query"})
 
 
 def parse_query(text: str) -> Dict[str, str]:
     # Parse: brand model [with] [options like] 160/EEC/PLK/UK6 [extra text]
-    # Find the first "/" to separate brand/model from options
+    # Brand/model come from the words before the first "/", options run from the
+    # first "/" to the last one, or to the end of the text when no space follows it.
     text = text.strip()
-    
-    # Look for the first "/" to separate brand/model from options
     slash_index = text.find("/")
-    
+
     if slash_index == -1:
-        # No options, just brand and model
-        words = text.split()
-        # Filter out common connecting words
-        filtered_words = [word for word in words if word.lower() not in ["with", "options", "option", "like", "such", "as", "enter", "a", "query", "like"]]
-        
-        brand = filtered_words[0] if filtered_words else ""
-        model = filtered_words[1] if len(filtered_words) > 1 else ""
-        
-        return {"brand": brand, "model": model, "raw_options": ""}
-    
-    # Find the end of options (next space after the last "/" sequence)
-    # Look for patterns like "/160/EEC/PLK/UK6 has to be" -> stop at "has"
-    options_end_index = slash_index
-    current_pos = slash_index
-    
-    while current_pos < len(text):
-        # Find next "/"
-        next_slash = text.find("/", current_pos + 1)
-        if next_slash == -1:
-            # No more slashes, find the next space
-            next_space = text.find(" ", current_pos)
-            if next_space == -1:
-                # No space found, take everything to the end
-                options_end_index = len(text)
-            else:
-                # Found space, check if there's a word after the last "/"
-                last_part = text[current_pos:next_space].strip()
-                if last_part and not last_part.startswith("/"):
-                    # There's a word after the last "/", include it
-                    options_end_index = next_space
-                else:
-                    # Just slashes, stop at the last "/"
-                    options_end_index = current_pos + 1
+        head = text
+        raw_options = ""
+    else:
+        head = text[:slash_index]
+        last_slash = text.rfind("/")
+        # A space after the last "/" means trailing prose ("/160/EEC/PLK/UK6 has to be"):
+        # stop right after that slash; otherwise the options run to the end.
+        options_end = last_slash + 1 if text.find(" ", last_slash) != -1 else len(text)
+        raw_options = text[slash_index:options_end].strip()
+
+    # First two words that are not connecting words
+    brand = model = ""
+    for word in head.split():
+        if word.lower() in STOPWORDS:
+            continue
+        if brand:
+            model = word
             break
-        else:
-            # Found another "/", continue
-            current_pos = next_slash
-    
-    # Extract brand/model part (before first "/")
-    brand_model_part = text[:slash_index].strip()
-    brand_model_words = brand_model_part.split()
-    
-    # Filter out common connecting words
-    filtered_words = [word for word in brand_model_words if word.lower() not in ["with", "options", "option", "like", "such", "as", "enter", "a", "query", "like"]]
-    
-    brand = filtered_words[0] if filtered_words else ""
-    model = filtered_words[1] if len(filtered_words) > 1 else ""
-    
-    # Find the last word before the "/" - this should be the first option
-    last_word_before_slash = ""
-    if brand_model_words:
-        last_word = brand_model_words[-1]
-        # If the last word is not a connecting word, it's the first option
-        if last_word.lower() not in ["with", "options", "option", "like", "such", "as", "enter", "a", "query", "like"]:
-            last_word_before_slash = last_word
-    
-    # Extract options part (from first "/" to end of options)
-    options_part = text[slash_index:options_end_index].strip()
-    
-    # Don't combine with last word before slash to avoid including model name
-    raw_options = options_part
-    
+        brand = word
+
     return {"brand": brand, "model": model, "raw_options": raw_options}
 
 
+def parse_queries(texts: Iterable[Any]) -> Any:
+    """``parse_query`` over many quote requests, one row at a time.
+
+    A list (or any iterable) gives a list of dicts. A pandas Series gives a
+    DataFrame with brand/model/raw_options columns on the same index, which
+    costs the DataFrame construction on top of the list path. Missing values
+    parse as empty text. The loop is kept on purpose: pandas string methods
+    doing the same split were about 3x slower in ``parsing_benchmark.py``.
+    """
+    parse = parse_query
+    if type(texts).__module__.startswith("pandas"):
+        import pandas as pd
+
+        rows = [parse(text) if isinstance(text, str) else parse("") for text in texts.tolist()]
+        return pd.DataFrame.from_records(rows, index=texts.index, columns=["brand", "model", "raw_options"])
+    return [parse(text) if isinstance(text, str) else parse("") for text in texts]
+
+
 def split_options_deterministic(raw_options: str) -> list[str]:
     """Deterministic option splitter that splits on '/' and cleans up each option."""
     if not raw_options:
@@ -0,0 +1,149 @@
+import argparse
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+from parsing import parse_queries, parse_query
+
+
+BRANDS = ["Keysight", "Agilent", "Tektronix", "Rohde", "Anritsu", "BOONTON", "HP", "Fluke", "Yokogawa", "LeCroy"]
+MODELS = ["N9020A", "E4980A", "MSO64", "FSW", "MS2090A", "4500C", "8596E", "CMU300", "33120A", "SMA100B"]
+OPTIONS = ["503", "P13", "EP5", "B25", "K70", "1EA", "UNV", "006", "PFR", "W7X", "160", "EEC", "PLK", "UK6"]
+FILLERS = ["with", "options", "option", "like", "such as", "enter a query", "please", "need"]
+TAILS = ["", "", " has to be delivered soon", " asap", "\tcalibrated", " /", " - used OK"]
+
+
+def reference_parse_query(text: str) -> Dict[str, str]:
+    """parsing.parse_query as it was before the single-pass rewrite, kept verbatim as the oracle."""
+    # Parse: brand model [with] [options like] 160/EEC/PLK/UK6 [extra text]
+    # Find the first "/" to separate brand/model from options
+    text = text.strip()
+    
+    # Look for the first "/" to separate brand/model from options
+    slash_index = text.find("/")
+    
+    if slash_index == -1:
+        # No options, just brand and model
+        words = text.split()
+        # Filter out common connecting words
+        filtered_words = [word for word in words if word.lower() not in ["with", "options", "option", "like", "such", "as", "enter", "a", "query", "like"]]
+        
+        brand = filtered_words[0] if filtered_words else ""
+        model = filtered_words[1] if len(filtered_words) > 1 else ""
+        
+        return {"brand": brand, "model": model, "raw_options": ""}
+    
+    # Find the end of options (next space after the last "/" sequence)
+    # Look for patterns like "/160/EEC/PLK/UK6 has to be" -> stop at "has"
+    options_end_index = slash_index
+    current_pos = slash_index
+    
+    while current_pos < len(text):
+        # Find next "/"
+        next_slash = text.find("/", current_pos + 1)
+        if next_slash == -1:
+            # No more slashes, find the next space
+            next_space = text.find(" ", current_pos)
+            if next_space == -1:
+                # No space found, take everything to the end
+                options_end_index = len(text)
+            else:
+                # Found space, check if there's a word after the last "/"
+                last_part = text[current_pos:next_space].strip()
+                if last_part and not last_part.startswith("/"):
+                    # There's a word after the last "/", include it
+                    options_end_index = next_space
+                else:
+                    # Just slashes, stop at the last "/"
+                    options_end_index = current_pos + 1
+            break
+        else:
+            # Found another "/", continue
+            current_pos = next_slash
+    
+    # Extract brand/model part (before first "/")
+    brand_model_part = text[:slash_index].strip()
+    brand_model_words = brand_model_part.split()
+    
+    # Filter out common connecting words
+    filtered_words = [word for word in brand_model_words if word.lower() not in ["with", "options", "option", "like", "such", "as", "enter", "a", "query", "like"]]
+    
+    brand = filtered_words[0] if filtered_words else ""
+    model = filtered_words[1] if len(filtered_words) > 1 else ""
+    
+    # Find the last word before the "/" - this should be the first option
+    last_word_before_slash = ""
+    if brand_model_words:
+        last_word = brand_model_words[-1]
+        # If the last word is not a connecting word, it's the first option
+        if last_word.lower() not in ["with", "options", "option", "like", "such", "as", "enter", "a", "query", "like"]:
+            last_word_before_slash = last_word
+    
+    # Extract options part (from first "/" to end of options)
+    options_part = text[slash_index:options_end_index].strip()
+    
+    # Don't combine with last word before slash to avoid including model name
+    raw_options = options_part
+    
+    return {"brand": brand, "model": model, "raw_options": raw_options}
+
+
+
+def build_corpus(lines: int, seed: int = 7) -> List[str]:
+    """Synthetic free-text quote requests shaped like the ones users type, plus edge cases."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(lines):
+        shape = rng.random()
+        brand, model = rng.choice(BRANDS), rng.choice(MODELS)
+        options = "/".join(rng.sample(OPTIONS, rng.randint(1, 6)))
+        if shape < 0.55:
+            text = f"{brand} {model} {rng.choice(FILLERS)} /{options}{rng.choice(TAILS)}"
+        elif shape < 0.8:
+            text = f"{rng.choice(FILLERS)} {brand} {model} {options}{rng.choice(TAILS)}"
+        elif shape < 0.95:
+            text = f"{brand} {model}{rng.choice(TAILS)}"
+        else:
+            # Fuzz: arbitrary mixes of words, slashes and whitespace
+            text = "".join(rng.choice(["/", " ", "\t", "a", "As", "with", "X1", "  ", "//", "\n"]) for _ in range(rng.randint(0, 12)))
+        corpus.append(text)
+    return corpus
+
+
+def _time(label: str, fn: Callable[[], object], lines: int) -> float:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28}{elapsed:>8.2f} s{lines / elapsed / 1000:>10.0f} k lines/s")
+    return elapsed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="parse_query throughput against the reference implementation")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.lines)
+    mismatches = [text for text in corpus if parse_query(text) != reference_parse_query(text)]
+    print(f"{len(corpus)} lines, {len(mismatches)} mismatches against the reference")
+    if mismatches:
+        print("first mismatch:", repr(mismatches[0]))
+        return 1
+
+    reference = _time("reference parse_query", lambda: [reference_parse_query(text) for text in corpus], len(corpus))
+    single = _time("parse_query", lambda: [parse_query(text) for text in corpus], len(corpus))
+    _time("parse_queries(list)", lambda: parse_queries(corpus), len(corpus))
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    if pd is not None:
+        series = pd.Series(corpus)
+        _time("parse_queries(Series)", lambda: parse_queries(series), len(corpus))
+    print(f"speedup: {reference / single:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from brands import brand_key, canonical_brand
+from jobs import PRIORITY_BACKGROUND, get_job_queue
+
+# analysis (openai, requests, bs4, ...) is imported on the job thread, like warmup.py does.
+
+
+PREFETCH_ENABLED = os.getenv("ATE_PREFETCH", "1") != "0"
+# Options beyond the selected row's own that are explained ahead of time
+PREFETCH_MAX_OPTIONS = int(os.getenv("ATE_PREFETCH_MAX_OPTIONS", "8"))
+# A candidate must appear in at least this share of the model's quotes that list one of the row's options
+PREFETCH_MIN_PROBABILITY = float(os.getenv("ATE_PREFETCH_MIN_PROBABILITY", "0.3"))
+PREFETCH_WORKERS = int(os.getenv("ATE_PREFETCH_WORKERS", "4"))
+
+_stats = {"jobs": 0, "candidates": 0, "already_cached": 0, "explained": 0}
+_stats_lock = threading.Lock()
+
+
+class Candidate(NamedTuple):
+    option: str
+    probability: float  # P(option | a row option) from co-occurrence, or share of the model's top count
+
+
+def likely_options(
+    index: Any,
+    brand: str,
+    model: str,
+    options: List[str],
+    n: int = PREFETCH_MAX_OPTIONS,
+    min_probability: float = PREFETCH_MIN_PROBABILITY,
+) -> List[Candidate]:
+    """Options of ``model`` likely to be asked about next, given the options on the selected quote.
+
+    ``index`` is a ``quote_index.QuoteIndex``. Each candidate scores the highest
+    P(candidate | option) over the row's options, where P is pair count over
+    option count. A row without options gets the model's most quoted options.
+    """
+    brand = canonical_brand(brand)
+    frequencies = index.frequencies
+    counts = frequencies[(frequencies["brand"] == brand) & (frequencies["model"] == model)]
+    if counts.empty:
+        return []
+    option_counts = dict(zip(counts["option"].astype(str), counts["count"].tolist()))
+    own = set(options)
+    if not own:
+        top = max(option_counts.values())
+        ranked = sorted(option_counts.items(), key=lambda item: -item[1])[:n]
+        return [Candidate(option, count / top) for option, count in ranked]
+
+    pairs = index.cooccurrence
+    pairs = pairs[(pairs["brand"] == brand) & (pairs["model"] == model)]
+    pairs = pairs[pairs["option_a"].isin(own) | pairs["option_b"].isin(own)]
+    scores: Dict[str, float] = {}
+    for a, b, count in zip(pairs["option_a"].astype(str), pairs["option_b"].astype(str), pairs["count"].tolist()):
+        for given, candidate in ((a, b), (b, a)):
+            if given in own and candidate not in own and option_counts.get(given):
+                scores[candidate] = max(scores.get(candidate, 0.0), count / option_counts[given])
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [Candidate(option, probability) for option, probability in ranked if probability >= min_probability][:n]
+
+
+def prefetch_explanations(
+    dataset: Any,
+    brand: str,
+    model: str,
+    options_str: str,
+    progress: Optional[Any] = None,
+) -> Dict[str, Any]:
+    """Explain and categorize a quote's options and their likely companions, filling the analysis caches.
+
+    The row's options come from the deterministic splitter; Analyze explains the
+    LLM-normalized list, which is the same codes for most quotes.
+    """
+    from analysis import EXPLANATION_CACHE, categorize_option, explain_option, filter_options
+    from llm_client import get_openai_client
+
+    client = get_openai_client()
+    model = model.strip()
+    brand = brand.strip()
+    own = [opt for opt in filter_options(brand, model, options_str).split("/") if opt]
+    candidates = list(dict.fromkeys(
+        own + [candidate.option for candidate in likely_options(dataset.quote_index(), brand, model, own)]
+    ))
+    missing = [opt for opt in candidates if (brand_key(brand), model.lower(), opt) not in EXPLANATION_CACHE]
+    with _stats_lock:
+        _stats["jobs"] += 1
+        _stats["candidates"] += len(candidates)
+        _stats["already_cached"] += len(candidates) - len(missing)
+    if client is None or not missing:
+        return {"candidates": candidates, "explained": []}
+
+    def warm(opt: str) -> Optional[str]:
+        explanation = explain_option(client, brand, model, opt)
+        # Failed explanations are not cached; categorizing the error text would waste a call
+        if (brand_key(brand), model.lower(), opt) not in EXPLANATION_CACHE:
+            return None
+        categorize_option(client, opt, explanation)
+        return opt
+
+    with ThreadPoolExecutor(max_workers=max(1, PREFETCH_WORKERS), thread_name_prefix="prefetch") as pool:
+        explained = [opt for opt in pool.map(warm, missing) if opt is not None]
+    with _stats_lock:
+        _stats["explained"] += len(explained)
+    print(f"DEBUG: Prefetched {len(explained)}/{len(missing)} option explanations for {brand} {model}")
+    return {"candidates": candidates, "explained": explained}
+
+
+def start_prefetch(dataset: Any, brand: str, model: str, options_str: str) -> Optional[str]:
+    """Queue a background prefetch for a selected quote and return its job ID (None when disabled).
+
+    Keyed per quote (brand, model and options), so reruns and other sessions selecting the
+    same quote share one job, while other quotes of the model get their own.
+    """
+    if not PREFETCH_ENABLED:
+        return None
+    from analysis import analysis_cache_key
+
+    return get_job_queue().submit(
+        prefetch_explanations,
+        dataset,
+        brand,
+        model,
+        options_str,
+        priority=PRIORITY_BACKGROUND,
+        key=f"prefetch|{analysis_cache_key(brand, model, options_str)}",
+    )
+
+
+def get_prefetch_stats() -> Dict[str, int]:
+    """Prefetch jobs run, candidate options considered, how many were already cached and how many were explained."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Option-explanation prefetch candidates from quote history")
+    parser.add_argument("brand")
+    parser.add_argument("model")
+    parser.add_argument("options", nargs="?", default="", help="the quote's options, '/'-separated")
+    parser.add_argument("-n", type=int, default=PREFETCH_MAX_OPTIONS)
+    parser.add_argument("--min-probability", type=float, default=PREFETCH_MIN_PROBABILITY)
+    args = parser.parse_args(argv)
+
+    from analysis import filter_options
+    from dataset import get_dataset
+
+    started = time.perf_counter()
+    index = get_dataset().quote_index()
+    built_at = time.perf_counter()
+    own = [opt for opt in filter_options(args.brand, args.model, args.options).split("/") if opt]
+    candidates = likely_options(index, args.brand, args.model, own, args.n, args.min_probability)
+    finished = time.perf_counter()
+    print(f"Index built in {built_at - started:.2f}s, candidates in {(finished - built_at) * 1000:.1f}ms")
+    for candidate in candidates:
+        print(f"{candidate.probability:6.2f}  {candidate.option}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
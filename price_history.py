@@ -0,0 +1,351 @@
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple
+
+from brands import canonical_brand
+from dedup import canonicalize_url
+
+if TYPE_CHECKING:
+    from records import ListingBatch
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# SQLite file holding every scraped price; set to an empty string to disable the store.
+PRICE_HISTORY_PATH = os.getenv("ATE_PRICE_HISTORY_PATH", os.path.join(ROOT, "price_history.sqlite3"))
+# Market data younger than this is answered from the store instead of scraping again
+PRICE_HISTORY_MAX_AGE = float(os.getenv("ATE_PRICE_HISTORY_MAX_AGE", "86400"))
+
+DAY = 86400
+
+# Vendors, sources and listing URLs are stored once and referenced by integer id. An
+# observation is a few small integers in a WITHOUT ROWID table whose key is
+# (equipment, listing, day), so a listing keeps one price per day however often it is
+# scraped, and all of an equipment's history is stored together.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS equipment (
+    id INTEGER PRIMARY KEY,
+    brand TEXT NOT NULL,
+    model TEXT NOT NULL,
+    last_scraped_at INTEGER,
+    snapshot BLOB,
+    UNIQUE (brand, model)
+);
+CREATE TABLE IF NOT EXISTS vendors (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS sources (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS listings (id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS observations (
+    equipment_id INTEGER NOT NULL,
+    listing_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    observed_at INTEGER NOT NULL,
+    vendor_id INTEGER NOT NULL,
+    source_id INTEGER NOT NULL,
+    price_cents INTEGER,
+    PRIMARY KEY (equipment_id, listing_id, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS equipment_last_scraped ON equipment (last_scraped_at);
+"""
+
+
+class Observation(NamedTuple):
+    observed_at: int
+    vendor: str
+    source: str
+    url: str
+    price: Optional[float]
+
+
+def _equipment_key(brand: str, model: str) -> Tuple[str, str]:
+    return canonical_brand(brand), model.strip()
+
+
+class PriceHistory:
+    """Time series of scraped listing prices per canonical brand/model, plus each model's latest scrape.
+
+    One connection per thread; SQLite's WAL mode lets readers run while a
+    scrape is being recorded.
+    """
+
+    def __init__(self, path: str = PRICE_HISTORY_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._ids: Dict[Tuple[str, str], int] = {}
+        with self._write_lock:
+            connection = self._connection()
+            connection.executescript(SCHEMA)
+            connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _id(self, connection: sqlite3.Connection, table: str, column: str, value: str) -> int:
+        """Id of a dictionary-table value, inserting it on first sight (caller holds the write lock)."""
+        cache_key = (table, value)
+        row_id = self._ids.get(cache_key)
+        if row_id is None:
+            connection.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+            row_id = connection.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+            # Vendors and sources are few; listing URLs grow without bound and are looked up each time
+            if table != "listings":
+                self._ids[cache_key] = row_id
+        return row_id
+
+    def record(self, brand: str, model: str, scraping: Dict[str, Any], observed_at: Optional[float] = None) -> int:
+        """Append a scrape's listings and keep it as the model's latest snapshot; returns observations written.
+
+        ``search_results`` may be a list of dicts or a ``records.ListingBatch``
+        (``scrape_effective_sites(batched=True)``); observations are read from
+        the batch's columns either way. Estimated fallback listings are not
+        market observations and are not stored; a scrape that produced only
+        those leaves no snapshot either.
+        """
+        from records import ListingBatch
+
+        observed_at = int(observed_at if observed_at is not None else time.time())
+        brand, model = _equipment_key(brand, model)
+        scraping = scraping or {}
+        listings = scraping.get("search_results", [])
+        if isinstance(listings, ListingBatch):
+            # The snapshot is JSON, so a batch goes back to dicts here
+            scraping = dict(scraping, search_results=listings.to_dicts())
+        else:
+            listings = ListingBatch.from_dicts(listings)
+        results = listings.filter(~listings.is_fallback())
+        with self._write_lock:
+            connection = self._connection()
+            try:
+                rows = self._write(connection, brand, model, scraping, results, observed_at)
+            except sqlite3.Error:
+                # Ids cached during the rolled-back transaction may not exist
+                self._ids.clear()
+                raise
+        return len(rows)
+
+    def _write(self, connection: sqlite3.Connection, brand: str, model: str, scraping: Dict[str, Any],
+               results: "ListingBatch", observed_at: int) -> List[tuple]:
+        with connection:
+            connection.execute("INSERT OR IGNORE INTO equipment (brand, model) VALUES (?, ?)", (brand, model))
+            equipment_id = connection.execute(
+                "SELECT id FROM equipment WHERE brand = ? AND model = ?", (brand, model)
+            ).fetchone()[0]
+            rows = []
+            for vendor, source, url, title, price in zip(
+                results.column("vendor"),
+                results.column("source"),
+                results.text_column("web_url"),
+                results.text_column("title"),
+                results.price.tolist(),
+            ):
+                vendor = str(vendor or "unknown")
+                url = canonicalize_url(url or "") or f"{vendor}:{title or ''}"
+                rows.append((
+                    equipment_id,
+                    self._id(connection, "listings", "url", url),
+                    observed_at // DAY,
+                    observed_at,
+                    self._id(connection, "vendors", "name", vendor),
+                    self._id(connection, "sources", "name", str(source or "unknown")),
+                    round(price * 100) if not math.isnan(price) else None,
+                ))
+            connection.executemany("INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            if len(results):
+                snapshot = zlib.compress(json.dumps(scraping, separators=(",", ":")).encode("utf-8"))
+                connection.execute(
+                    "UPDATE equipment SET last_scraped_at = ?, snapshot = ? WHERE id = ?",
+                    (observed_at, snapshot, equipment_id),
+                )
+        return rows
+
+    def latest(self, brand: str, model: str, max_age: Optional[float] = PRICE_HISTORY_MAX_AGE) -> Optional[Dict[str, Any]]:
+        """The last recorded scrape for a model when it is at most ``max_age`` seconds old (any age for None).
+
+        The payload is marked ``from_history`` with its ``as_of`` time.
+        """
+        brand, model = _equipment_key(brand, model)
+        row = self._connection().execute(
+            "SELECT last_scraped_at, snapshot FROM equipment WHERE brand = ? AND model = ?", (brand, model)
+        ).fetchone()
+        if row is None or row[1] is None:
+            return None
+        if max_age is not None and time.time() - row[0] > max_age:
+            return None
+        payload = json.loads(zlib.decompress(row[1]).decode("utf-8"))
+        payload["from_history"] = True
+        payload["as_of"] = row[0]
+        return payload
+
+    def history(self, brand: str, model: str, since: Optional[float] = None) -> List[Observation]:
+        """Every stored observation for a model, oldest first."""
+        brand, model = _equipment_key(brand, model)
+        rows = self._connection().execute(
+            """
+            SELECT o.observed_at, v.name, s.name, l.url, o.price_cents
+            FROM observations o
+            JOIN equipment e ON e.id = o.equipment_id
+            JOIN vendors v ON v.id = o.vendor_id
+            JOIN sources s ON s.id = o.source_id
+            JOIN listings l ON l.id = o.listing_id
+            WHERE e.brand = ? AND e.model = ? AND o.day >= ?
+            ORDER BY o.observed_at
+            """,
+            (brand, model, int(since // DAY) if since else 0),
+        ).fetchall()
+        return [
+            Observation(observed_at, vendor, source, url, cents / 100 if cents is not None else None)
+            for observed_at, vendor, source, url, cents in rows
+        ]
+
+    def frame(self, since: Optional[float] = None) -> Any:
+        """All observations (optionally from ``since`` on) as a pandas DataFrame with brand, model,
+        vendor, source, url, observed_at and numeric price columns."""
+        import pandas as pd
+
+        frame = pd.read_sql_query(
+            """
+            SELECT e.brand, e.model, v.name AS vendor, s.name AS source, l.url, o.observed_at, o.price_cents
+            FROM observations o
+            JOIN equipment e ON e.id = o.equipment_id
+            JOIN vendors v ON v.id = o.vendor_id
+            JOIN sources s ON s.id = o.source_id
+            JOIN listings l ON l.id = o.listing_id
+            WHERE o.day >= ?
+            """,
+            self._connection(),
+            params=(int(since // DAY) if since else 0,),
+        )
+        frame["price"] = frame.pop("price_cents").astype("float64") / 100
+        return frame
+
+    def stale(self, max_age: float = PRICE_HISTORY_MAX_AGE, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+        """(brand, model) pairs whose latest scrape is older than ``max_age``, oldest first.
+
+        Models whose scrapes so far produced only fallback listings have no
+        ``last_scraped_at``; they are included after the dated ones, so under
+        ``limit`` they do not crowd out models with real market data.
+        """
+        query = (
+            "SELECT brand, model FROM equipment WHERE last_scraped_at < ? OR last_scraped_at IS NULL"
+            " ORDER BY last_scraped_at IS NULL, last_scraped_at"
+        )
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return [tuple(row) for row in self._connection().execute(query, (int(time.time() - max_age),)).fetchall()]
+
+    def stats(self) -> Dict[str, Any]:
+        connection = self._connection()
+        counts = {
+            table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("equipment", "listings", "observations")
+        }
+        size = sum(os.path.getsize(path) for path in (self.path, f"{self.path}-wal") if os.path.exists(path))
+        observations = counts["observations"]
+        return {
+            "path": self.path,
+            "equipment": counts["equipment"],
+            "listings": counts["listings"],
+            "observations": observations,
+            "bytes": size,
+            "bytes_per_observation": round(size / observations, 1) if observations else None,
+        }
+
+
+_history: Optional[PriceHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_price_history() -> Optional[PriceHistory]:
+    """Process-wide store at ATE_PRICE_HISTORY_PATH; None when the store is disabled or cannot be opened."""
+    global _history
+    if not PRICE_HISTORY_PATH:
+        return None
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                try:
+                    _history = PriceHistory(PRICE_HISTORY_PATH)
+                except sqlite3.Error as e:
+                    print(f"DEBUG: Price history unavailable: {e}")
+                    return None
+    return _history
+
+
+def refresh_stale(
+    max_age: float = PRICE_HISTORY_MAX_AGE,
+    limit: Optional[int] = None,
+    io_workers: Optional[int] = None,
+) -> int:
+    """Re-scrape models whose stored market data is older than ``max_age``; returns how many were refreshed.
+
+    Models are scraped concurrently by ``effective_scraper.scrape_many``
+    (ATE_SCRAPE_IO_WORKERS threads unless ``io_workers`` is given). Listings
+    stay in ``records.ListingBatch`` columns from the summary to the store.
+    """
+    from effective_scraper import SCRAPE_IO_WORKERS, scrape_many
+
+    history = get_price_history()
+    if history is None:
+        return 0
+    refreshed = 0
+    for brand, model, scraping in scrape_many(history.stale(max_age, limit), io_workers or SCRAPE_IO_WORKERS, batched=True):
+        if scraping is None:
+            continue
+        try:
+            history.record(brand, model, scraping)
+            refreshed += 1
+        except Exception as e:
+            print(f"DEBUG: Price history refresh failed for {brand} {model}: {e}")
+    return refreshed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Local price-history store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="size of the store")
+    show = sub.add_parser("show", help="price observations for one model")
+    show.add_argument("brand")
+    show.add_argument("model")
+    refresh = sub.add_parser("refresh", help="re-scrape models whose market data is older than --max-age")
+    refresh.add_argument("--max-age", type=float, default=PRICE_HISTORY_MAX_AGE)
+    refresh.add_argument("--limit", type=int)
+    refresh.add_argument("--io-workers", type=int, help="concurrent scrapes (default ATE_SCRAPE_IO_WORKERS)")
+    refresh.add_argument("--parse-workers", type=int, help="parser processes (default ATE_PARSE_WORKERS; 0 parses inline)")
+    args = parser.parse_args(argv)
+
+    history = get_price_history()
+    if history is None:
+        print("Price history is disabled (ATE_PRICE_HISTORY_PATH is empty)")
+        return 1
+    if args.command == "stats":
+        print(json.dumps(history.stats(), indent=2))
+    elif args.command == "show":
+        for observation in history.history(args.brand, args.model):
+            price = f"${observation.price:,.2f}" if observation.price is not None else "-"
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(observation.observed_at))}  {price:>12}  "
+                  f"{observation.vendor:<24} {observation.url}")
+    else:
+        if args.parse_workers is not None:
+            from parse_pool import configure_parse_pool
+
+            configure_parse_pool(args.parse_workers)
+        print(f"Refreshed {refresh_stale(args.max_age, args.limit, args.io_workers)} models")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,16 @@
-import json
-from typing import Dict, Any, List
+import os
+import threading
+from typing import Dict, Any, List, Optional
 
-from openai import OpenAI
+from openai import BadRequestError, OpenAI
+
+from routing import get_route, routed_completion
+from structured_output import mark_response_format_unsupported, parse_structured, response_format_for
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 
 SYSTEM_PROMPT = (
@@ -164,118 +173,270 @@ CRITICAL: Only return URLs that you are 100% confident will work and lead to act
 """
 
 
-def build_user_prompt(original_text: str) -> str:
-    return (
-        "PARSE THIS INPUT TEXT:\n\n"
-        f"ORIGINAL TEXT: {original_text}\n\n"
-        "EXTRACTION TASK:\n"
-        "1) Extract the brand (first meaningful word before '/')"
-        "2) Extract the model (second meaningful word before '/')"
-        "3) Extract ALL options (including the word before first '/' and everything after split by '/')"
-        "4) Ignore any text after the last option"
-        "\n"
-        "OUTPUT: Return ONLY the JSON object with 'normalized' and 'results' keys."
-    )
+# Static extraction instructions for the normalizer. They live in the system
+# message so the per-call user message carries only the raw text and the
+# prefix stays byte-identical across calls (provider-side prompt caching).
+NORMALIZE_TASK_INSTRUCTIONS = (
+    "\n"
+    "EXTRACTION TASK:\n"
+    "1) Extract the brand (first meaningful word before '/')\n"
+    "2) Extract the model (second meaningful word before '/')\n"
+    "3) Extract ALL options (including the word before first '/' and everything after split by '/')\n"
+    "4) Ignore any text after the last option\n"
+    "\n"
+    "OUTPUT: Return ONLY the JSON object with 'normalized' and 'results' keys."
+)
 
 
-def build_complete_marketplace_search_prompt(brand: str, model: str, options: List[str] = None) -> str:
-    """Build the user prompt for complete marketplace search - simplified for brand + model only."""
-    
-    return f"""
-COMPLETE MARKETPLACE SEARCH TASK - BRAND + MODEL ONLY:
+# Compact variants: same rules, a fraction of the tokens.
+SYSTEM_PROMPT_COMPACT = (
+    "Extract brand, model and options from free-form electronic test equipment text.\n"
+    "Rules:\n"
+    "- Ignore filler words: enter, a, query, like, with, options, option, such, as, the, is, has, to, be, "
+    "delivered, soon, please, need, want, find, search, looking, for.\n"
+    "- Brand = first meaningful word, model = second meaningful word, both before the first '/'.\n"
+    "- Options = the word immediately before the first '/' plus every non-empty '/'-separated part after it; "
+    "stop at the first space after the last '/' and ignore any trailing text.\n"
+    "Example: 'Agilent 8116A with options like 160/EEC/PLK/UK6 please deliver quickly' -> "
+    "brand 'Agilent', model '8116A', options ['160', 'EEC', 'PLK', 'UK6'].\n"
+    "Return ONLY JSON: {\"normalized\": {\"brand\": string, \"model\": string, \"options\": [string]}, \"results\": []}"
+)
 
-TARGET EQUIPMENT:
-- Brand: {brand}
-- Model: {model}
-- Full Query: {brand} {model}
 
-CRITICAL SEARCH REQUIREMENTS:
+SYSTEM_PROMPT_COMPLETE_MARKETPLACE_COMPACT = """You are an expert electronic test equipment researcher. Find real, working product listings for the target equipment anywhere in the global marketplace: manufacturers, authorized dealers, distributors, marketplaces (eBay, Amazon, Alibaba), auctions, classifieds, rental, calibration and refurbished equipment vendors.
 
-1) SEARCH THE ENTIRE MARKETPLACE - NO LIMITATIONS:
-   - Search ALL possible sources: manufacturers, dealers, distributors, marketplaces, auction sites, classifieds, etc.
-   - Include: eBay, Amazon, Alibaba, AliExpress, local marketplaces, specialized equipment vendors
-   - Include: manufacturer websites, authorized dealers, independent sellers, refurbished equipment vendors
-   - Include: rental companies, calibration labs, test equipment specialists
-   - NO restrictions on which websites to search - find it wherever it exists
+Rules:
+- Only direct product-page URLs you are confident work. Never search-result pages or links that may 404.
+- Every listing must match the exact brand and exact model number; note any requested options it matches.
+- Give actual prices with currency ("$1,234.56", ranges like "$1,000-$2,000"), normalized to USD when possible. Use "Price not available" only when no price is listed.
+- Use clean official vendor names (drop "electronics", "store", "shop").
 
-2) URL VALIDATION - WORKING LINKS ONLY:
-   - ONLY return URLs that you KNOW are working and accessible
-   - URLs MUST be direct product pages, NOT search results
-   - URLs MUST contain the exact product information
-   - NO 404 errors or broken links
-   - If you're not 100% sure a URL works, DON'T include it
+Return ONLY JSON:
+{"search_results": [{"brand": str, "model": str, "options": [str], "price": str, "vendor": str, "web_url": str, "qty_available": str, "source": str, "option_details": str}],
+ "search_summary": {"total_results": int, "exact_matches": int, "partial_matches": int, "price_range": str, "vendor_count": int, "search_quality_score": "high|medium|low", "recommendations": [str], "search_queries_used": [str]}}"""
 
-3) PRICING REQUIREMENTS:
-   - MUST find ACTUAL prices, not "Contact for pricing" unless absolutely necessary
-   - Look for specific price amounts: $1,234.56, €1,234.56, £1,234.56, ¥1,234.56
-   - Handle price ranges: "$1,000-$2,000"
-   - Normalize to USD when possible
-   - If no price found, mark as "Price not available"
 
-4) COMPREHENSIVE SEARCH STRATEGY:
-   - Use EXACT model numbers: "{brand} {model}"
-   - Search for datasheets and product specifications
-   - Look for official product catalogs
-   - Use manufacturer part numbers when available
-   - Search for used, refurbished, and demo equipment
-   - Search for rental and lease options
+OPTION_EXPLANATION_SYSTEM_PROMPT = (
+    "You are a helpful expert explaining test equipment options in simple terms. "
+    "For the option named by the user, explain briefly what it adds or changes, its typical functionality, "
+    "and any compatibility considerations. Answer in 3-5 concise sentences in simple terms."
+)
 
-5) PRODUCT VERIFICATION:
-   - MUST contain exact brand name ({brand})
-   - MUST contain exact model number ({model})
-   - MUST be a real product page with specifications
-   - MUST have working URL that leads to product information
 
-6) GLOBAL MARKETPLACE SEARCH:
-   - Search ALL major marketplaces: eBay, Amazon, Alibaba, AliExpress, etc.
-   - Search ALL manufacturer websites: Keysight, Tektronix, Rohde & Schwarz, etc.
-   - Search ALL authorized dealers and distributors
-   - Search ALL specialized test equipment vendors
-   - Search ALL auction sites and classifieds
-   - Search ALL rental and refurbished equipment companies
+OPTION_CATEGORIES = ["Connectivity", "Software", "Calibration", "Power", "Display", "Storage", "Communication", "General"]
 
-7) QUALITY CONTROL:
-   - REJECT any URL that might be a search results page
-   - REJECT any URL that doesn't contain the specific model ({model})
-   - REJECT any URL that doesn't have pricing information
-   - REJECT any URL that might lead to 404 errors
-   - ONLY include URLs you are 100% confident will work
+OPTION_CATEGORY_SYSTEM_PROMPT = (
+    "You are a helpful expert that categorizes test equipment options. "
+    "Categorize the option described by the user into one of these categories: "
+    + ", ".join(OPTION_CATEGORIES[:-1]) + ", or " + OPTION_CATEGORIES[-1] + ". "
+    "Respond with only the category name, nothing else."
+)
 
-8) PRICING EXTRACTION:
-   - Extract actual numerical prices with currency symbols
-   - Handle various formats: "$1,234.56", "1,234.56 USD", "€1.234,56", "¥1,234.56"
-   - Look for price ranges and use average or range
-   - Handle "Contact for pricing" only when no other price is available
 
-9) VENDOR VERIFICATION:
-    - Use official company names
-    - Clean vendor names: remove "electronics", "store", "shop"
-    - Include ALL types of vendors: manufacturers, dealers, distributors, sellers
-    - Don't limit to specific vendors - find it wherever it's available
+USE_COMPACT_PROMPTS = os.getenv("ATE_COMPACT_PROMPTS", "1") != "0"
+USE_PROMPT_CACHE_KEY = os.getenv("ATE_PROMPT_CACHE_KEY", "1") != "0"
 
-SEARCH QUERIES TO TRY (search ALL of these):
-- "{brand} {model}"
-- "{brand} {model} datasheet"
-- "{brand} {model} specifications"
-- "{brand} {model} product page"
-- "{brand} {model} used"
-- "{brand} {model} refurbished"
-- "{brand} {model} rental"
-- "{brand} {model} for sale"
-- "{brand} {model} buy"
-- "{brand} {model} price"
 
-CRITICAL: Search the ENTIRE marketplace without any limitations. Find this equipment wherever it exists in the world and return ONLY working, verified URLs with actual pricing information.
+def get_normalize_system_prompt() -> str:
+    """System prompt for option normalization (compact unless ATE_COMPACT_PROMPTS=0)."""
+    if USE_COMPACT_PROMPTS:
+        return SYSTEM_PROMPT_COMPACT
+    return SYSTEM_PROMPT + NORMALIZE_TASK_INSTRUCTIONS
 
-OUTPUT: Return ONLY the JSON object with search_results and search_summary.
-"""
+
+def get_marketplace_system_prompt() -> str:
+    """System prompt for the marketplace search (compact unless ATE_COMPACT_PROMPTS=0)."""
+    if USE_COMPACT_PROMPTS:
+        return SYSTEM_PROMPT_COMPLETE_MARKETPLACE_COMPACT
+    return SYSTEM_PROMPT_COMPLETE_MARKETPLACE
+
+
+def build_messages(system_prompt: str, user_content: str) -> List[Dict[str, str]]:
+    """Lay out a chat request as static system prefix followed by the per-call user content."""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content},
+    ]
+
+
+def prompt_cache_kwargs(prompt_name: str) -> Dict[str, Any]:
+    """Extra request arguments that route calls sharing a prefix to the same provider cache."""
+    if not USE_PROMPT_CACHE_KEY:
+        return {}
+    return {"extra_body": {"prompt_cache_key": f"ate-{prompt_name}"}}
+
+
+def build_user_prompt(original_text: str) -> str:
+    return f"ORIGINAL TEXT: {original_text}"
+
+
+def build_complete_marketplace_search_prompt(brand: str, model: str, options: List[str] = None) -> str:
+    """Build the per-call user prompt for complete marketplace search; all static rules live in the system prompt."""
+    lines = [
+        "TARGET EQUIPMENT:",
+        f"- Brand: {brand}",
+        f"- Model: {model}",
+    ]
+    if options:
+        lines.append(f"- Options: {', '.join(options)}")
+    lines.append("OUTPUT: Return ONLY the JSON object with search_results and search_summary.")
+    return "\n".join(lines)
+
+
+def build_option_explanation_messages(brand: str, model: str, option: str) -> List[Dict[str, str]]:
+    return build_messages(OPTION_EXPLANATION_SYSTEM_PROMPT, f"Option '{option}' for {brand} {model}.")
+
+
+def build_option_category_messages(option: str, explanation: str) -> List[Dict[str, str]]:
+    return build_messages(OPTION_CATEGORY_SYSTEM_PROMPT, f"Option '{option}': {explanation}")
+
+
+# ---------------------------------------------------------------------------
+# Token accounting
+# ---------------------------------------------------------------------------
+
+_ENCODINGS: Dict[str, Any] = {}
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Count tokens with tiktoken when installed, otherwise estimate ~4 characters per token."""
+    if not text:
+        return 0
+    if tiktoken is None:
+        return max(1, (len(text) + 3) // 4)
+    encoding = _ENCODINGS.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        _ENCODINGS[model] = encoding
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-4") -> int:
+    """Approximate chat input tokens: content plus the per-message framing overhead."""
+    return sum(count_tokens(m.get("content", ""), model) + 4 for m in messages) + 3
+
+
+def prompt_token_report(model: str = "gpt-4") -> Dict[str, int]:
+    """Token counts of every static prompt, full and compact, plus a sample per-call message."""
+    return {
+        "SYSTEM_PROMPT": count_tokens(SYSTEM_PROMPT + NORMALIZE_TASK_INSTRUCTIONS, model),
+        "SYSTEM_PROMPT_COMPACT": count_tokens(SYSTEM_PROMPT_COMPACT, model),
+        "SYSTEM_PROMPT_COMPLETE_MARKETPLACE": count_tokens(SYSTEM_PROMPT_COMPLETE_MARKETPLACE, model),
+        "SYSTEM_PROMPT_COMPLETE_MARKETPLACE_COMPACT": count_tokens(SYSTEM_PROMPT_COMPLETE_MARKETPLACE_COMPACT, model),
+        "OPTION_EXPLANATION_SYSTEM_PROMPT": count_tokens(OPTION_EXPLANATION_SYSTEM_PROMPT, model),
+        "OPTION_CATEGORY_SYSTEM_PROMPT": count_tokens(OPTION_CATEGORY_SYSTEM_PROMPT, model),
+        "user:normalize": count_tokens(build_user_prompt("Agilent 8116A 160/EEC/PLK/UK6"), model),
+        "user:marketplace": count_tokens(build_complete_marketplace_search_prompt("Agilent", "8116A"), model),
+    }
+
+
+PROMPT_USAGE_STATS: Dict[str, Dict[str, int]] = {}
+_USAGE_LOCK = threading.Lock()
+
+
+def record_prompt_usage(prompt_name: str, completion: Any) -> Dict[str, int]:
+    """Record prompt, cached and completion tokens reported by the provider for one call."""
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return {}
+    details = getattr(usage, "prompt_tokens_details", None)
+    entry = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+    with _USAGE_LOCK:
+        stats = PROMPT_USAGE_STATS.setdefault(
+            prompt_name, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        )
+        stats["calls"] += 1
+        for key, value in entry.items():
+            stats[key] += value
+    print(f"DEBUG: {prompt_name} usage: prompt={entry['prompt_tokens']} cached={entry['cached_tokens']} completion={entry['completion_tokens']}")
+    return entry
+
+
+def get_prompt_usage_stats() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of per-prompt token usage including the cached share of input tokens."""
+    with _USAGE_LOCK:
+        snapshot = {name: dict(stats) for name, stats in PROMPT_USAGE_STATS.items()}
+    for stats in snapshot.values():
+        prompt_tokens = stats["prompt_tokens"]
+        stats["cache_hit_ratio"] = round(stats["cached_tokens"] / prompt_tokens, 3) if prompt_tokens else 0.0
+    return snapshot
+
+
+def _rejects_response_format(error: BadRequestError) -> bool:
+    """Whether a 400 names the response_format / json_schema parameter."""
+    body = getattr(error, "body", None)
+    param = body.get("param") if isinstance(body, dict) else None
+    text = f"{param or ''} {error}".lower()
+    return "response_format" in text or "json_schema" in text
+
+
+def _structured_completion(
+    client: OpenAI,
+    task: str,
+    messages: List[Dict[str, str]],
+    schema: Dict[str, Any],
+    llm_model: Optional[str],
+    temperature: float,
+) -> Any:
+    """Routed completion that requests schema-constrained output when the model supports it."""
+    model = llm_model or get_route(task).model
+    response_format = response_format_for(model, schema)
+    kwargs = prompt_cache_kwargs(task)
+    if response_format is not None:
+        try:
+            return routed_completion(
+                client, task, messages, model=model, temperature=temperature,
+                response_format=response_format, **kwargs,
+            )
+        except BadRequestError as e:
+            # Only a rejected response_format falls back to a plain request (and is remembered);
+            # context-length, content-filter and other 400s are not about the format.
+            if not _rejects_response_format(e):
+                raise
+            print(f"DEBUG: {model} rejected response_format for {task}: {e}")
+            mark_response_format_unsupported(model)
+    return routed_completion(client, task, messages, model=model, temperature=temperature, **kwargs)
+
+
+def _empty_normalized_payload() -> Dict[str, Any]:
+    return {
+        "normalized": {
+            "brand": "",
+            "model": "",
+            "options": []
+        },
+        "results": []
+    }
+
+
+def _empty_marketplace_payload(price_range: str, recommendation: str) -> Dict[str, Any]:
+    return {
+        "search_results": [],
+        "search_summary": {
+            "total_results": 0,
+            "exact_matches": 0,
+            "partial_matches": 0,
+            "price_range": price_range,
+            "vendor_count": 0,
+            "search_quality_score": "low",
+            "recommendations": [recommendation],
+            "search_queries_used": []
+        }
+    }
 
 
 def normalize_options_via_llm(
     client: OpenAI,
     original_text: str,
-    llm_model: str,
-    temperature: float,
+    llm_model: Optional[str] = None,
+    temperature: float = 0.0,
 ) -> Dict[str, Any]:
     schema = {
         "name": "normalized_payload",
@@ -292,7 +453,10 @@ def normalize_options_via_llm(
                     "required": ["brand", "model", "options"],
                     "additionalProperties": False
                 },
-                "results": {"type": "array", "items": {"type": "object"}}
+                "results": {
+                    "type": "array",
+                    "items": {"type": "object", "properties": {}, "required": [], "additionalProperties": False}
+                }
             },
             "required": ["normalized", "results"],
             "additionalProperties": False
@@ -302,38 +466,20 @@ def normalize_options_via_llm(
 
     user_prompt = build_user_prompt(original_text)
 
-    completion = client.chat.completions.create(
-        model=llm_model,
-        temperature=temperature,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
+    completion = _structured_completion(
+        client,
+        "normalize",
+        build_messages(get_normalize_system_prompt(), user_prompt),
+        schema,
+        llm_model,
+        temperature,
     )
+    record_prompt_usage("normalize", completion)
 
-    content = completion.choices[0].message.content or "{}"
-    try:
-        data = json.loads(content)
-        # Ensure the response has the correct structure
-        if "normalized" not in data:
-            data = {
-                "normalized": {
-                    "brand": "",
-                    "model": "",
-                    "options": []
-                },
-                "results": []
-            }
-        return data
-    except Exception:
-        return {
-            "normalized": {
-                "brand": "",
-                "model": "",
-                "options": []
-            },
-            "results": []
-        }
+    data, _ = parse_structured(completion.choices[0].message.content, schema, "normalize")
+    if data is None:
+        return _empty_normalized_payload()
+    return data
 
 
 def complete_marketplace_search_via_llm(
@@ -341,12 +487,12 @@ def complete_marketplace_search_via_llm(
     brand: str,
     model: str,
     options: List[str] = None,
-    llm_model: str = "gpt-4",
+    llm_model: Optional[str] = None,
     temperature: float = 0.0
 ) -> Dict[str, Any]:
     """Use LLM to search the COMPLETE marketplace without any limitations."""
     
-    # Build the complete marketplace search prompt (now simplified for brand + model only)
+    # Build the per-call marketplace search prompt (brand + model only)
     user_prompt = build_complete_marketplace_search_prompt(brand, model, [])
     
     # Define the expected schema for complete marketplace search
@@ -362,13 +508,16 @@ def complete_marketplace_search_via_llm(
                         "properties": {
                             "brand": {"type": "string"},
                             "model": {"type": "string"},
+                            "options": {"type": "array", "items": {"type": "string"}},
                             "price": {"type": "string"},
                             "vendor": {"type": "string"},
                             "web_url": {"type": "string"},
                             "qty_available": {"type": "string"},
-                            "source": {"type": "string"}
+                            "source": {"type": "string"},
+                            "option_details": {"type": "string"}
                         },
-                        "required": ["brand", "model", "price", "vendor", "web_url", "qty_available", "source"]
+                        "required": ["brand", "model", "options", "price", "vendor", "web_url", "qty_available", "source", "option_details"],
+                        "additionalProperties": False
                     }
                 },
                 "search_summary": {
@@ -383,60 +532,33 @@ def complete_marketplace_search_via_llm(
                         "recommendations": {"type": "array", "items": {"type": "string"}},
                         "search_queries_used": {"type": "array", "items": {"type": "string"}}
                     },
-                    "required": ["total_results", "exact_matches", "partial_matches", "price_range", "vendor_count", "search_quality_score"]
+                    "required": ["total_results", "exact_matches", "partial_matches", "price_range", "vendor_count", "search_quality_score", "recommendations", "search_queries_used"],
+                    "additionalProperties": False
                 }
             },
-            "required": ["search_results", "search_summary"]
+            "required": ["search_results", "search_summary"],
+            "additionalProperties": False
         },
         "strict": True
     }
     
     try:
-        completion = client.chat.completions.create(
-            model=llm_model,
-            temperature=temperature,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT_COMPLETE_MARKETPLACE},
-                {"role": "user", "content": user_prompt},
-            ],
+        completion = _structured_completion(
+            client,
+            "marketplace_search",
+            build_messages(get_marketplace_system_prompt(), user_prompt),
+            schema,
+            llm_model,
+            temperature,
         )
+        record_prompt_usage("marketplace_search", completion)
         
-        content = completion.choices[0].message.content or "{}"
-        data = json.loads(content)
-        
-        # Ensure the response has the correct structure
-        if "search_results" not in data:
-            data = {
-                "search_results": [],
-                "search_summary": {
-                    "total_results": 0,
-                    "exact_matches": 0,
-                    "partial_matches": 0,
-                    "price_range": "No results found",
-                    "vendor_count": 0,
-                    "search_quality_score": "low",
-                    "recommendations": ["No search results available"],
-                    "search_queries_used": []
-                }
-            }
-        
+        data, _ = parse_structured(completion.choices[0].message.content, schema, "marketplace_search")
+        if data is None:
+            return _empty_marketplace_payload("No results found", "No search results available")
         return data
         
     except Exception as e:
         print(f"Complete marketplace search error: {e}")
         # Return empty results on error
-        return {
-            "search_results": [],
-            "search_summary": {
-                "total_results": 0,
-                "exact_matches": 0,
-                "partial_matches": 0,
-                "price_range": "Search failed",
-                "vendor_count": 0,
-                "search_quality_score": "low",
-                "recommendations": [f"Search failed due to error: {e}"],
-                "search_queries_used": []
-            }
-        }
-
-
+        return _empty_marketplace_payload("Search failed", f"Search failed due to error: {e}")
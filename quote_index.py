@@ -0,0 +1,216 @@
+import argparse
+import os
+import sys
+import time
+from itertools import chain
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from brands import canonical_brand
+
+DEFAULT_INDEX_DIR = os.getenv("ATE_QUOTE_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "quote_index"))
+FREQUENCIES_FILE = "option_frequencies.parquet"
+COOCCURRENCE_FILE = "option_cooccurrence.parquet"
+# Quotes listing more distinct options than this are skipped for pair counting (k options -> k*(k-1)/2 pairs).
+MAX_OPTIONS_FOR_PAIRS = int(os.getenv("ATE_QUOTE_INDEX_MAX_OPTIONS", "40"))
+
+
+class QuoteIndex(NamedTuple):
+    frequencies: pd.DataFrame  # brand, model, option, count
+    cooccurrence: pd.DataFrame  # brand, model, option_a, option_b, count
+
+
+def explode_options(
+    quotes: pd.DataFrame,
+    brand_col: str = "eqBrand",
+    model_col: str = "eqModel",
+    options_col: str = "options",
+) -> pd.DataFrame:
+    """One row per (quote, option): columns quote, brand, model, option (categoricals).
+
+    Brands are canonical ("Agilent" and "Keysight" quotes count together).
+    Same rules as ``analysis.filter_options``: split on '/', strip, drop empty
+    entries and entries that repeat the brand or model name. Repeats within a
+    quote are kept once. Stripping and case-folding run once per distinct
+    string rather than once per row.
+    """
+    count = len(quotes)
+    brands = quotes[brand_col].fillna("").astype(str).str.strip()
+    models = quotes[model_col].fillna("").astype(str).str.strip()
+    lists = [text.split("/") for text in quotes[options_col].fillna("").astype(str).tolist()]
+    lengths = np.fromiter((len(parts) for parts in lists), dtype=np.int64, count=count)
+    quote = np.repeat(np.arange(count, dtype=np.int64), lengths)
+
+    raw_codes, raw_uniques = pd.factorize(np.array(list(chain.from_iterable(lists)), dtype=object))
+    # " K70" and "K70" become one category after stripping
+    clean_codes, options = pd.factorize(pd.Index(raw_uniques).str.strip())
+    codes = clean_codes[raw_codes]
+    option_lower = np.asarray(pd.Index(options).str.lower(), dtype=object)[codes]
+    keep = (
+        (np.asarray(options, dtype=object)[codes] != "")
+        & (option_lower != brands.str.lower().to_numpy(dtype=object)[quote])
+        & (option_lower != models.str.lower().to_numpy(dtype=object)[quote])
+    )
+    exploded = pd.DataFrame({"quote": quote[keep], "option_code": codes[keep]})
+    exploded = exploded.drop_duplicates(ignore_index=True)
+    rows = exploded["quote"].to_numpy()
+    brand_codes, brand_names = pd.factorize(brands.to_numpy(dtype=object)[rows])
+    canonical = pd.Index([canonical_brand(name) for name in brand_names], dtype=object)
+    return pd.DataFrame({
+        "quote": rows,
+        "brand": pd.Categorical(canonical[brand_codes]),
+        "model": pd.Categorical(models.to_numpy(dtype=object)[rows]),
+        "option": pd.Categorical.from_codes(
+            exploded["option_code"].to_numpy(), pd.Index(options, dtype=object)
+        ).remove_unused_categories(),
+    })
+
+
+def option_frequencies(exploded: pd.DataFrame) -> pd.DataFrame:
+    """Quotes per (brand, model, option), most frequent first within each model."""
+    counts = (
+        exploded.groupby(["brand", "model", "option"], observed=True)
+        .size()
+        .rename("count")
+        .reset_index()
+    )
+    counts["count"] = counts["count"].astype(np.int32)
+    return counts.sort_values(["brand", "model", "count"], ascending=[True, True, False], ignore_index=True)
+
+
+def option_cooccurrence(exploded: pd.DataFrame, min_count: int = 1) -> pd.DataFrame:
+    """Quotes in which two options of the same model were requested together (unordered pairs, a < b).
+
+    Quotes are grouped by how many options they list; each group of k-option
+    quotes becomes a (quotes x k) matrix of option codes whose column pairs are
+    the option pairs, so pairs are produced without a per-quote Python loop.
+    """
+    ordered = exploded.sort_values(["quote", "option"], kind="stable")
+    quotes = ordered["quote"].to_numpy()
+    codes = ordered["option"].cat.codes.to_numpy(dtype=np.int32)
+    equipment, equipment_keys = pd.factorize(pd.MultiIndex.from_arrays([ordered["brand"], ordered["model"]]))
+    starts = np.flatnonzero(np.r_[True, quotes[1:] != quotes[:-1]])
+    sizes = np.diff(np.r_[starts, len(quotes)])
+
+    firsts, seconds, owners = [], [], []
+    for size in np.unique(sizes):
+        if size < 2 or size > MAX_OPTIONS_FOR_PAIRS:
+            continue
+        group_starts = starts[sizes == size]
+        matrix = codes[group_starts[:, None] + np.arange(size)]
+        owner = equipment[group_starts]
+        for i in range(size - 1):
+            for j in range(i + 1, size):
+                firsts.append(matrix[:, i])
+                seconds.append(matrix[:, j])
+                owners.append(owner)
+    columns = ["brand", "model", "option_a", "option_b", "count"]
+    if not firsts:
+        return pd.DataFrame(columns=columns)
+
+    categories = exploded["option"].cat.categories
+    width = np.int64(len(categories))
+    if len(equipment_keys) * int(width) * int(width) >= 2 ** 63:
+        raise ValueError("too many distinct options to pack pair keys into int64")
+    # (equipment, a, b) packed into one int64 so counting is a single sort
+    keys = (np.concatenate(owners).astype(np.int64) * width + np.concatenate(firsts)) * width + np.concatenate(seconds)
+    unique_keys, counts = np.unique(keys, return_counts=True)
+    unique_keys = unique_keys[counts >= min_count]
+    counts = counts[counts >= min_count]
+    equipment_ids, rest = np.divmod(unique_keys, width * width)
+    option_a, option_b = np.divmod(rest, width)
+    result = pd.DataFrame({
+        "brand": pd.Categorical(equipment_keys.get_level_values(0)[equipment_ids]),
+        "model": pd.Categorical(equipment_keys.get_level_values(1)[equipment_ids]),
+        "option_a": pd.Categorical.from_codes(option_a, categories),
+        "option_b": pd.Categorical.from_codes(option_b, categories),
+        "count": counts.astype(np.int32),
+    }, columns=columns)
+    return result.sort_values("count", ascending=False, ignore_index=True, kind="stable")
+
+
+def build_quote_index(quotes: pd.DataFrame, min_pair_count: int = 1) -> QuoteIndex:
+    exploded = explode_options(quotes)
+    return QuoteIndex(option_frequencies(exploded), option_cooccurrence(exploded, min_pair_count))
+
+
+def save_quote_index(index: QuoteIndex, directory: str = DEFAULT_INDEX_DIR) -> None:
+    """Write both tables as Parquet; categorical columns are stored dictionary-encoded."""
+    os.makedirs(directory, exist_ok=True)
+    index.frequencies.to_parquet(os.path.join(directory, FREQUENCIES_FILE), index=False)
+    index.cooccurrence.to_parquet(os.path.join(directory, COOCCURRENCE_FILE), index=False)
+
+
+def load_quote_index(directory: str = DEFAULT_INDEX_DIR) -> Optional[QuoteIndex]:
+    """The saved index, or None when it has not been built."""
+    try:
+        return QuoteIndex(
+            pd.read_parquet(os.path.join(directory, FREQUENCIES_FILE)),
+            pd.read_parquet(os.path.join(directory, COOCCURRENCE_FILE)),
+        )
+    except (OSError, ValueError):
+        return None
+
+
+def top_options(index: QuoteIndex, brand: str, model: str, n: int = 10) -> List[str]:
+    """Options most often quoted for a model."""
+    table = index.frequencies
+    rows = table[(table["brand"] == canonical_brand(brand)) & (table["model"] == model)]
+    return rows.nlargest(n, "count")["option"].astype(str).tolist()
+
+
+def related_options(index: QuoteIndex, brand: str, model: str, option: str, n: int = 5) -> List[str]:
+    """Options most often requested together with ``option`` on the same model."""
+    table = index.cooccurrence
+    rows = table[(table["brand"] == canonical_brand(brand)) & (table["model"] == model)
+                 & ((table["option_a"] == option) | (table["option_b"] == option))]
+    rows = rows.nlargest(n, "count")
+    return [str(b) if str(a) == option else str(a) for a, b in zip(rows["option_a"], rows["option_b"])]
+
+
+def _synthetic_quotes(rows: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    brands = np.array(["Agilent", "Keysight", "Rohde & Schwarz", "Tektronix", "Anritsu", "BOONTON"])
+    models = np.array([f"M{i:04d}" for i in range(2000)])
+    codes = np.array([f"{prefix}{i:02d}" for prefix in ("B", "K", "P", "0") for i in range(40)])
+    option_counts = rng.integers(0, 12, rows)
+    flat = rng.choice(codes, option_counts.sum())
+    splits = np.split(flat, np.cumsum(option_counts)[:-1])
+    return pd.DataFrame({
+        "eqBrand": brands[rng.integers(0, len(brands), rows)],
+        "eqModel": models[rng.integers(0, len(models), rows)],
+        "options": ["/".join(parts) for parts in splits],
+    })
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Option frequency / co-occurrence index over quote history")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build the index from a tab-separated quote export")
+    build.add_argument("path")
+    build.add_argument("--out", default=DEFAULT_INDEX_DIR)
+    bench = sub.add_parser("bench", help="build an index over synthetic quotes and report timings")
+    bench.add_argument("--rows", type=int, default=300_000)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        quotes = pd.read_csv(args.path, sep="\t", dtype=str, keep_default_na=False)
+    else:
+        quotes = _synthetic_quotes(args.rows)
+    started = time.perf_counter()
+    exploded = explode_options(quotes)
+    exploded_at = time.perf_counter()
+    index = QuoteIndex(option_frequencies(exploded), option_cooccurrence(exploded))
+    finished = time.perf_counter()
+    print(f"{len(quotes)} quotes -> {len(exploded)} (quote, option) rows in {exploded_at - started:.2f}s; "
+          f"{len(index.frequencies)} option counts, {len(index.cooccurrence)} pairs in {finished - exploded_at:.2f}s")
+    if args.command == "build":
+        save_quote_index(index, args.out)
+        print(f"Saved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
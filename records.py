@@ -0,0 +1,497 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from brands import canonical_brand
+from dedup import FALLBACK_SOURCES
+from market_stats import group_summary, grouped_price_stats, parse_prices
+
+
+# Listing fields by storage. Categorical values repeat across results (every listing of a
+# scrape has the same brand and model, a handful of vendors and price placeholders) and
+# are stored once per batch; each row holds an int32 code. URLs and titles are unique
+# per listing and live in one UTF-8 buffer. Any other key is kept per row as a dict.
+# Prices the scrapers formatted themselves ("$1850.00") are kept only as numbers; the
+# price vocabulary holds placeholders such as "Contact vendor" and odd spellings.
+CATEGORICAL_FIELDS = ("brand", "model", "vendor", "source", "qty_available", "price")
+TEXT_FIELDS = ("web_url", "title")
+NUMERIC_FIELDS = ("price_value", "price_outlier", "observed_at")
+# Key order of rebuilt dicts: the order the scrapers write, then the fields added later
+FIELD_ORDER = ("brand", "model", "price", "vendor", "web_url", "qty_available", "source", "title") + NUMERIC_FIELDS
+
+# Per-row state of text and numeric fields, so dicts come back with the same keys and types
+ABSENT, NONE, STRING, FLOAT, INT, BOOL = 0, 1, 2, 3, 4, 5
+# Price code of a display price rebuilt from the numeric column
+FORMATTED_PRICE = -2
+_NUMERIC_TYPES = {bool: BOOL, int: INT, float: FLOAT}
+
+
+def _is_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float))
+
+
+def _format_price(price: float) -> str:
+    return f"${price:.2f}"
+
+
+def _formatted_price(value: Any) -> Optional[float]:
+    """The number behind a display price in the scrapers' own "$1234.56" format, else None."""
+    if not isinstance(value, str) or not value.startswith("$"):
+        return None
+    try:
+        price = float(value[1:])
+    except ValueError:
+        return None
+    return price if _format_price(price) == value else None
+
+
+class _Vocabulary:
+    """Distinct values of a categorical field in first-seen order; strings are interned."""
+
+    __slots__ = ("values", "codes")
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.codes: Dict[Any, int] = {}
+
+    def encode(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(sys.intern(value) if isinstance(value, str) else value)
+            self.codes[value] = code
+        return code
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.values) + sys.getsizeof(self.codes) + sum(sys.getsizeof(value) for value in self.values)
+
+
+class _TextColumn:
+    """Strings packed into one UTF-8 buffer with int64 offsets, plus a per-row state.
+
+    :meth:`take` keeps the buffer and gathers row numbers only, so sorted and
+    filtered batches share their parent's bytes.
+    """
+
+    __slots__ = ("data", "offsets", "state", "rows")
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, state: np.ndarray, rows: Optional[np.ndarray] = None):
+        self.data = data
+        self.offsets = offsets
+        self.state = state
+        self.rows = rows
+
+    @classmethod
+    def build(cls, encoded: List[bytes], state: List[int]) -> "_TextColumn":
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets, np.array(state, dtype=np.uint8))
+
+    def get(self, row: int) -> str:
+        if self.rows is not None:
+            row = self.rows[row]
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def take(self, indices: np.ndarray) -> "_TextColumn":
+        rows = self.rows[indices] if self.rows is not None else indices
+        return _TextColumn(self.data, self.offsets, self.state[indices], rows)
+
+    def compact(self) -> "_TextColumn":
+        """A copy holding only this column's own strings, in order."""
+        if self.rows is None:
+            return self
+        starts = self.offsets[self.rows]
+        lengths = self.offsets[self.rows + 1] - starts
+        offsets = np.zeros(len(self.rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Byte positions of every kept string, gathered in one pass
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return _TextColumn(self.data[positions], offsets, self.state)
+
+    @classmethod
+    def concat(cls, columns: Sequence["_TextColumn"]) -> "_TextColumn":
+        columns = [column.compact() for column in columns]
+        shifts = np.cumsum([0] + [len(column.data) for column in columns[:-1]])
+        offsets = np.concatenate([np.zeros(1, dtype=np.int64)] + [
+            column.offsets[1:] + shift for column, shift in zip(columns, shifts)
+        ])
+        return cls(
+            np.concatenate([column.data for column in columns]),
+            offsets,
+            np.concatenate([column.state for column in columns]),
+        )
+
+    def nbytes(self) -> int:
+        """Bytes of the buffer (shared after :meth:`take`), offsets, states and row numbers."""
+        return self.data.nbytes + self.offsets.nbytes + self.state.nbytes + (self.rows.nbytes if self.rows is not None else 0)
+
+
+class ListingBatch:
+    """Scraped listings (``search_results`` entries) stored column-wise.
+
+    Categorical fields are int32 codes into per-batch vocabularies and the
+    price is a float64 column (NaN where there is none), parsed once per
+    distinct price string. Sorting and filtering work on these arrays. Convert
+    with :meth:`from_dicts` and :meth:`to_dicts` at the edges.
+    """
+
+    __slots__ = ("size", "codes", "vocabularies", "text", "numbers", "number_state", "extras", "price")
+
+    def __init__(self, size: int, codes: Dict[str, np.ndarray], vocabularies: Dict[str, _Vocabulary],
+                 text: Dict[str, _TextColumn], numbers: Dict[str, Optional[np.ndarray]],
+                 number_state: Dict[str, np.ndarray], extras: Dict[int, Dict[str, Any]], price: np.ndarray):
+        self.size = size
+        self.codes = codes
+        self.vocabularies = vocabularies
+        self.text = text
+        # None for a numeric field no listing has a number in
+        self.numbers = numbers
+        self.number_state = number_state
+        self.extras = extras
+        self.price = price
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def from_dicts(cls, results: Iterable[Dict[str, Any]]) -> "ListingBatch":
+        vocabularies = {field: _Vocabulary() for field in CATEGORICAL_FIELDS}
+        codes: Dict[str, List[int]] = {field: [] for field in CATEGORICAL_FIELDS}
+        encoded: Dict[str, List[bytes]] = {field: [] for field in TEXT_FIELDS}
+        text_state: Dict[str, List[int]] = {field: [] for field in TEXT_FIELDS}
+        numbers: Dict[str, List[float]] = {field: [] for field in NUMERIC_FIELDS}
+        number_state: Dict[str, List[int]] = {field: [] for field in NUMERIC_FIELDS}
+        formatted: List[float] = []
+        extras: Dict[int, Dict[str, Any]] = {}
+        size = 0
+        for row, result in enumerate(results):
+            size += 1
+            rest = dict(result)
+            price = _formatted_price(rest.get("price"))
+            value = rest.get("price_value")
+            if price is not None and type(value) in (int, float) and value != price:
+                # The numeric column will hold price_value, so this display string is stored as text
+                price = None
+            formatted.append(price if price is not None else np.nan)
+            for field in CATEGORICAL_FIELDS:
+                value = rest.get(field)
+                if field == "price" and price is not None:
+                    rest.pop(field)
+                    codes[field].append(FORMATTED_PRICE)
+                elif field in rest and _is_scalar(value):
+                    codes[field].append(vocabularies[field].encode(rest.pop(field)))
+                else:
+                    codes[field].append(-1)
+            for field in TEXT_FIELDS:
+                value = rest.get(field)
+                if field in rest and (value is None or isinstance(value, str)):
+                    rest.pop(field)
+                    encoded[field].append(value.encode("utf-8") if value is not None else b"")
+                    text_state[field].append(STRING if value is not None else NONE)
+                else:
+                    encoded[field].append(b"")
+                    text_state[field].append(ABSENT)
+            for field in NUMERIC_FIELDS:
+                value = rest.get(field)
+                kind = NONE if value is None else _NUMERIC_TYPES.get(type(value))
+                if field in rest and kind is not None:
+                    rest.pop(field)
+                    numbers[field].append(float(value) if value is not None else np.nan)
+                    number_state[field].append(kind)
+                else:
+                    numbers[field].append(np.nan)
+                    number_state[field].append(ABSENT)
+            if rest:
+                extras[row] = rest
+
+        code_arrays = {field: np.array(values, dtype=np.int32) for field, values in codes.items()}
+        state_arrays = {field: np.array(values, dtype=np.uint8) for field, values in number_state.items()}
+        number_arrays = {
+            field: np.array(values, dtype=np.float64) if (state_arrays[field] >= FLOAT).any() else None
+            for field, values in numbers.items()
+        }
+        price = np.array(formatted, dtype=np.float64)
+        # Other display prices are parsed once per distinct string
+        price_codes = code_arrays["price"]
+        if vocabularies["price"].values:
+            coded = price_codes >= 0
+            price[coded] = parse_prices(vocabularies["price"].values)[price_codes[coded]]
+        # A price_value (set by market_stats.market_summary) wins over the display string
+        has_value = np.isin(state_arrays["price_value"], (FLOAT, INT))
+        if has_value.any():
+            price[has_value] = number_arrays["price_value"][has_value]
+        return cls(
+            size,
+            code_arrays,
+            vocabularies,
+            {field: _TextColumn.build(encoded[field], text_state[field]) for field in TEXT_FIELDS},
+            number_arrays,
+            state_arrays,
+            extras,
+            price,
+        )
+
+    @classmethod
+    def from_scrapes(cls, payloads: Iterable[Optional[Dict[str, Any]]]) -> "ListingBatch":
+        """Every listing of several ``scrape_effective_sites`` payloads in one batch."""
+        return cls.from_dicts(chain.from_iterable((payload or {}).get("search_results", []) for payload in payloads))
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """Listing ``index`` as the dict it was built from (keys in the scrapers' order)."""
+        result: Dict[str, Any] = {}
+        for field in FIELD_ORDER:
+            if field in self.codes:
+                code = self.codes[field][index]
+                if code >= 0:
+                    result[field] = self.vocabularies[field].values[code]
+                elif code == FORMATTED_PRICE:
+                    result[field] = _format_price(self.price[index])
+            elif field in self.text:
+                state = self.text[field].state[index]
+                if state != ABSENT:
+                    result[field] = self.text[field].get(index) if state == STRING else None
+            else:
+                state = self.number_state[field][index]
+                if state == NONE:
+                    result[field] = None
+                elif state != ABSENT:
+                    value = self.numbers[field][index]
+                    result[field] = bool(value) if state == BOOL else int(value) if state == INT else float(value)
+        result.update(self.extras.get(index, {}))
+        return result
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [self.row(index) for index in range(self.size)]
+
+    def column(self, field: str) -> List[Any]:
+        """Values of one categorical field per row (None where absent)."""
+        if field == "price":
+            return [self.row(index).get("price") for index in range(self.size)]
+        values = self.vocabularies[field].values + [None]
+        return [values[code] for code in self.codes[field].tolist()]
+
+    def text_column(self, field: str) -> List[Optional[str]]:
+        """Values of a text field (web_url, title) per row (None where absent)."""
+        column = self.text[field]
+        return [column.get(row) if state == STRING else None for row, state in enumerate(column.state.tolist())]
+
+    def vendor_labels(self) -> np.ndarray:
+        """Each listing's vendor, else its source, else "unknown" (the grouping ``market_summary`` uses)."""
+        labels = {}
+        for field in ("vendor", "source"):
+            # Falsy values count as absent; the extra last entry is what code -1 picks
+            values = [str(value) if value else None for value in self.vocabularies[field].values] + [None]
+            labels[field] = np.array(values, dtype=object)[self.codes[field]]
+        result = np.where(np.equal(labels["vendor"], None), labels["source"], labels["vendor"])
+        result[np.equal(result, None)] = "unknown"
+        return result
+
+    def is_fallback(self) -> np.ndarray:
+        """Mask of estimated fallback listings (``dedup.FALLBACK_SOURCES``), tested once per distinct label."""
+        names, codes = np.unique(self.vendor_labels(), return_inverse=True)
+        fallback = np.array([str(name).lower() in FALLBACK_SOURCES for name in names], dtype=bool)
+        return fallback[codes.reshape(-1)] if self.size else np.zeros(0, dtype=bool)
+
+    def set_market_prices(self, prices: np.ndarray, outliers: np.ndarray) -> None:
+        """Store ``market_summary``'s price_value (None where NaN) and price_outlier columns."""
+        self.numbers["price_value"] = np.asarray(prices, dtype=np.float64)
+        self.number_state["price_value"] = np.where(np.isnan(prices), NONE, FLOAT).astype(np.uint8)
+        self.numbers["price_outlier"] = np.asarray(outliers, dtype=np.float64)
+        self.number_state["price_outlier"] = np.full(self.size, BOOL, dtype=np.uint8)
+
+    def take(self, indices: Sequence[int]) -> "ListingBatch":
+        """The listings at ``indices``, in that order; vocabularies and text buffers are shared."""
+        indices = np.asarray(indices, dtype=np.int64)
+        extras = {}
+        if self.extras:
+            extras = {new: self.extras[old] for new, old in enumerate(indices.tolist()) if old in self.extras}
+        return ListingBatch(
+            len(indices),
+            {field: codes[indices] for field, codes in self.codes.items()},
+            self.vocabularies,
+            {field: column.take(indices) for field, column in self.text.items()},
+            {field: values[indices] if values is not None else None for field, values in self.numbers.items()},
+            {field: state[indices] for field, state in self.number_state.items()},
+            extras,
+            self.price[indices],
+        )
+
+    def filter(self, mask: np.ndarray) -> "ListingBatch":
+        return self.take(np.flatnonzero(mask))
+
+    def _matching_codes(self, field: str, value: str) -> np.ndarray:
+        """Codes of vocabulary entries equal to ``value`` (brands compared canonically, others ignoring case)."""
+        if field == "brand":
+            wanted = canonical_brand(value)
+            same = [canonical_brand(str(entry or "")) == wanted for entry in self.vocabularies[field].values]
+        else:
+            wanted = value.strip().lower()
+            same = [str(entry or "").strip().lower() == wanted for entry in self.vocabularies[field].values]
+        return np.flatnonzero(same)
+
+    def mask(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        priced: Optional[bool] = None,
+        **equals: str,
+    ) -> np.ndarray:
+        """Boolean row mask; keyword filters name categorical fields, e.g. ``mask(vendor="eBay", min_price=5000)``."""
+        keep = np.ones(self.size, dtype=bool)
+        for field, value in equals.items():
+            keep &= np.isin(self.codes[field], self._matching_codes(field, value))
+        # NaN compares False, so price bounds also drop unpriced listings
+        if min_price is not None:
+            keep &= self.price >= min_price
+        if max_price is not None:
+            keep &= self.price <= max_price
+        if priced is not None:
+            keep &= ~np.isnan(self.price) == priced
+        return keep
+
+    def where(self, **conditions: Any) -> "ListingBatch":
+        """The listings matching :meth:`mask`."""
+        return self.filter(self.mask(**conditions))
+
+    def sort_by_price(self, descending: bool = False) -> "ListingBatch":
+        """Listings by numeric price; unpriced listings last either way."""
+        order = np.argsort(-self.price if descending else self.price, kind="stable")
+        return self.take(order)
+
+    def price_stats(self, by: str = "vendor") -> Dict[str, Dict[str, Any]]:
+        """``market_stats`` price statistics per value of a categorical field ("unknown" where absent)."""
+        names = [str(value) if value is not None else "unknown" for value in self.vocabularies[by].values]
+        codes = self.codes[by].astype(np.int64)
+        codes[codes < 0] = len(names)
+        stats = grouped_price_stats(codes, self.price, len(names) + 1)
+        return {
+            name: group_summary(stats, code)
+            for code, name in enumerate(names + ["unknown"])
+            if stats["count"][code]
+        }
+
+    @classmethod
+    def concat(cls, batches: Sequence["ListingBatch"]) -> "ListingBatch":
+        """One batch holding every listing of ``batches``, with merged vocabularies and compacted text."""
+        if not batches:
+            return cls.from_dicts([])
+        vocabularies = {field: _Vocabulary() for field in CATEGORICAL_FIELDS}
+        codes = {field: [] for field in CATEGORICAL_FIELDS}
+        extras: Dict[int, Dict[str, Any]] = {}
+        offset = 0
+        for batch in batches:
+            for field in CATEGORICAL_FIELDS:
+                # Appended entries send code -2 (formatted price) to -2 and -1 (absent) to -1
+                remap = np.array(
+                    [vocabularies[field].encode(value) for value in batch.vocabularies[field].values] + [FORMATTED_PRICE, -1],
+                    dtype=np.int32,
+                )
+                codes[field].append(remap[batch.codes[field]])
+            extras.update({offset + row: values for row, values in batch.extras.items()})
+            offset += batch.size
+        numbers = {}
+        for field in NUMERIC_FIELDS:
+            parts = [batch.numbers[field] for batch in batches]
+            numbers[field] = None if all(part is None for part in parts) else np.concatenate([
+                part if part is not None else np.full(batch.size, np.nan) for part, batch in zip(parts, batches)
+            ])
+        return cls(
+            offset,
+            {field: np.concatenate(values) for field, values in codes.items()},
+            vocabularies,
+            {field: _TextColumn.concat([batch.text[field] for batch in batches]) for field in TEXT_FIELDS},
+            numbers,
+            {field: np.concatenate([batch.number_state[field] for batch in batches]) for field in NUMERIC_FIELDS},
+            extras,
+            np.concatenate([batch.price for batch in batches]),
+        )
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the batch, vocabularies, shared text buffers and extras included."""
+        total = self.price.nbytes + sum(codes.nbytes for codes in self.codes.values())
+        total += sum(vocabulary.nbytes() for vocabulary in self.vocabularies.values())
+        total += sum(column.nbytes() for column in self.text.values())
+        total += sum(values.nbytes for values in self.numbers.values() if values is not None)
+        total += sum(state.nbytes for state in self.number_state.values())
+        total += sum(sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values.values())
+                     for values in self.extras.values())
+        return total
+
+
+def _synthetic_results(rows: int, seed: int = 11) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    vendors = [("eBay", "ebay"), ("Valuetronics", "valuetronics"), ("TestEquipment.center", "testequipment.center"),
+               ("TestWorld", "search_engine"), ("Keysight", "search_engine")]
+    models = [f"N{i:04d}A" for i in range(2000)]
+    results = []
+    for model, vendor, price in zip(rng.integers(0, len(models), rows).tolist(),
+                                    rng.integers(0, len(vendors), rows).tolist(),
+                                    rng.lognormal(8.5, 0.8, rows).tolist()):
+        name, source = vendors[vendor]
+        results.append({
+            "brand": "Keysight",
+            "model": models[model],
+            "price": f"${price:.2f}" if price > 1500 else "Contact vendor",
+            "vendor": name,
+            "web_url": f"https://www.{source}.com/item/{models[model].lower()}-{len(results)}",
+            "qty_available": "1 available" if source == "ebay" else "Check listing",
+            "source": source,
+            "title": f"Keysight {models[model]} Signal Generator, calibrated, listing {len(results)}",
+        })
+    # Round-trip through JSON like job results and price-history snapshots, so no string is shared between dicts
+    return json.loads(json.dumps(results))
+
+
+def _measure(build):
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def main(argv=None) -> int:
+    from dedup import parse_display_price
+
+    parser = argparse.ArgumentParser(description="Compact listing batches")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="memory, sort and filter timings of dict results vs. a ListingBatch")
+    bench.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    encoded = json.dumps(_synthetic_results(args.rows))
+    # Imports pandas (for parse_prices) outside the measured allocations
+    ListingBatch.from_dicts(json.loads(encoded)[:100])
+    results, dict_bytes = _measure(lambda: json.loads(encoded))
+    batch, batch_bytes = _measure(lambda: ListingBatch.from_dicts(results))
+    started = time.perf_counter()
+    ListingBatch.from_dicts(results)
+    built = time.perf_counter() - started
+    started = time.perf_counter()
+    batch.to_dicts()
+    rebuilt = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sorted(results, key=lambda result: parse_display_price(result.get("price")) or 0.0)
+    [result for result in results if result.get("vendor") == "eBay" and (parse_display_price(result.get("price")) or 0) >= 5000]
+    dict_ops = time.perf_counter() - started
+    started = time.perf_counter()
+    batch.sort_by_price()
+    batch.where(vendor="eBay", min_price=5000)
+    batch_ops = time.perf_counter() - started
+
+    print(f"{args.rows} listings: dicts {dict_bytes / args.rows:.0f} B/listing, "
+          f"batch {batch_bytes / args.rows:.0f} B/listing ({dict_bytes / batch_bytes:.1f}x smaller)")
+    print(f"from_dicts {built:.2f}s, to_dicts {rebuilt:.2f}s")
+    print(f"sort + filter: dicts {dict_ops * 1000:.0f}ms, batch {batch_ops * 1000:.0f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import argparse
+import gzip
+import hashlib
+import html
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay_fixtures")
+SITES = ("duckduckgo", "ebay", "valuetronics", "testequipment_center")
+# Query parameters whose value is substituted for {{q}} in fixture templates.
+QUERY_PARAMS = ("q", "_nkw", "search_query")
+
+
+def _encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    """Content codings the server can produce, most preferred first."""
+    encoders: Dict[str, Callable[[bytes], bytes]] = {}
+    if zstandard is not None:
+        encoders["zstd"] = lambda body: zstandard.ZstdCompressor().compress(body)
+    if brotli is not None:
+        encoders["br"] = brotli.compress
+    encoders["gzip"] = gzip.compress
+    return encoders
+
+
+def _recording_name(path_and_query: str) -> str:
+    return hashlib.sha1(path_and_query.encode("utf-8")).hexdigest()[:16] + ".html"
+
+
+def _load_index(site_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(site_dir, "index.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record(site: str, url: str, root: str = DEFAULT_ROOT) -> str:
+    """Fetch ``url`` live and store it as the replay of that path/query on ``site``."""
+    import requests
+
+    parts = urlsplit(url)
+    key = parts.path + (f"?{parts.query}" if parts.query else "")
+    response = requests.get(url, timeout=15, headers={
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    })
+    site_dir = os.path.join(root, site)
+    os.makedirs(site_dir, exist_ok=True)
+    name = _recording_name(key)
+    with open(os.path.join(site_dir, name), "wb") as f:
+        f.write(response.content)
+    index = _load_index(site_dir)
+    index[key] = name
+    with open(os.path.join(site_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    return os.path.join(site_dir, name)
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Serves ``/<site>/<path>?<query>`` from recordings, falling back to the site's default.html."""
+
+    protocol_version = "HTTP/1.1"
+    root = DEFAULT_ROOT
+    latency = 0.0
+    jitter = 0.0
+    # Callable returning seconds to wait per request; replaces latency/jitter when set
+    delay: Optional[Callable[[], float]] = None
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def handle(self) -> None:
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            # Streaming clients hang up once they have the part of the page they need
+            pass
+
+    def _resolve(self) -> Tuple[Optional[str], str]:
+        parts = urlsplit(self.path)
+        segments = parts.path.lstrip("/").split("/", 1)
+        site = segments[0]
+        rest = "/" + (segments[1] if len(segments) > 1 else "")
+        site_dir = os.path.join(self.root, site)
+        key = rest + (f"?{parts.query}" if parts.query else "")
+        name = _load_index(site_dir).get(key)
+        if name is None:
+            # Detail pages: /<site>/product/... falls back to product.html, everything else to default.html
+            name = "product.html" if rest.startswith("/product") and os.path.exists(os.path.join(site_dir, "product.html")) else "default.html"
+        path = os.path.join(site_dir, name)
+        return (path if os.path.isfile(path) else None), parts.query
+
+    def do_GET(self) -> None:
+        if self.delay is not None:
+            time.sleep(max(0.0, self.delay()))
+        elif self.latency or self.jitter:
+            time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        path, query = self._resolve()
+        if path is None:
+            self._send(404, b"not found", "text/plain")
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        params = parse_qs(query)
+        term = next((params[name][0] for name in QUERY_PARAMS if name in params), "")
+        body = body.replace(b"{{q}}", html.escape(term).encode("utf-8"))
+        self._send(200, body, "text/html; charset=utf-8")
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        accepted = {token.split(";")[0].strip() for token in self.headers.get("Accept-Encoding", "").split(",")}
+        encoders = _encoders()
+        encoding = next((name for name in encoders if name in accepted), None)
+        if encoding:
+            body = encoders[encoding](body)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_replay_server(
+    root: str = DEFAULT_ROOT,
+    port: int = 0,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    delay: Optional[Callable[[], float]] = None,
+) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the replay server on a daemon thread; returns the server and its base URL.
+
+    ``delay``, when given, is called per request for the seconds to wait (any
+    distribution); otherwise requests wait gauss(latency, jitter).
+    """
+    handler = type("BoundReplayHandler", (ReplayHandler,), {
+        "root": root, "latency": latency, "jitter": jitter,
+        "delay": staticmethod(delay) if delay is not None else None,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="replay-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def site_overrides(base_url: str) -> str:
+    """ATE_SITE_BASE_URLS value that points every scraper at the replay server."""
+    return ",".join(f"{site}={base_url}/{site}" for site in SITES)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Local replay server for vendor pages")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="serve recorded pages")
+    serve.add_argument("--root", default=DEFAULT_ROOT)
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--latency", type=float, default=0.0, help="mean added latency in seconds")
+    serve.add_argument("--jitter", type=float, default=0.0, help="latency standard deviation in seconds")
+    rec = sub.add_parser("record", help="record a live page for a site")
+    rec.add_argument("site", choices=SITES)
+    rec.add_argument("url")
+    rec.add_argument("--root", default=DEFAULT_ROOT)
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        print(record(args.site, args.url, args.root))
+        return 0
+
+    server, base_url = start_replay_server(args.root, args.port, args.latency, args.jitter)
+    print(f"Replay server on {base_url}")
+    print(f"export ATE_SITE_BASE_URLS='{site_overrides(base_url)}'")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
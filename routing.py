@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+
+class ModelRoute(NamedTuple):
+    task: str
+    model: str
+    max_tokens: int
+    temperature: float
+
+
+# Default route per LLM task type. One-word categorization and short option
+# explanations go to a small fast model; only the open-ended marketplace search
+# keeps a larger one.
+DEFAULT_ROUTES: Dict[str, Dict[str, Any]] = {
+    "normalize": {"model": "gpt-4o-mini", "max_tokens": 300, "temperature": 0.0},
+    "explain": {"model": "gpt-4o-mini", "max_tokens": 250, "temperature": 0.0},
+    "categorize": {"model": "gpt-4o-mini", "max_tokens": 5, "temperature": 0.1},
+    "marketplace_search": {"model": "gpt-4o", "max_tokens": 2000, "temperature": 0.0},
+}
+
+# USD per 1M tokens: (input, cached input, output).
+MODEL_PRICING: Dict[str, tuple] = {
+    "gpt-4": (30.0, 30.0, 60.0),
+    "gpt-4-turbo": (10.0, 10.0, 30.0),
+    "gpt-4o": (2.5, 1.25, 10.0),
+    "gpt-4o-mini": (0.15, 0.075, 0.6),
+    "gpt-4.1": (2.0, 0.5, 8.0),
+    "gpt-4.1-mini": (0.4, 0.1, 1.6),
+    "gpt-4.1-nano": (0.1, 0.025, 0.4),
+    "gpt-3.5-turbo": (0.5, 0.5, 1.5),
+}
+
+_LATENCY_WINDOW = 200
+
+
+def _load_routes() -> Dict[str, ModelRoute]:
+    """Build the route table from defaults, ATE_MODEL_ROUTES (JSON) and per-task env overrides.
+
+    Per-task overrides use ATE_MODEL_<TASK> and ATE_MAX_TOKENS_<TASK>, e.g.
+    ATE_MODEL_EXPLAIN=gpt-4.1-nano. ATE_DEFAULT_MODEL replaces every default model.
+    """
+    config = {task: dict(values) for task, values in DEFAULT_ROUTES.items()}
+    default_model = os.getenv("ATE_DEFAULT_MODEL")
+    if default_model:
+        for values in config.values():
+            values["model"] = default_model
+
+    raw = os.getenv("ATE_MODEL_ROUTES")
+    if raw:
+        try:
+            for task, values in json.loads(raw).items():
+                if not isinstance(values, dict):
+                    print(f"DEBUG: Ignoring ATE_MODEL_ROUTES entry for {task}: expected an object, got {values!r}")
+                    continue
+                config.setdefault(task, dict(DEFAULT_ROUTES["normalize"])).update(values)
+        except (ValueError, AttributeError) as e:
+            print(f"DEBUG: Ignoring invalid ATE_MODEL_ROUTES: {e}")
+
+    routes = {}
+    for task, values in config.items():
+        env_task = task.upper()
+        model = os.getenv(f"ATE_MODEL_{env_task}", values["model"])
+        try:
+            max_tokens = int(os.getenv(f"ATE_MAX_TOKENS_{env_task}", values["max_tokens"]))
+        except ValueError:
+            max_tokens = int(values["max_tokens"])
+        routes[task] = ModelRoute(task, model, max_tokens, float(values.get("temperature", 0.0)))
+    return routes
+
+
+ROUTES: Dict[str, ModelRoute] = _load_routes()
+
+
+def get_route(task: str) -> ModelRoute:
+    """Return the configured route for a task type; unknown tasks use the normalize route's model."""
+    route = ROUTES.get(task)
+    if route is None:
+        fallback = ROUTES["normalize"]
+        route = ModelRoute(task, fallback.model, fallback.max_tokens, fallback.temperature)
+    return route
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Estimated USD cost of one call; unknown models are priced by their longest known prefix."""
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None:
+        matches = [name for name in MODEL_PRICING if model.startswith(name)]
+        if not matches:
+            return 0.0
+        pricing = MODEL_PRICING[max(matches, key=len)]
+    input_price, cached_price, output_price = pricing
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+
+ROUTE_STATS: Dict[str, Dict[str, Any]] = {}
+_LATENCIES: Dict[str, Deque[float]] = {}
+_STATS_LOCK = threading.Lock()
+
+
+def _record_call(route: ModelRoute, model: str, elapsed: float, completion: Any, error: bool) -> None:
+    usage = getattr(completion, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    cost = estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+    with _STATS_LOCK:
+        stats = ROUTE_STATS.setdefault(route.task, {
+            "calls": 0, "errors": 0, "total_latency": 0.0, "max_latency": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "models": {},
+        })
+        stats["calls"] += 1
+        stats["errors"] += int(error)
+        stats["total_latency"] += elapsed
+        stats["max_latency"] = max(stats["max_latency"], elapsed)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["cost_usd"] += cost
+        stats["models"][model] = stats["models"].get(model, 0) + 1
+        _LATENCIES.setdefault(route.task, deque(maxlen=_LATENCY_WINDOW)).append(elapsed)
+
+
+def routed_completion(
+    client: Any,
+    task: str,
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    **kwargs: Any,
+) -> Any:
+    """Create a chat completion on the route configured for ``task`` and record its latency and cost."""
+    route = get_route(task)
+    model = model or route.model
+    kwargs.setdefault("max_tokens", route.max_tokens)
+    start = time.perf_counter()
+    completion = None
+    try:
+        completion = client.chat.completions.create(
+            model=model,
+            temperature=route.temperature if temperature is None else temperature,
+            messages=messages,
+            **kwargs,
+        )
+        return completion
+    finally:
+        elapsed = time.perf_counter() - start
+        _record_call(route, model, elapsed, completion, error=completion is None)
+        print(f"DEBUG: LLM route {task} ({model}) took {elapsed:.2f}s")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def get_route_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-route call counts, latency (mean/p50/p95/max over recent calls), tokens and estimated cost."""
+    with _STATS_LOCK:
+        snapshot = {task: dict(stats, models=dict(stats["models"])) for task, stats in ROUTE_STATS.items()}
+        latencies = {task: list(values) for task, values in _LATENCIES.items()}
+    for task, stats in snapshot.items():
+        recent = latencies.get(task, [])
+        stats["model"] = get_route(task).model
+        stats["mean_latency"] = stats["total_latency"] / stats["calls"] if stats["calls"] else 0.0
+        stats["p50_latency"] = _percentile(recent, 50)
+        stats["p95_latency"] = _percentile(recent, 95)
+        stats["cost_usd"] = round(stats["cost_usd"], 6)
+    return snapshot
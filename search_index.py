@@ -0,0 +1,439 @@
+import argparse
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Single-valued columns and the multi-valued option list, with how much a match in each counts.
+FIELDS = ("eqBrand", "eqModel", "contactname")
+OPTIONS_FIELD = "option_list"
+FIELD_WEIGHTS = {"eqModel": 1.0, "eqBrand": 0.9, "contactname": 0.8, OPTIONS_FIELD: 0.6}
+
+EXACT_SCORE = 1.0
+# Prefix matches score between PREFIX_SCORE and PREFIX_SCORE + PREFIX_BONUS, closer to exact the more of the term is typed
+PREFIX_SCORE = 0.5
+PREFIX_BONUS = 0.4
+FUZZY_WEIGHT = 0.4
+FUZZY_MIN_SIMILARITY = float(os.getenv("ATE_SEARCH_FUZZY_MIN", "0.3"))
+MAX_PREFIX_TERMS = int(os.getenv("ATE_SEARCH_MAX_PREFIX_TERMS", "256"))
+MAX_FUZZY_TERMS = 64
+# Rows per segment when indexing a large table; segments are merged once there are more than MAX_SEGMENTS.
+SEGMENT_ROWS = 1 << 18
+MAX_SEGMENTS = 8
+# Row sets larger than 1/DENSE_RATIO of a segment are combined in a dense per-row buffer rather than by sorting.
+DENSE_RATIO = 16
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+class SearchHit(NamedTuple):
+    index: int
+    score: float
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in _NON_WORD.split(text.lower()) if word]
+
+
+def _value_terms(field: str, value: str) -> List[str]:
+    """Terms a field value is found by: its words, the words run together ("rohdeschwarz",
+    "n5172b") and, for brands, their initials ("rs" for Rohde & Schwarz, typed as "R&S")."""
+    words = _words(value)
+    terms = set(words)
+    if len(words) > 1:
+        terms.add("".join(words))
+        if field == "eqBrand":
+            terms.add("".join(word[0] for word in words))
+    return list(terms)
+
+
+def _trigrams(term: str) -> List[str]:
+    padded = f"^{term}$"
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def _ranges(starts: np.ndarray, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of the postings of ``ids`` (rows order[starts[id]:starts[id + 1]]) and each id's count.
+
+    Ids added to the vocabulary after the segment was built have no postings in it.
+    """
+    ids = ids[ids < len(starts) - 1]
+    begins = starts[ids]
+    lengths = starts[ids + 1] - begins
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64), lengths
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(begins - offsets, lengths) + np.arange(total), lengths
+
+
+def _postings(codes: np.ndarray, value_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(codes, kind="stable").astype(np.int32)
+    starts = np.zeros(value_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=value_count), out=starts[1:])
+    return order, starts
+
+
+class _Segment:
+    """Immutable postings for a contiguous block of rows starting at ``base``."""
+
+    def __init__(self, base: int, size: int, codes: Dict[str, np.ndarray],
+                 option_rows: np.ndarray, option_ids: np.ndarray, value_counts: Dict[str, int]):
+        self.base = base
+        self.size = size
+        self.codes = codes
+        self.postings = {field: _postings(codes[field], value_counts[field]) for field in FIELDS}
+        order, self.option_starts = _postings(option_ids, value_counts[OPTIONS_FIELD])
+        self.option_rows = option_rows[order]
+        self.option_ids = option_ids[order]
+
+    def driver_scores(self, tables: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows matching one token, found through the postings of its matched values, with their scores."""
+        found_rows, found_scores = [], []
+        for field in FIELDS:
+            table, ids = tables[field]
+            if len(ids):
+                order, starts = self.postings[field]
+                positions, lengths = _ranges(starts, ids)
+                found_rows.append(order[positions])
+                found_scores.append(np.repeat(table[ids[:len(lengths)]], lengths))
+        single_valued = len(found_rows)
+        table, ids = tables[OPTIONS_FIELD]
+        if len(ids):
+            positions, lengths = _ranges(self.option_starts, ids)
+            found_rows.append(self.option_rows[positions])
+            found_scores.append(np.repeat(table[ids[:len(lengths)]], lengths))
+        if not found_rows:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        rows, scores = np.concatenate(found_rows), np.concatenate(found_scores)
+        if len(rows) * DENSE_RATIO >= self.size:
+            dense = np.zeros(self.size, dtype=np.float32)
+            for field_rows, field_scores in zip(found_rows[:single_valued], found_scores[:single_valued]):
+                # A row has one value per field, so rows are distinct within a field
+                dense[field_rows] = np.maximum(dense[field_rows], field_scores)
+            for field_rows, field_scores in zip(found_rows[single_valued:], found_scores[single_valued:]):
+                np.maximum.at(dense, field_rows, field_scores)
+            rows = np.flatnonzero(dense > 0)  # much faster than nonzero on the float buffer itself
+            return rows, dense[rows]
+        # Few matches: sort them instead of scanning a buffer the size of the segment
+        order = np.argsort(rows, kind="stable")
+        rows, scores = rows[order], scores[order]
+        firsts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        return rows[firsts], np.maximum.reduceat(scores, firsts)
+
+    def driver_cost(self, tables: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> int:
+        cost = 0
+        for field in FIELDS:
+            ids = tables[field][1]
+            starts = self.postings[field][1]
+            ids = ids[ids < len(starts) - 1]
+            cost += int((starts[ids + 1] - starts[ids]).sum())
+        ids = tables[OPTIONS_FIELD][1]
+        ids = ids[ids < len(self.option_starts) - 1]
+        return cost + int((self.option_starts[ids + 1] - self.option_starts[ids]).sum())
+
+    def filter_scores(self, rows: np.ndarray, tables: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+        """Score of one more token for candidate ``rows`` (0 where it does not match)."""
+        scores = np.zeros(len(rows), dtype=np.float32)
+        for field in FIELDS:
+            table, ids = tables[field]
+            if len(ids):
+                scores = np.maximum(scores, table[self.codes[field][rows]])
+        table, ids = tables[OPTIONS_FIELD]
+        if len(ids):
+            positions, lengths = _ranges(self.option_starts, ids)
+            if len(positions):
+                option_rows = self.option_rows[positions]
+                option_scores = np.repeat(table[ids[:len(lengths)]], lengths)
+                if len(option_rows) * DENSE_RATIO >= self.size:
+                    matched = np.zeros(self.size, dtype=np.float32)
+                    np.maximum.at(matched, option_rows, option_scores)
+                    scores = np.maximum(scores, matched[rows])
+                else:
+                    # rows is ascending: find each option match's candidate row, if any
+                    slots = np.minimum(np.searchsorted(rows, option_rows), len(rows) - 1)
+                    hit = rows[slots] == option_rows
+                    np.maximum.at(scores, slots[hit], option_scores[hit])
+        return scores
+
+
+class SearchIndex:
+    """Type-ahead search over quote brand, model, contact and options.
+
+    Every distinct field value is broken into terms (see ``_value_terms``); a
+    query token matches terms exactly, by prefix ("n5172" -> n5172b) or by
+    trigram similarity (typos). Work per query scales with the number of
+    matching values and rows, not with the size of the table. Rows are added
+    in segments, so appending quotes does not rebuild what is indexed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._segments: List[_Segment] = []
+        self._size = 0
+        # Per field: value -> id and the values themselves
+        self._value_ids: Dict[str, Dict[str, int]] = {field: {} for field in FIELDS + (OPTIONS_FIELD,)}
+        # term -> id; per term the (field -> value ids) it was derived from
+        self._term_ids: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._term_values: List[Dict[str, List[int]]] = []
+        self._trigram_terms: Dict[str, List[int]] = {}
+        self._trigram_counts: List[int] = []
+        # Rebuilt after each add
+        self._sorted_terms: List[str] = []
+        self._trigram_count_array = np.zeros(0, dtype=np.float32)
+        # Filled lazily, per term / trigram
+        self._term_value_arrays: Dict[int, Dict[str, np.ndarray]] = {}
+        self._trigram_arrays: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _value_id(self, field: str, value: str) -> int:
+        ids = self._value_ids[field]
+        value_id = ids.get(value)
+        if value_id is None:
+            value_id = ids[value] = len(ids)
+            for term in _value_terms(field, value):
+                self._term_values[self._term_id(term)].setdefault(field, []).append(value_id)
+        return value_id
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = self._term_ids[term] = len(self._terms)
+            self._terms.append(term)
+            self._term_values.append({})
+            grams = _trigrams(term)
+            for gram in grams:
+                self._trigram_terms.setdefault(gram, []).append(term_id)
+            self._trigram_counts.append(len(grams))
+        # Its value lists may grow; drop the cached arrays
+        self._term_value_arrays.pop(term_id, None)
+        return term_id
+
+    def _encode(self, field: str, column: pa.Array) -> np.ndarray:
+        """Global value ids for a string column; the Python work is per distinct value, not per row."""
+        encoded = pc.dictionary_encode(column, null_encoding="encode")
+        mapping = np.array(
+            [self._value_id(field, (value or "").strip()) for value in encoded.dictionary.to_pylist()],
+            dtype=np.int32,
+        )
+        return mapping[encoded.indices.to_numpy(zero_copy_only=False)] if len(mapping) else np.zeros(len(column), dtype=np.int32)
+
+    def add(self, table: pa.Table) -> None:
+        """Index ``table``'s rows as the next rows of the index (row numbers continue from ``len(self)``)."""
+        with self._lock:
+            for start in range(0, table.num_rows, SEGMENT_ROWS):
+                block = table.slice(start, SEGMENT_ROWS)
+                codes = {field: self._encode(field, block.column(field).combine_chunks()) for field in FIELDS}
+                options = block.column(OPTIONS_FIELD).combine_chunks()
+                option_rows = pc.list_parent_indices(options).to_numpy(zero_copy_only=False).astype(np.int32)
+                option_ids = self._encode(OPTIONS_FIELD, pc.list_flatten(options))
+                self._segments.append(_Segment(self._size, block.num_rows, codes, option_rows, option_ids, self._value_counts()))
+                self._size += block.num_rows
+            if len(self._segments) > MAX_SEGMENTS:
+                self._segments = [self._merge(self._segments)]
+            self._sorted_terms = sorted(self._terms)
+            self._trigram_count_array = np.array(self._trigram_counts, dtype=np.float32)
+            self._trigram_arrays = {}
+
+    def _value_counts(self) -> Dict[str, int]:
+        return {field: len(ids) for field, ids in self._value_ids.items()}
+
+    def _merge(self, segments: List[_Segment]) -> _Segment:
+        codes = {field: np.concatenate([segment.codes[field] for segment in segments]) for field in FIELDS}
+        base = segments[0].base
+        option_rows = np.concatenate([segment.option_rows + (segment.base - base) for segment in segments])
+        option_ids = np.concatenate([segment.option_ids for segment in segments])
+        return _Segment(base, sum(segment.size for segment in segments), codes, option_rows, option_ids, self._value_counts())
+
+    def _match_terms(self, token: str) -> Dict[int, float]:
+        """Term id -> match score for one normalized query token."""
+        matches: Dict[int, float] = {}
+        exact = self._term_ids.get(token)
+        if exact is not None:
+            matches[exact] = EXACT_SCORE
+        terms = self._sorted_terms
+        position = bisect_left(terms, token)
+        for term in terms[position:position + MAX_PREFIX_TERMS]:
+            if not term.startswith(token):
+                break
+            matches.setdefault(self._term_ids[term], PREFIX_SCORE + PREFIX_BONUS * len(token) / len(term))
+        if len(token) >= 3:
+            grams = _trigrams(token)
+            postings = []
+            for gram in grams:
+                if gram in self._trigram_terms:
+                    array = self._trigram_arrays.get(gram)
+                    if array is None:
+                        array = self._trigram_arrays[gram] = np.array(self._trigram_terms[gram], dtype=np.int32)
+                    postings.append(array)
+            if postings:
+                candidates, overlap = np.unique(np.concatenate(postings), return_counts=True)
+                similarity = overlap / (len(grams) + self._trigram_count_array[candidates] - overlap)
+                keep = similarity >= FUZZY_MIN_SIMILARITY
+                candidates, similarity = candidates[keep], similarity[keep]
+                if len(candidates) > MAX_FUZZY_TERMS:
+                    best = np.argpartition(-similarity, MAX_FUZZY_TERMS - 1)[:MAX_FUZZY_TERMS]
+                    candidates, similarity = candidates[best], similarity[best]
+                for term_id, score in zip(candidates.tolist(), similarity.tolist()):
+                    matches.setdefault(term_id, FUZZY_WEIGHT * score)
+        return matches
+
+    def _token_tables(self, token: str) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Per field: a dense value-id -> score table and the matched value ids."""
+        collected: Dict[str, Tuple[List[np.ndarray], List[float], List[int]]] = {
+            field: ([], [], []) for field in self._value_ids
+        }
+        for term_id, score in self._match_terms(token).items():
+            arrays = self._term_value_arrays.get(term_id)
+            if arrays is None:
+                arrays = self._term_value_arrays[term_id] = {
+                    field: np.array(ids, dtype=np.int32) for field, ids in self._term_values[term_id].items()
+                }
+            for field, ids in arrays.items():
+                field_ids, field_scores, field_counts = collected[field]
+                field_ids.append(ids)
+                field_scores.append(score * FIELD_WEIGHTS[field])
+                field_counts.append(len(ids))
+        tables = {}
+        for field, (ids, scores, counts) in collected.items():
+            table = np.zeros(len(self._value_ids[field]), dtype=np.float32)
+            if ids:
+                ids = np.concatenate(ids)
+                np.maximum.at(table, ids, np.repeat(np.array(scores, dtype=np.float32), counts))
+                tables[field] = (table, np.unique(ids))
+            else:
+                tables[field] = (table, np.empty(0, dtype=np.int32))
+        return tables
+
+    def search(self, query: str, limit: int = 50) -> Tuple[List[SearchHit], int]:
+        """Best-ranked rows matching every token of ``query``, and how many rows matched."""
+        tokens = list(dict.fromkeys(word for word in (_NON_WORD.sub("", part) for part in query.lower().split()) if word))
+        if not tokens or limit <= 0:
+            return [], 0
+        with self._lock:
+            token_tables = [self._token_tables(token) for token in tokens]
+            total = 0
+            best_rows, best_scores = [], []
+            for segment in self._segments:
+                # Drive from the token with the fewest matching rows, then check the others on those rows only
+                costs = [segment.driver_cost(tables) for tables in token_tables]
+                driver = int(np.argmin(costs))
+                if costs[driver] == 0:
+                    continue
+                rows, scores = segment.driver_scores(token_tables[driver])
+                for position, tables in enumerate(token_tables):
+                    if position == driver or not len(rows):
+                        continue
+                    extra = segment.filter_scores(rows, tables)
+                    keep = extra > 0
+                    rows, scores = rows[keep], scores[keep] + extra[keep]
+                total += len(rows)
+                rows, scores = _top(rows, scores, limit)
+                best_rows.append(rows + segment.base)
+                best_scores.append(scores)
+        if not best_rows:
+            return [], total
+        rows, scores = _top(np.concatenate(best_rows), np.concatenate(best_scores), limit)
+        return [SearchHit(int(row), round(float(score), 4)) for row, score in zip(rows, scores)], total
+
+
+def _top(rows: np.ndarray, scores: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The ``limit`` highest scores, ties going to the lower row (more recent quote); ``rows`` ascending on input."""
+    if len(rows) > limit:
+        cutoff = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+        above = np.flatnonzero(scores > cutoff)
+        tied = np.flatnonzero(scores == cutoff)[:limit - len(above)]
+        keep = np.sort(np.concatenate([above, tied]))
+        rows, scores = rows[keep], scores[keep]
+    order = np.lexsort((rows, -scores))
+    return rows[order], scores[order]
+
+
+def build_search_index(table: pa.Table) -> SearchIndex:
+    index = SearchIndex()
+    index.add(table)
+    return index
+
+
+def _synthetic_table(rows: int, seed: int = 11) -> pa.Table:
+    rng = np.random.default_rng(seed)
+    brands = np.array(["Agilent HP Keysight", "Agilent / HP", "Agilent", "Rohde & Schwarz", "Tektronix",
+                       "Anritsu", "BOONTON", "Keysight", "Fluke", "Yokogawa"])
+    models = np.array(["N5172B", "N5182A", "CMU300", "SMA100B"] + [f"{prefix}{number}{suffix}" for prefix in ("N", "E", "MS", "SMA", "TDS", "CMU")
+                       for number in range(1000, 9000, 3) for suffix in ("A", "B")])
+    first = np.array(["David", "Christopher", "Sandra", "Larry", "Mustafa", "Guillermo", "Lynn", "Jeron", "Dan", "Alexander"]
+                     + [f"First{i}" for i in range(400)])
+    last = np.array(["Bither", "Reinhard", "Fletcher", "Meiners", "Hosking", "Leon", "Hoover", "Powell", "Pollak"]
+                    + [f"Last{i}" for i in range(2000)])
+    codes = np.array([f"{prefix}{i:02d}" for prefix in ("B", "K", "P", "0") for i in range(60)])
+    option_counts = rng.integers(0, 10, rows)
+    flat = rng.choice(codes, int(option_counts.sum()))
+    offsets = np.concatenate([[0], np.cumsum(option_counts)]).astype(np.int32)
+    contacts = np.char.add(np.char.add(rng.choice(first, rows), " "), rng.choice(last, rows))
+    return pa.table({
+        "eqBrand": pa.array(rng.choice(brands, rows).tolist()),
+        "eqModel": pa.array(rng.choice(models, rows).tolist()),
+        "contactname": pa.array(contacts.tolist()),
+        OPTIONS_FIELD: pa.ListArray.from_arrays(pa.array(offsets), pa.array(flat.tolist())),
+    })
+
+
+BENCH_QUERIES = ("n5172", "N5172B", "R&S", "rohde cmu", "agilent n51", "david bither", "k12", "schwartz", "tds7", "a")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fuzzy type-ahead search over quote history")
+    sub = parser.add_subparsers(dest="command", required=True)
+    query = sub.add_parser("query", help="search the quote export (ATE_QUOTES_PATH by default)")
+    query.add_argument("text")
+    query.add_argument("--path")
+    query.add_argument("--limit", type=int, default=10)
+    bench = sub.add_parser("bench", help="index synthetic quotes and time type-ahead queries")
+    bench.add_argument("--rows", type=int, default=1_000_000)
+    bench.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "query":
+        from dataset import get_dataset
+
+        dataset = get_dataset(args.path)
+        started = time.perf_counter()
+        hits, total = dataset.search_index().search(args.text, args.limit)
+        elapsed = time.perf_counter() - started
+        for hit in hits:
+            row = dataset.row(hit.index)
+            print(f"{hit.score:6.3f}  {row.label}  [{row.options}]")
+        print(f"{total} matches in {elapsed * 1000:.1f} ms")
+        return 0
+
+    table = _synthetic_table(args.rows)
+    started = time.perf_counter()
+    index = build_search_index(table)
+    print(f"indexed {len(index)} rows in {time.perf_counter() - started:.2f}s")
+    print(f"{'query':<16}{'matches':>9}{'p50 ms':>9}{'max ms':>9}  top hit")
+    for text in BENCH_QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            hits, total = index.search(text, 25)
+            timings.append(time.perf_counter() - started)
+        top = table.slice(hits[0].index, 1).to_pylist()[0] if hits else None
+        label = f"{top['eqBrand']} {top['eqModel']} - {top['contactname']}" if top else "-"
+        print(f"{text:<16}{total:>9}{statistics.median(timings) * 1000:>9.2f}{max(timings) * 1000:>9.2f}  {label}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+import copy
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Model name prefixes that accept response_format={"type": "json_schema"}.
+JSON_SCHEMA_MODEL_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+# Older models that only accept JSON mode ({"type": "json_object"}).
+JSON_OBJECT_MODEL_PREFIXES = ("gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-3.5-turbo")
+
+# Models the API rejected a response_format for; they are sent plain requests afterwards.
+_UNSUPPORTED_MODELS = set()
+
+_TYPE_DEFAULTS = {
+    "string": "",
+    "integer": 0,
+    "number": 0,
+    "boolean": False,
+    "array": [],
+    "object": {},
+}
+
+
+def response_format_for(model: str, schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Strongest structured-output mode the model supports for ``schema``, or None for plain text."""
+    if model in _UNSUPPORTED_MODELS:
+        return None
+    if model.startswith(JSON_SCHEMA_MODEL_PREFIXES):
+        return {"type": "json_schema", "json_schema": schema}
+    if model.startswith(JSON_OBJECT_MODEL_PREFIXES):
+        return {"type": "json_object"}
+    return None
+
+
+def mark_response_format_unsupported(model: str) -> None:
+    _UNSUPPORTED_MODELS.add(model)
+
+
+# ---------------------------------------------------------------------------
+# Repair
+# ---------------------------------------------------------------------------
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_PY_LITERALS = ((re.compile(r"\bTrue\b"), "true"), (re.compile(r"\bFalse\b"), "false"), (re.compile(r"\bNone\b"), "null"))
+
+
+def _close_unbalanced(text: str) -> str:
+    """Close a truncated string and any open brackets, in nesting order."""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = re.sub(r"[,:]\s*$", "", text.rstrip())
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """Cheap targeted fixes for almost-JSON model output; returns the parsed value or None.
+
+    Handles code fences, prose around the object, smart quotes, trailing commas,
+    Python literals and output truncated mid-object.
+    """
+    if not text:
+        return None
+    candidate = _FENCE_RE.sub("", text.strip())
+    start = candidate.find("{")
+    if start == -1:
+        return None
+    end = candidate.rfind("}")
+    candidate = candidate[start:end + 1] if end > start else candidate[start:]
+
+    attempts = []
+    fixed = _TRAILING_COMMA_RE.sub(r"\1", candidate.translate(_SMART_QUOTES))
+    attempts.append(fixed)
+    for pattern, replacement in _PY_LITERALS:
+        fixed = pattern.sub(replacement, fixed)
+    attempts.append(fixed)
+    if '"' not in fixed:
+        attempts.append(fixed.replace("'", '"'))
+    attempts.append(_TRAILING_COMMA_RE.sub(r"\1", _close_unbalanced(fixed)))
+    # Truncated output: cut back to the last complete value before closing brackets.
+    cut = max(fixed.rfind(","), fixed.rfind("}"), fixed.rfind("]"))
+    if cut > 0:
+        attempts.append(_TRAILING_COMMA_RE.sub(r"\1", _close_unbalanced(fixed[:cut])))
+
+    for attempt in attempts:
+        try:
+            return json.loads(attempt)
+        except ValueError:
+            continue
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Validation and coercion (the JSON Schema subset used by structured outputs)
+# ---------------------------------------------------------------------------
+
+def _type_matches(value: Any, expected: str) -> bool:
+    if expected == "object":
+        return isinstance(value, dict)
+    if expected == "array":
+        return isinstance(value, list)
+    if expected == "string":
+        return isinstance(value, str)
+    if expected == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if expected == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if expected == "boolean":
+        return isinstance(value, bool)
+    return True
+
+
+def validate(data: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """Return a list of schema violations (empty when ``data`` conforms)."""
+    errors = []
+    expected = schema.get("type")
+    if expected and not _type_matches(data, expected):
+        return [f"{path}: expected {expected}"]
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path}: {data!r} not in enum")
+    if expected == "object":
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}.{key}: missing")
+        for key, value in data.items():
+            if key in properties:
+                errors.extend(validate(value, properties[key], f"{path}.{key}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}.{key}: unexpected")
+    elif expected == "array" and "items" in schema:
+        for index, item in enumerate(data):
+            errors.extend(validate(item, schema["items"], f"{path}[{index}]"))
+    return errors
+
+
+def coerce(data: Any, schema: Dict[str, Any]) -> Any:
+    """Bend ``data`` into ``schema``: fill missing required fields, drop extras and fix scalar types."""
+    expected = schema.get("type")
+    if expected == "object":
+        if not isinstance(data, dict):
+            data = {}
+        properties = schema.get("properties", {})
+        result = {}
+        for key, value in data.items():
+            if key in properties:
+                result[key] = coerce(value, properties[key])
+            elif schema.get("additionalProperties") is not False:
+                result[key] = value
+        for key in schema.get("required", []):
+            if key not in result:
+                result[key] = coerce(None, properties.get(key, {}))
+        return result
+    if expected == "array":
+        if data is None:
+            return []
+        if isinstance(data, str):
+            data = [part.strip() for part in data.split("/") if part.strip()]
+        elif not isinstance(data, list):
+            data = [data]
+        item_schema = schema.get("items", {})
+        return [coerce(item, item_schema) for item in data if item is not None]
+    if "enum" in schema and data not in schema["enum"]:
+        return schema["enum"][-1]
+    if expected == "string":
+        return "" if data is None else (data if isinstance(data, str) else str(data))
+    if expected in ("integer", "number"):
+        try:
+            number = float(str(data).replace(",", ""))
+            return int(number) if expected == "integer" else number
+        except (TypeError, ValueError):
+            return 0
+    if expected == "boolean":
+        return bool(data)
+    return copy.deepcopy(_TYPE_DEFAULTS.get(expected)) if data is None else data
+
+
+# ---------------------------------------------------------------------------
+# Parse pipeline + outcome counters
+# ---------------------------------------------------------------------------
+
+STRUCTURED_OUTPUT_STATS: Dict[str, Dict[str, int]] = {}
+_STATS_LOCK = threading.Lock()
+
+
+def _count(name: str, outcome: str) -> None:
+    with _STATS_LOCK:
+        stats = STRUCTURED_OUTPUT_STATS.setdefault(name, {"valid": 0, "repaired": 0, "coerced": 0, "fallback": 0})
+        stats[outcome] += 1
+
+
+def parse_structured(content: Optional[str], schema: Dict[str, Any], name: str) -> Tuple[Optional[Any], str]:
+    """Parse model output against a response-format schema, repairing instead of discarding.
+
+    Returns ``(data, outcome)`` where outcome is one of ``valid`` (parsed and
+    conforming), ``repaired`` (needed JSON text fixes), ``coerced`` (parsed but
+    bent into the schema) or ``fallback`` (unusable; data is None).
+    """
+    body = schema.get("schema", schema)
+    outcome = "valid"
+    try:
+        data = json.loads(content or "")
+    except ValueError:
+        data = repair_json(content or "")
+        outcome = "repaired"
+    if data is None or not isinstance(data, dict):
+        _count(name, "fallback")
+        print(f"DEBUG: {name} structured output unusable, falling back")
+        return None, "fallback"
+
+    errors = validate(data, body)
+    if errors:
+        data = coerce(data, body)
+        if outcome == "valid":
+            outcome = "coerced"
+        print(f"DEBUG: {name} structured output coerced ({len(errors)} issues): {errors[:3]}")
+    _count(name, outcome)
+    return data, outcome
+
+
+def get_structured_output_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-schema outcome counts with the share of calls needing repair or falling back."""
+    with _STATS_LOCK:
+        snapshot = {name: dict(stats) for name, stats in STRUCTURED_OUTPUT_STATS.items()}
+    for stats in snapshot.values():
+        total = sum(stats.values())
+        stats["total"] = total
+        stats["repair_rate"] = round((stats["repaired"] + stats["coerced"]) / total, 3) if total else 0.0
+        stats["fallback_rate"] = round(stats["fallback"] / total, 3) if total else 0.0
+    return snapshot
@@ -0,0 +1,128 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import brotli  # noqa: F401
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
+# httpx decodes zstd from 0.28 on; older versions must not advertise it
+try:
+    import zstandard  # noqa: F401
+    ZSTD_AVAILABLE = tuple(int(part) for part in httpx.__version__.split(".")[:2]) >= (0, 28)
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+# Hosts (e.g. "www.ebay.com", or "*" for all) fetched through the httpx backend instead of requests.
+MODERN_HOSTS = {
+    host.strip().lower()
+    for host in os.getenv("ATE_HTTP2_HOSTS", "").split(",")
+    if host.strip()
+}
+MAX_CONNECTIONS = int(os.getenv("ATE_HTTP2_MAX_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("ATE_HTTP2_KEEPALIVE_EXPIRY", "60"))
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+def accept_encoding() -> str:
+    """Accept-Encoding for the httpx backend: every content coding it can decode here."""
+    encodings = ["gzip", "deflate"]
+    if BROTLI_AVAILABLE:
+        encodings.append("br")
+    if ZSTD_AVAILABLE:
+        encodings.append("zstd")
+    return ", ".join(encodings)
+
+
+def uses_modern_transport(url: str, hosts: Optional[set] = None) -> bool:
+    hosts = MODERN_HOSTS if hosts is None else hosts
+    host = (urlparse(url).hostname or "").lower()
+    return "*" in hosts or host in hosts
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide httpx client; HTTP/2 (multiplexing concurrent page fetches per host) when h2 is installed."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not HTTP2_AVAILABLE:
+                    print("DEBUG: h2 not installed, httpx transport falls back to HTTP/1.1")
+                _client = httpx.Client(
+                    http2=HTTP2_AVAILABLE,
+                    follow_redirects=True,
+                    limits=httpx.Limits(max_connections=MAX_CONNECTIONS, keepalive_expiry=KEEPALIVE_EXPIRY),
+                )
+    return _client
+
+
+class PageStream:
+    """Transport-neutral view of a streaming response, as consumed by ``EffectiveScraper.fetch_page``."""
+
+    def __init__(
+        self,
+        status_code: int,
+        headers: Mapping[str, str],
+        iter_chunks: Callable[[int], Iterator[bytes]],
+        wire_bytes: Callable[[], int],
+        http_version: str,
+    ):
+        self.status_code = status_code
+        self.headers = headers
+        self.iter_chunks = iter_chunks
+        self.wire_bytes = wire_bytes
+        self.http_version = http_version
+
+
+@contextmanager
+def requests_stream(session: Any, url: str, headers: Optional[Dict[str, str]], timeout: float) -> Iterator[PageStream]:
+    with session.get(url, timeout=timeout, headers=headers, stream=True) as response:
+        yield PageStream(
+            response.status_code,
+            response.headers,
+            lambda size: response.iter_content(chunk_size=size),
+            lambda: response.raw.tell(),
+            "HTTP/1.1",
+        )
+
+
+@contextmanager
+def httpx_stream(session: Any, url: str, headers: Optional[Dict[str, str]], timeout: float) -> Iterator[PageStream]:
+    """Stream ``url`` over the shared httpx client, sending the requests session's headers."""
+    merged = dict(session.headers)
+    merged.update(headers or {})
+    merged["Accept-Encoding"] = accept_encoding()
+    with get_http_client().stream("GET", url, headers=merged, timeout=timeout) as response:
+        yield PageStream(
+            response.status_code,
+            response.headers,
+            lambda size: response.iter_bytes(chunk_size=size),
+            lambda: response.num_bytes_downloaded,
+            response.http_version,
+        )
+
+
+def open_stream(session: Any, url: str, headers: Optional[Dict[str, str]], timeout: float, hosts: Optional[set] = None):
+    """Streaming GET through the backend configured for the URL's host."""
+    if uses_modern_transport(url, hosts):
+        return httpx_stream(session, url, headers, timeout)
+    return requests_stream(session, url, headers, timeout)
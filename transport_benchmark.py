@@ -0,0 +1,91 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+from urllib.parse import quote_plus
+
+from replay_server import start_replay_server, site_overrides
+import transport
+
+
+# One search page per site, as the scrapers request them.
+PAGES = [
+    ("duckduckgo", "/html/?q={query}"),
+    ("ebay", "/sch/i.html?_nkw={query}&_sop=16"),
+    ("valuetronics", "/search.php?search_query={query}"),
+    ("testequipment_center", "/search?q={query}"),
+]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run_backend(backend: str, rounds: int, concurrency: int, query: str) -> Dict[str, Any]:
+    """Fetch every site's search page ``rounds`` times through one backend and summarize."""
+    from effective_scraper import EffectiveScraper
+
+    scraper = EffectiveScraper()
+    scraper.modern_hosts = {"*"} if backend == "httpx" else set()
+    urls = [(site, scraper.site_url(site, path.format(query=quote_plus(query)))) for site, path in PAGES]
+    # Advertise what each backend can really decode
+    headers = {"Accept-Encoding": transport.accept_encoding() if backend == "httpx" else "gzip, deflate"}
+    jobs = urls * rounds
+
+    def fetch(job):
+        site, url = job
+        started = time.perf_counter()
+        result = scraper.fetch_page(site, url, headers=headers)
+        return time.perf_counter() - started, result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(fetch, jobs))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in outcomes]
+    return {
+        "backend": backend,
+        "requests": len(outcomes),
+        "errors": sum(1 for _, result in outcomes if result.status_code != 200),
+        "wire_bytes": sum(result.wire_bytes for _, result in outcomes),
+        "body_bytes": sum(len(result.content) for _, result in outcomes),
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "throughput_rps": len(outcomes) / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare scraper transports against the local replay server")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean added server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--query", default="Keysight N5182A")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_replay_server(latency=args.latency, jitter=args.jitter)
+    os.environ["ATE_SITE_BASE_URLS"] = site_overrides(base_url)
+    print(f"Replay server on {base_url}; httpx backend: http2={transport.HTTP2_AVAILABLE}, "
+          f"Accept-Encoding: {transport.accept_encoding()}")
+    # The replay server is plain-HTTP/1.1, so HTTP/2 multiplexing only shows against live TLS hosts;
+    # this compares content codings, connection handling and client overhead.
+    print(f"{'backend':<10}{'reqs':>6}{'errs':>6}{'wire bytes':>12}{'body bytes':>12}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>9}")
+    try:
+        for backend in ("requests", "httpx"):
+            row = run_backend(backend, args.rounds, args.concurrency, args.query)
+            print(f"{row['backend']:<10}{row['requests']:>6}{row['errors']:>6}{row['wire_bytes']:>12}"
+                  f"{row['body_bytes']:>12}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['throughput_rps']:>9.1f}")
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
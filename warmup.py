@@ -0,0 +1,180 @@
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from jobs import PRIORITY_BATCH, STATUS_DONE, get_job_queue
+
+# analysis, effective_scraper, llm_client and transport pull in openai, requests, bs4,
+# numpy and httpx; they are imported on the warm-up thread so the first page render
+# never waits for them.
+
+
+WARMUP_ENABLED = os.getenv("ATE_WARMUP", "1") != "0"
+# Priming spends LLM calls and scrapes on every cold start, so it is opt-in
+WARMUP_PRIME = os.getenv("ATE_WARMUP_PRIME", "0") == "1"
+# Most-quoted equipment analyzed in the background at startup to fill the LLM and scrape caches
+WARMUP_TOP_N = int(os.getenv("ATE_WARMUP_TOP_N", "3"))
+CONNECT_TIMEOUT = float(os.getenv("ATE_WARMUP_CONNECT_TIMEOUT", "5"))
+
+STATE_IDLE = "idle"
+STATE_RUNNING = "running"
+STATE_READY = "ready"
+
+_status: Dict[str, Any] = {"state": STATE_IDLE, "started_at": None, "finished_at": None, "hosts": {}, "primed": {}}
+_status_lock = threading.Lock()
+
+
+def top_equipment(history: List[Tuple[str, str, str]], n: int = WARMUP_TOP_N) -> List[Tuple[str, str, str]]:
+    """The ``n`` most frequent (brand, model) pairs in quote history, each with its most recent options."""
+    from analysis import analysis_key
+
+    counts = Counter(analysis_key(brand, model) for brand, model, _ in history)
+    latest: Dict[str, Tuple[str, str, str]] = {}
+    for brand, model, options in history:
+        latest.setdefault(analysis_key(brand, model), (brand.strip(), model.strip(), options))
+    return [latest[key] for key, _ in counts.most_common(n)]
+
+
+def _warm_host(scraper: Any, url: str) -> Dict[str, Any]:
+    """Resolve the host, then open (and keep pooled) a connection through the transport that will fetch it."""
+    from transport import get_http_client, uses_modern_transport
+
+    parsed = urlparse(url)
+    result: Dict[str, Any] = {"url": url, "dns_ms": None, "connect_ms": None, "ok": False, "error": None}
+    try:
+        started = time.perf_counter()
+        socket.getaddrinfo(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80), type=socket.SOCK_STREAM)
+        result["dns_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        started = time.perf_counter()
+        # HEAD has no body, so the connection goes straight back to the pool
+        if uses_modern_transport(url, scraper.modern_hosts):
+            get_http_client().head(url, timeout=CONNECT_TIMEOUT)
+        else:
+            scraper.session.head(url, timeout=CONNECT_TIMEOUT, allow_redirects=False)
+        result["connect_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def _warm_openai() -> Dict[str, Any]:
+    from llm_client import health_check
+
+    check = health_check()
+    latency = check["latency"]
+    return {
+        "url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+        "dns_ms": None,
+        "connect_ms": round(latency * 1000, 1) if latency is not None else None,
+        "ok": check["ok"],
+        "error": check["error"],
+    }
+
+
+def _warm(history: List[Tuple[str, str, str]], top_n: int) -> None:
+    from analysis import ANALYSIS_CACHE, analysis_cache_key, run_analysis
+    from effective_scraper import EffectiveScraper
+
+    scraper = EffectiveScraper()
+    urls = {site: scraper.site_url(site, "/") for site in scraper.site_base_urls}
+    with ThreadPoolExecutor(max_workers=len(urls) + 1, thread_name_prefix="warmup") as pool:
+        futures = {site: pool.submit(_warm_host, scraper, url) for site, url in urls.items()}
+        futures["openai"] = pool.submit(_warm_openai)
+        hosts = {name: future.result() for name, future in futures.items()}
+    with _status_lock:
+        _status["hosts"] = hosts
+    print("DEBUG: Warm-up connections: " + ", ".join(
+        f"{name}={'ok' if info['ok'] else 'failed'}" for name, info in hosts.items()
+    ))
+
+    if not WARMUP_PRIME:
+        return
+    # Batch priority: a user's Analyze click always runs ahead of priming. The key is the one
+    # app.py submits under, so clicking Analyze on a quote being primed joins its job.
+    queue = get_job_queue()
+    primed = {}
+    for brand, model, options in top_equipment(history, top_n):
+        key = analysis_cache_key(brand, model, options)
+        primed[key] = queue.submit(
+            run_analysis, brand, model, options, True, priority=PRIORITY_BATCH, key=key, reuse_finished=False,
+        )
+    with _status_lock:
+        _status["primed"] = primed
+    for key, job_id in primed.items():
+        job = queue.get(job_id)
+        if job is not None:
+            job.wait()
+            # A degraded result is not cached; release the key so the next Analyze runs afresh
+            if key not in ANALYSIS_CACHE:
+                queue.forget(key, job_id)
+
+
+def _run(history: Union[List[Tuple[str, str, str]], Callable[[], List[Tuple[str, str, str]]]], top_n: int) -> None:
+    try:
+        _warm(history() if callable(history) else history, top_n)
+    except Exception as e:
+        print(f"DEBUG: Warm-up error: {e}")
+    finally:
+        with _status_lock:
+            _status["state"] = STATE_READY
+            _status["finished_at"] = time.time()
+        print(f"DEBUG: Warm-up finished in {_status['finished_at'] - _status['started_at']:.1f}s")
+
+
+def _warm_openai_client() -> None:
+    from llm_client import warm_openai_client
+
+    warm_openai_client()
+
+
+def start_warmup(
+    history: Union[List[Tuple[str, str, str]], Callable[[], List[Tuple[str, str, str]]]],
+    top_n: int = WARMUP_TOP_N,
+) -> bool:
+    """Warm connections and caches on a background thread, once per process; returns whether it started.
+
+    ``history`` holds (brand, model, options) rows from quote history, or a
+    callable returning them (called on the warm-up thread). With ATE_WARMUP=0
+    only the OpenAI client is warmed.
+    """
+    if not WARMUP_ENABLED:
+        threading.Thread(target=_warm_openai_client, name="openai-warmup-import", daemon=True).start()
+        return False
+    with _status_lock:
+        if _status["state"] != STATE_IDLE:
+            return False
+        _status["state"] = STATE_RUNNING
+        _status["started_at"] = time.time()
+    threading.Thread(target=_run, args=(history, top_n), name="warmup", daemon=True).start()
+    return True
+
+
+def get_warmup_status() -> Dict[str, Any]:
+    """Warm-up state, per-host DNS/connect timings and the status of each cache-priming job."""
+    with _status_lock:
+        status = dict(_status, hosts=dict(_status["hosts"]), primed=dict(_status["primed"]))
+    queue = get_job_queue()
+    primed = {}
+    for key, job_id in status["primed"].items():
+        job = queue.get(job_id)
+        primed[key] = job.status if job is not None else STATUS_DONE
+    status["primed"] = primed
+    status["ready"] = status["state"] == STATE_READY
+    return status
+
+
+def readiness_message(status: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """One-line readiness note for the UI; None when warm-up is off or finished."""
+    status = status or get_warmup_status()
+    if status["state"] != STATE_RUNNING:
+        return None
+    if not status["hosts"]:
+        return "Warming up: opening connections to vendors and OpenAI..."
+    done = sum(1 for state in status["primed"].values() if state == STATUS_DONE)
+    return f"Warming up: caching popular equipment ({done}/{len(status['primed'])})..."